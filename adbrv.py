@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 __version__ = "2.4.6"
 import sys
-import unicodedata
 import typer
 from typing import Optional, List
 from typing_extensions import Annotated
@@ -86,6 +85,18 @@ Remove proxy and all reverse ports.
 adbrv frida-start
 Start frida-server (prompts auto-selection).
 
+adbrv frida-kill --all
+Kill frida-server on every connected device at once.
+
+adbrv frida-deploy --all --download
+Push the frida-server matching each device's ABI (skipped where already up to date).
+
+adbrv frida-watch --all
+Restart frida-server whenever it dies, with restart counts and latency.
+
+adbrv daemon start
+Keep device state warm in the background for instant status.
+
 adbrv resign --apk target.apk
 Resign APK file using integrated uber-apk-signer.
 
@@ -103,6 +114,11 @@ Run MASTG security checks on .so files.
 )
 console = Console()
 
+def notify_daemon(serial=None):
+    """Drop the daemon's cached status after a command changed device state"""
+    from adbrv_module.daemon import invalidate
+    invalidate(serial)
+
 def version_callback(value: bool):
     if value:
         console.print(f"[bold green]adbrv version[/bold green] [cyan]{__version__}[/cyan]")
@@ -121,7 +137,30 @@ def main_callback(
             help="Show the application's version and exit.",
         ),
     ] = None,
+    profile: Annotated[bool, typer.Option("--profile", help="Print a latency summary of every adb/tool call on exit.")] = False,
+    profile_trace: Annotated[Optional[str], typer.Option("--profile-trace", help="Also write the calls as Chrome trace-event JSON to this file.", metavar="FILE")] = None,
+    record: Annotated[Optional[str], typer.Option("--record", help="Record every adb call with its output and latency to FILE for offline replay.", metavar="FILE")] = None,
 ):
+    from adbrv_module import profiler, replay
+    profiler.set_source(ctx.invoked_subcommand or "workspace")
+    try:
+        if record:
+            replay.start_recording(record)
+        else:
+            replay.start_from_env()
+    except replay.ReplayError as e:
+        console.print(f"[bold red][!] {e}[/bold red]")
+        raise typer.Exit(1)
+    ctx.call_on_close(replay.finish)
+    if profile or profile_trace:
+        def _report():
+            console.print()
+            profiler.print_report(console)
+            if profile_trace:
+                count = profiler.write_chrome_trace(profile_trace)
+                console.print(f"  [bold green]✔[/bold green] Trace      [cyan]{profile_trace}[/cyan] ({count} events)")
+        ctx.call_on_close(_report)
+
     if ctx.invoked_subcommand is None:
         import shlex
         import click
@@ -131,82 +170,34 @@ def main_callback(
         from prompt_toolkit.key_binding import KeyBindings
         
         allowed_commands_list = [
-            "set", "unset", "status", "frida-start", "frida-kill", "pull",
-            "help", "exit", "quit", "--help", "-h"
+            "set", "unset", "status", "frida-start", "frida-kill", "frida-deploy", "pull",
+            "stats", "help", "exit", "quit", "--help", "-h"
         ]
 
-        import time
         import threading
 
         packages_cache = []
+        packages_source = [None]  # serial the cached package list belongs to
+        packages_index = [None]   # PackageIndex over packages_cache, built once per list
+
+        # Workspace commands and the status facets they change
+        COMMAND_FACETS = {"set": ("proxy",), "unset": ("proxy",), "frida-start": ("frida",), "frida-kill": ("frida",), "frida-deploy": ("frida",)}
 
         class StatusCache:
+            """Prompt-side view of the status engine; values not known yet are optimistic"""
             def __init__(self):
-                self.devices = []
-                self.devices_last = 0
-                self.devices_fetching = False
-
-                self.frida = True
-                self.frida_last = 0
-                self.frida_fetching = False
-
-                self.unset = True
-                self.unset_last = 0
-                self.unset_fetching = False
-                
-                # Eagerly pre-fetch statuses in background
-                threading.Thread(target=self._initial_fetch, daemon=True).start()
-
-            def _initial_fetch(self):
-                try:
-                    from adbrv_module.devices import get_connected_devices
-                    
-                    # 1. Fetch devices (this uses 'adb devices', not 'adb shell')
-                    self.devices = get_connected_devices()
-                    self.devices_last = time.time()
-                    
-                    if not self.devices:
-                        self.unset = False
-                        self.frida = False
-                        self.unset_last = time.time()
-                        self.frida_last = time.time()
-                        return
-                    
-                    # 2. Batch query: proxy + frida status in ONE adb shell call per device
-                    for d in self.devices:
-                        adb_base = ["adb", "-s", d]
-                        try:
-                            batch_cmd = "settings get global http_proxy; echo '---DELIM---'; ps | grep rida-server"
-                            res = subprocess.run(adb_base + ["shell", batch_cmd], capture_output=True, text=True, timeout=5)
-                            parts = res.stdout.split("---DELIM---")
-                            
-                            # Parse proxy
-                            proxy = parts[0].strip() if len(parts) > 0 else ""
-                            if proxy and proxy not in [":0", "null", ""]:
-                                self.unset = True
-                            
-                            # Parse frida
-                            frida_out = parts[1].strip() if len(parts) > 1 else ""
-                            if "rida-server" in frida_out:
-                                self.frida = True
-                            else:
-                                self.frida = False
-                        except:
-                            pass
-                    
-                    # 3. Check reverse ports (this uses 'adb reverse', not 'adb shell' — separate command)
-                    for d in self.devices:
-                        try:
-                            rev = subprocess.run(["adb", "-s", d, "reverse", "--list"], capture_output=True, text=True, timeout=3)
-                            if rev.stdout.strip():
-                                self.unset = True
-                        except:
-                            pass
-                    
-                    self.unset_last = time.time()
-                    self.frida_last = time.time()
-                except Exception:
-                    pass
+                from adbrv_module.statusEngine import StatusEngine
+                self.engine = StatusEngine()
+                self.engine.add_listener(self._on_change)
+                self.engine.start()
+
+            def _on_change(self, serial, what):
+                # Runs on the engine's loop thread
+                if what == "state" and serial is not None and serial == packages_source[0]:
+                    packages_cache.clear()
+                    packages_source[0] = None
+                    packages_index[0] = None
+                self.trigger_completion()
 
             def trigger_completion(self):
                 try:
@@ -222,112 +213,32 @@ def main_callback(
                     pass
 
             def check_devices(self):
-                if time.time() - self.devices_last > 5.0:
-                    if not self.devices_fetching:
-                        self.devices_fetching = True
-                        def bg():
-                            try:
-                                from adbrv_module.devices import get_connected_devices
-                                self.devices = get_connected_devices()
-                            except Exception:
-                                self.devices = []
-                            self.devices_last = time.time()
-                            self.devices_fetching = False
-                        threading.Thread(target=bg, daemon=True).start()
-                if self.devices_last == 0:
-                    return ["Optimistic"]
-                return self.devices
+                devices = self.engine.devices()
+                return ["Optimistic"] if devices is None else devices
 
             def check_frida(self):
-                if time.time() - self.frida_last > 8.0:
-                    if not self.frida_fetching:
-                        self.frida_fetching = True
-                        def bg():
-                            try:
-                                from adbrv_module.devices import adb_shell
-                                frida_ps = adb_shell(["ps", "|", "grep", "rida-server"])
-                                self.frida = bool(frida_ps and "rida-server" in frida_ps)
-                            except Exception:
-                                self.frida = False
-                            self.frida_last = time.time()
-                            self.frida_fetching = False
-                        threading.Thread(target=bg, daemon=True).start()
-                if self.frida_last == 0:
-                    return True
-                return self.frida
+                running = self.engine.facet("frida")
+                return True if running is None else running
 
             def check_unset(self):
-                if time.time() - self.unset_last > 10.0:
-                    if not self.unset_fetching:
-                        self.unset_fetching = True
-                        def bg():
-                            try:
-                                from adbrv_module.devices import get_connected_devices
-                                devs = get_connected_devices()
-                                self.devices = devs
-                                self.devices_last = time.time()
-                                is_any = False
-                                if devs:
-                                    for d in devs:
-                                        adb_base = ["adb", "-s", d]
-                                        # Batch proxy check into 1 call
-                                        res = subprocess.run(adb_base + ["shell", "settings get global http_proxy"], capture_output=True, text=True, timeout=3)
-                                        p = res.stdout.strip()
-                                        if p and p not in [":0", "null", ""]:
-                                            is_any = True
-                                            break
-                                        # Check reverse (non-shell command)
-                                        rev = subprocess.run(adb_base + ["reverse", "--list"], capture_output=True, text=True, timeout=3)
-                                        if rev.stdout.strip():
-                                            is_any = True
-                                            break
-                                self.unset = is_any
-                            except Exception:
-                                self.unset = False
-                            self.unset_last = time.time()
-                            self.unset_fetching = False
-                        threading.Thread(target=bg, daemon=True).start()
-                if self.unset_last == 0:
-                    return True
-                return self.unset
-
-            def flush(self):
-                self.devices_last = 0
-                self.unset_last = 0
-                self.frida_last = 0
-                packages_cache.clear()
-                self.trigger_completion()
-                
-        status_cache = StatusCache()
-
-        class RealtimeMonitor:
-            def __init__(self, cache_instance):
-                self.cache = cache_instance
-                self.process = None
-                self.thread = threading.Thread(target=self._run, daemon=True)
-                self.thread.start()
+                is_set = self.engine.facet("proxy")
+                return True if is_set is None else is_set
 
-            def _run(self):
-                import subprocess
-                try:
-                    self.process = subprocess.Popen(["adb", "track-devices"], stdout=subprocess.PIPE, text=True)
-                    while True:
-                        line = self.process.stdout.readline()
-                        if not line and self.process.poll() is not None:
-                            break
-                        # Track devices triggered: device joined/left
-                        self.cache.flush()
-                except Exception:
-                    pass
+            def after_command(self, args):
+                """Re-probe only what the command can have changed, on the device it targeted"""
+                facets = COMMAND_FACETS.get(args[0])
+                if not facets:
+                    return
+                serial = None
+                for flag in ("-d", "--device"):
+                    if flag in args[1:-1]:
+                        serial = args[args.index(flag) + 1]
+                self.engine.invalidate(serial, facets)
 
             def stop(self):
-                if self.process:
-                    try:
-                        self.process.kill()
-                    except:
-                        pass
+                self.engine.stop()
 
-        realtime_monitor = RealtimeMonitor(status_cache)
+        status_cache = StatusCache()
 
         def is_valid_sentence_prefix(text):
             text_lstrip = text.lstrip()
@@ -338,7 +249,7 @@ def main_callback(
             ends_with_space = text_lstrip.endswith(" ") or text_lstrip.endswith("\t")
             
             cmd = parts[0].lower()
-            valid_cmds = ["set", "unset", "status", "frida-start", "frida-kill", "pull", "help", "exit", "quit", "--help", "-h"]
+            valid_cmds = ["set", "unset", "status", "frida-start", "frida-kill", "frida-deploy", "pull", "stats", "help", "exit", "quit", "--help", "-h"]
             matching_cmds = [c for c in valid_cmds if c.startswith(cmd)]
             
             if not matching_cmds:
@@ -349,7 +260,7 @@ def main_callback(
                     return False
                 return True
 
-            if cmd in ["pull", "set", "unset", "status", "frida-start", "frida-kill"]:
+            if cmd in ["pull", "set", "unset", "status", "frida-start", "frida-kill", "frida-deploy"]:
                 if len(text_lstrip) > len(cmd):
                     if not status_cache.check_devices():
                         return False
@@ -367,7 +278,13 @@ def main_callback(
             expected_pos = 2 if cmd in ["set", "pull"] else 0
             pos_count = 0
             has_flag = False
+            has_all = False
             flag_val_count = 0
+            # frida-deploy options besides --device/--all: True when the option takes a value
+            deploy_options = {"--version": True, "--file": True, "--name": True, "--download": False, "--restart": False}
+            deploy_short = {"-v": "--version", "-f": "--file"}
+            deploy_seen = set()
+            awaiting_value = False
             
             i = 1
             while i < len(parts):
@@ -379,17 +296,38 @@ def main_callback(
                     if part in ["-h", "--help"]:
                         return True
                         
-                    if "--device".startswith(part) or "-d".startswith(part):
-                        if has_flag:
+                    if (cmd == "frida-deploy" and part not in ["-d", "--device", "-a", "--all"]
+                            and (part in deploy_short or any(o.startswith(part) for o in deploy_options))):
+                        if awaiting_value or (has_flag and flag_val_count == 0):
+                            return False
+                        option = deploy_short.get(part, part)
+                        if option in deploy_options:
+                            if option in deploy_seen:
+                                return False
+                            deploy_seen.add(option)
+                            awaiting_value = deploy_options[option]
+                        elif is_last and ends_with_space:
+                            return False
+                    elif "--device".startswith(part) or "-d".startswith(part):
+                        if has_flag or has_all or awaiting_value:
                             return False
                         if part in ["-d", "--device"]:
                             has_flag = True
                         elif is_last and ends_with_space:
                             return False
+                    elif cmd in ["frida-start", "frida-kill", "frida-deploy"] and ("--all".startswith(part) or part == "-a"):
+                        if has_all or has_flag or awaiting_value:
+                            return False
+                        if part in ["-a", "--all"]:
+                            has_all = True
+                        elif is_last and ends_with_space:
+                            return False
                     else:
                         return False
                 else:
-                    if has_flag and flag_val_count == 0:
+                    if awaiting_value:
+                        awaiting_value = False
+                    elif has_flag and flag_val_count == 0:
                         flag_val_count += 1
                     else:
                         if pos_count >= expected_pos:
@@ -402,10 +340,10 @@ def main_callback(
                 i += 1
                 
             if ends_with_space:
-                if pos_count == expected_pos and has_flag and flag_val_count == 1:
+                if cmd != "frida-deploy" and pos_count == expected_pos and has_flag and flag_val_count == 1:
                     return False
                     
-            if cmd in ["help", "exit", "quit", "--help", "-h"]:
+            if cmd in ["stats", "help", "exit", "quit", "--help", "-h"]:
                 if ends_with_space or len(parts) > 1:
                     return False
                     
@@ -413,27 +351,51 @@ def main_callback(
 
         import threading
         
+        def publish_packages(pkgs, device):
+            from adbrv_module.packageSearch import PackageIndex
+            packages_index[0] = PackageIndex(pkgs)
+            packages_cache.clear()
+            packages_cache.extend(pkgs)
+            packages_source[0] = device
+            status_cache.trigger_completion()
+
         def fetch_packages_fn():
-            # Wait for initial status fetch to finish before querying packages
-            # This prevents ADB server contention during startup
-            while status_cache.devices_last == 0:
-                time.sleep(0.2)
+            # Background priority; the scheduler's caps replace waiting for the initial status fetch
+            from adbrv_module.scheduler import background
             try:
-                from adbrv_module.pullAPK import get_installed_packages
-                pkgs = get_installed_packages()
-                if pkgs:
-                    packages_cache.clear()
-                    packages_cache.extend(pkgs)
-                    status_cache.trigger_completion()
+                from adbrv_module import packageCache
+                from adbrv_module.daemon import request as daemon_request, DaemonError
+                from adbrv_module.devices import get_connected_devices
+                from adbrv_module.profiler import source
+                with background(), source("packages-prefetch"):
+                    devices = get_connected_devices()
+                    if not devices:
+                        return
+                    device = devices[0]
+                    # Complete from the on-disk index right away; the diff against the device follows
+                    cached = packageCache.cached(device)
+                    if cached and not packages_cache:
+                        publish_packages(cached, device)
+                    try:
+                        reply = daemon_request("packages", serial=device, timeout=15)
+                    except DaemonError:
+                        reply = None  # a stuck daemon must not leave the prompt without completions
+                    if reply is not None:
+                        pkgs = reply["packages"]
+                    else:
+                        from adbrv_module.pullAPK import get_installed_packages
+                        pkgs = get_installed_packages(device)
+                    if pkgs:
+                        if pkgs != packages_cache or packages_source[0] != device:
+                            publish_packages(pkgs, device)
+                        # Labels read from the APKs show up once resolved
+                        if packageCache.resolve_details(device) and packages_source[0] == device:
+                            publish_packages(packageCache.cached(device), device)
             except Exception:
                 pass
         
         threading.Thread(target=fetch_packages_fn, daemon=True).start()
 
-        def remove_accents(input_str):
-            s1 = unicodedata.normalize('NFKD', input_str).encode('ASCII', 'ignore').decode('utf-8')
-            return s1.replace('đ', 'd').replace('Đ', 'D')
-
         class CommandCompleter(Completer):
             def get_completions(self, document, complete_event):
                 completions = list(self._get_completions_inner(document, complete_event))
@@ -508,9 +470,13 @@ def main_callback(
 
                         if ends_with_space and "-d".startswith(word_before_cursor.lower()):
                             yield Completion("-d", start_position=-len(word_before_cursor))
+                        if ends_with_space and cmd in ["frida-start", "frida-kill"]:
+                            yield Completion("-a", start_position=-len(word_before_cursor))
                     elif len(parts) == 2 and not ends_with_space and parts[1].startswith("-"):
                         if "-d".startswith(word_before_cursor.lower()):
                             yield Completion("-d", start_position=-len(word_before_cursor))
+                        if cmd in ["frida-start", "frida-kill"] and "-a".startswith(word_before_cursor.lower()):
+                            yield Completion("-a", start_position=-len(word_before_cursor))
                             
                 elif cmd == "set":
                     if len(parts) == 1:
@@ -536,7 +502,6 @@ def main_callback(
                             yield Completion("-d", start_position=-len(word_before_cursor))
                             
                 elif cmd == "pull":
-                    search_word = remove_accents(word_before_cursor.lower())
                     if (len(parts) == 1) or (len(parts) == 2 and not ends_with_space):
                         if parts[0].lower() == "pull":
                             devices = status_cache.check_devices()
@@ -560,28 +525,25 @@ def main_callback(
                                     )
                                     return
 
-                                has_names = any(isinstance(p, dict) and p.get("name") for p in packages_cache)
-                                for pkg in packages_cache:
-                                    if isinstance(pkg, dict):
-                                        pkg_id = pkg.get("id", "").lower()
-                                        pkg_name = remove_accents(pkg.get("name", "").lower())
-                                        if search_word in pkg_id or search_word in pkg_name:
-                                            if has_names:
-                                                display_text = pkg.get("name") if pkg.get("name") else " "
-                                                yield Completion(
-                                                    text=pkg["id"], 
-                                                    start_position=-len(word_before_cursor), 
-                                                    display=display_text, 
-                                                    display_meta=pkg["id"]
-                                                )
-                                            else:
-                                                yield Completion(
-                                                    text=pkg["id"], 
-                                                    start_position=-len(word_before_cursor)
-                                                )
+                                index = packages_index[0]
+                                if index is None or len(index) != len(packages_cache):
+                                    from adbrv_module.packageSearch import PackageIndex
+                                    index = packages_index[0] = PackageIndex(packages_cache)
+                                for pkg in index.search(word_before_cursor):
+                                    if not isinstance(pkg, dict):
+                                        yield Completion(pkg, start_position=-len(word_before_cursor))
+                                    elif index.has_names:
+                                        yield Completion(
+                                            text=pkg["id"],
+                                            start_position=-len(word_before_cursor),
+                                            display=pkg.get("name") or " ",
+                                            display_meta=pkg["id"]
+                                        )
                                     else:
-                                        if pkg.lower().startswith(search_word):
-                                            yield Completion(pkg, start_position=-len(word_before_cursor))
+                                        yield Completion(
+                                            text=pkg["id"],
+                                            start_position=-len(word_before_cursor)
+                                        )
                     elif len(parts) == 2 and ends_with_space:
                         if "path".startswith(word_before_cursor.lower()):
                             yield Completion("enter your path", start_position=-len(word_before_cursor))
@@ -758,6 +720,10 @@ def main_callback(
                         continue
                     if cmd.strip().lower() in ["exit", "quit"]:
                         break
+                    if cmd.strip().lower() == "stats":
+                        from adbrv_module.profiler import print_report
+                        print_report(console)
+                        continue
                     if cmd.strip().lower() in ["help", "-h", "--help"]:
                         from rich.table import Table
                         from rich.panel import Panel
@@ -770,7 +736,9 @@ def main_callback(
                         help_tbl.add_row("status", "Display proxy, reverse port, and frida-server status.")
                         help_tbl.add_row("frida-start", "Start frida/florida-server on the device with root privileges.")
                         help_tbl.add_row("frida-kill", "Kill all running frida/florida-server processes on the device.")
+                        help_tbl.add_row("frida-deploy", "Push the frida-server matching the device ABI from the local cache (only when it differs).")
                         help_tbl.add_row("pull", "Pull an installed APK from the device by its package name.")
+                        help_tbl.add_row("stats", "Show adb/tool call latency by call, source (command or background refresh) and device.")
                         help_tbl.add_row("exit / quit", "Exit the interactive workspace.")
                         
                         panel = Panel(
@@ -793,6 +761,7 @@ def main_callback(
                         example_tbl.add_row("frida-kill", "Kill all running frida/florida-server processes on the device.")
                         example_tbl.add_row("pull com.example /Downloads", "Extract single/split APKs to the destination.")
                         example_tbl.add_row("frida-kill -d 123", "Kill all running frida/florida-server processes on the specific device.")
+                        example_tbl.add_row("frida-start -a", "Start server on every connected device at once.")
                         example_panel = Panel(
                             example_tbl,
                             title="Examples",
@@ -806,14 +775,15 @@ def main_callback(
                     if not args:
                         continue
                         
-                    allowed_commands = {"set", "unset", "status", "frida-start", "frida-kill", "pull", "--help", "-h"}
+                    allowed_commands = {"set", "unset", "status", "frida-start", "frida-kill", "frida-deploy", "pull", "--help", "-h"}
                     if args[0] not in allowed_commands:
                         console.print(f"[bold red][!] Command '{args[0]}' is not supported inside Workspace.[/bold red]")
                         console.print("[yellow]Please type 'exit' to leave the workspace and run it normally, or type 'help' for allowing commands in Workspace.[/yellow]")
                         continue
                         
                     try:
-                        ctx.command(args=args, standalone_mode=False)
+                        with profiler.source(args[0]):
+                            ctx.command(args=args, standalone_mode=False)
                     except click.exceptions.Exit:
                         pass
                     except SystemExit:
@@ -821,19 +791,18 @@ def main_callback(
                     except Exception as e:
                         console.print(f"[bold red]Command Error: {e}[/bold red]")
                     finally:
-                        # Flush caches sau khi chạy lệnh để refresh RealTime
-                        status_cache.flush()
+                        status_cache.after_command(args)
                         
                 except KeyboardInterrupt:
                     continue
                 except EOFError:
                     break
         finally:
-            realtime_monitor.stop()
+            status_cache.stop()
+            from adbrv_module.shellSession import close_all
+            close_all()
             packages_cache.clear()
-            status_cache.devices.clear()
-            status_cache.frida = False
-            status_cache.unset = False
+            packages_index[0] = None
 
 @app.command(name="set")
 def cmd_set(
@@ -850,6 +819,7 @@ def cmd_set(
         from adbrv_module.devices import select_device
         target_device = select_device(device)
         set_proxy(local_port, device_port, target_device)
+        notify_daemon(target_device)
     except (AdbError, ProxyError, CoreError) as e:
         console.print(f"[bold red][!] {e}[/bold red]")
         raise typer.Exit(1)
@@ -868,9 +838,15 @@ def cmd_unset(
         if device:
             target_device = select_device(device)
             unset_proxy_and_reverse(target_device)
+        elif len(devices) == 1:
+            unset_proxy_and_reverse(devices[0])
         else:
-            for d in devices:
-                unset_proxy_and_reverse(d)
+            from adbrv_module.proxy import unset_all_devices
+            failed = unset_all_devices(devices)
+            if failed:
+                notify_daemon()
+                raise typer.Exit(1)
+        notify_daemon(device)
     except (AdbError, ProxyError, CoreError) as e:
         console.print(f"[bold red][!] {e}[/bold red]")
         raise typer.Exit(1)
@@ -881,7 +857,16 @@ def cmd_status(
 ):
     """Display proxy, reverse port, and frida-server status."""
     try:
-        devices = get_connected_devices()
+        from adbrv_module.daemon import request as daemon_request, DaemonError, STATUS_TIMEOUT
+        try:
+            reply = daemon_request("status", serial=device, timeout=STATUS_TIMEOUT)
+        except DaemonError as e:
+            console.print(f"[bold red][!] {e}[/bold red]")
+            raise typer.Exit(1)
+        if reply is not None:
+            from adbrv_module.devices import print_status_entries
+            print_status_entries(reply["devices"])
+            return
         from adbrv_module.devices import select_device
         if device:
             target_device = select_device(device)
@@ -895,10 +880,21 @@ def cmd_status(
 @app.command(name="frida-start")
 def cmd_frida_start(
     device: Annotated[Optional[str], typer.Option("--device", "-d", help="Specific device serial")] = None,
+    all_devices: Annotated[bool, typer.Option("--all", "-a", help="Start on every connected device concurrently")] = False,
 ):
     """Start frida-server on the device with root privileges."""
     try:
+        if all_devices and not device:
+            from adbrv_module.fridaTools import start_frida_all
+            devices = get_connected_devices()
+            if not devices:
+                console.print("[bold red][!] No devices connected.[/bold red]")
+                raise typer.Exit(1)
+            start_frida_all(devices)
+            notify_daemon()
+            return
         start_frida_server(device)
+        notify_daemon(device)
     except (AdbError, ProxyError, CoreError) as e:
         console.print(f"[bold red][!] {e}[/bold red]")
         raise typer.Exit(1)
@@ -906,28 +902,154 @@ def cmd_frida_start(
 @app.command(name="frida-kill")
 def cmd_frida_kill(
     device: Annotated[Optional[str], typer.Option("--device", "-d", help="Specific device serial")] = None,
+    all_devices: Annotated[bool, typer.Option("--all", "-a", help="Kill on every connected device concurrently")] = False,
 ):
     """Kill all running frida-server processes on the device."""
     try:
+        if all_devices and not device:
+            from adbrv_module.fridaTools import frida_kill_all
+            devices = get_connected_devices()
+            if not devices:
+                console.print("[bold red][!] No devices connected.[/bold red]")
+                raise typer.Exit(1)
+            frida_kill_all(devices)
+            notify_daemon()
+            return
         frida_kill(device)
+        notify_daemon(device)
     except (AdbError, ProxyError, CoreError) as e:
         console.print(f"[bold red][!] {e}[/bold red]")
         raise typer.Exit(1)
 
+@app.command(name="frida-deploy")
+def cmd_frida_deploy(
+    version: Annotated[Optional[str], typer.Option("--version", "-v", help="frida version to deploy (default: newest in the local cache, latest release with --download)")] = None,
+    file: Annotated[Optional[str], typer.Option("--file", "-f", help="Add a frida-server binary or .xz archive to the local cache and deploy it")] = None,
+    download: Annotated[bool, typer.Option("--download", help="Download the release binaries missing from the local cache")] = False,
+    name: Annotated[str, typer.Option("--name", help="File name in /data/local/tmp")] = "frida-server",
+    restart: Annotated[bool, typer.Option("--restart", help="Restart a server running from the replaced binary")] = False,
+    device: Annotated[Optional[str], typer.Option("--device", "-d", help="Specific device serial")] = None,
+    all_devices: Annotated[bool, typer.Option("--all", "-a", help="Deploy to every connected device concurrently")] = False,
+):
+    """Push the frida-server matching each device's ABI, skipping devices that already have it."""
+    from adbrv_module.fridaDeploy import deploy_all, import_server, FridaDeployError
+    try:
+        if file:
+            version, arch = import_server(file, version)
+            console.print(f"  [bold green]✔[/bold green] Cached     [cyan]frida-server {version} ({arch})[/cyan]")
+        if all_devices and not device:
+            devices = get_connected_devices()
+        else:
+            from adbrv_module.devices import select_device
+            devices = [d for d in [select_device(device)] if d]
+        if not devices:
+            console.print("[bold red][!] No devices connected.[/bold red]")
+            raise typer.Exit(1)
+        results = deploy_all(devices, version, download, name, restart)
+        if restart:
+            notify_daemon(None if all_devices and not device else devices[0])
+        if any(r.error is not None for r in results):
+            raise typer.Exit(1)
+    except (AdbError, FridaDeployError) as e:
+        console.print(f"[bold red][!] {e}[/bold red]")
+        raise typer.Exit(1)
+
+@app.command(name="frida-watch")
+def cmd_frida_watch(
+    device: Annotated[Optional[str], typer.Option("--device", "-d", help="Specific device serial")] = None,
+    all_devices: Annotated[bool, typer.Option("--all", "-a", help="Watch every connected device")] = False,
+    log: Annotated[Optional[str], typer.Option("--log", help="Append restart events (JSON lines) to this file")] = None,
+):
+    """Restart frida-server whenever it dies, until Ctrl-C; prints restart counts and latency."""
+    from adbrv_module.fridaWatchdog import watch_all, WatchdogError
+    try:
+        if all_devices and not device:
+            devices = get_connected_devices()
+        else:
+            from adbrv_module.devices import select_device
+            devices = [d for d in [select_device(device)] if d]
+        if not devices:
+            console.print("[bold red][!] No devices connected.[/bold red]")
+            raise typer.Exit(1)
+        watch_all(devices, log)
+    except (AdbError, WatchdogError) as e:
+        console.print(f"[bold red][!] {e}[/bold red]")
+        raise typer.Exit(1)
+
 @app.command(name="pull")
 def cmd_pull(
-    package_name: Annotated[str, typer.Argument(help="The package name of the app to pull")],
+    package_name: Annotated[Optional[str], typer.Argument(help="The package name of the app to pull, or a glob such as 'com.example.*' for a bulk pull")] = None,
     path: Annotated[Optional[str], typer.Argument(help="Optional destination path to save the APK")] = None,
     device: Annotated[Optional[str], typer.Option("--device", "-d", help="Specific device serial")] = None,
+    jobs: Annotated[Optional[int], typer.Option("--jobs", "-j", help="Split APKs (bulk: packages per device) pulled at the same time (default: ADBRV_PULL_CONCURRENCY or 4)")] = None,
+    third_party: Annotated[bool, typer.Option("--third-party", "-3", help="Bulk pull every third-party package")] = False,
+    from_file: Annotated[Optional[str], typer.Option("--from", help="Bulk pull the package ids or globs listed in a file, one per line")] = None,
+    all_devices: Annotated[bool, typer.Option("--all", "-a", help="Bulk pull from every connected device")] = False,
+    out: Annotated[Optional[str], typer.Option("--out", "-o", help="Destination directory (same as the path argument)")] = None,
+    summary: Annotated[Optional[str], typer.Option("--summary", help="Write a JSON summary of a bulk pull to this file")] = None,
 ):
     """Pull an installed APK from the device directly to your computer by package name."""
     try:
-        from adbrv_module.pullAPK import pull_apk
-        pull_apk(package_name, path, device)
+        from adbrv_module.bulkPull import bulk_pull, is_pattern, read_package_list
+        dest = out or path
+        if not (third_party or from_file or all_devices or summary or (package_name and is_pattern(package_name))):
+            if not package_name:
+                console.print("[bold red][!] Give a package name, or use --third-party / --from for a bulk pull.[/bold red]")
+                raise typer.Exit(1)
+            from adbrv_module.pullAPK import pull_apk
+            pull_apk(package_name, dest, device, jobs)
+            return
+        patterns = ([package_name] if package_name else []) + (read_package_list(from_file) if from_file else [])
+        if not patterns and not third_party:
+            console.print("[bold red][!] Give a package glob, --third-party or --from for a bulk pull.[/bold red]")
+            raise typer.Exit(1)
+        if all_devices and not device:
+            devices = get_connected_devices()
+        else:
+            from adbrv_module.devices import select_device
+            devices = [d for d in [select_device(device)] if d]
+        if not devices:
+            console.print("[bold red][!] No devices connected.[/bold red]")
+            raise typer.Exit(1)
+        results = bulk_pull(devices, patterns, third_party, dest, jobs, summary)
+        if not results or any(r.status in ("failed", "interrupted") for r in results):
+            raise typer.Exit(1)
+    except typer.Exit:
+        raise
     except Exception as e:
         console.print(f"[bold red]❌ {e}[/bold red]")
         raise typer.Exit(1)
 
+@app.command(name="daemon")
+def cmd_daemon(
+    action: Annotated[str, typer.Argument(help="start | stop | status | run (foreground)")] = "status",
+):
+    """Manage the background daemon that keeps device state warm for fast one-shot commands."""
+    from adbrv_module import daemon
+    try:
+        if action == "start":
+            reply = daemon.start_detached()
+            console.print(f"  [bold green]✔[/bold green] Daemon     [cyan]running (PID {reply['pid']})[/cyan]")
+        elif action == "run":
+            daemon.serve()
+        elif action == "stop":
+            if daemon.stop():
+                console.print("  [bold green]✔[/bold green] Daemon     [cyan]stopped[/cyan]")
+            else:
+                console.print("  [dim][i] Daemon is not running.[/dim]")
+        elif action == "status":
+            reply = daemon.request("ping")
+            if reply is None:
+                console.print("  [dim][i] Daemon is not running.[/dim]")
+            else:
+                console.print(f"  [bold green]✔[/bold green] Daemon     [cyan]PID {reply['pid']}, up {int(reply['uptime'])}s, {len(reply['devices'])} device(s)[/cyan]")
+        else:
+            console.print(f"[bold red][!] Unknown daemon action '{action}'. Use start, stop, status or run.[/bold red]")
+            raise typer.Exit(1)
+    except daemon.DaemonError as e:
+        console.print(f"[bold red][!] {e}[/bold red]")
+        raise typer.Exit(1)
+
 @app.command(name="update")
 def cmd_update():
     """Automatically update the script to the latest version from GitHub."""
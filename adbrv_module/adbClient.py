@@ -0,0 +1,452 @@
+"""
+Native client for the adb server host protocol
+
+Talks to the local adb server over its socket (TCP 5037 by default) instead of
+spawning the adb binary for every call. Only the services adbrv needs are
+implemented: host:devices, host:track-devices, host:transport, shell:,
+reverse: and sync: (STAT/RECV/SEND).
+"""
+
+import os
+import socket
+import struct
+import threading
+import time
+import uuid
+from typing import NamedTuple
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5037
+
+# Seconds to stay on the subprocess path after the server could not be reached
+UNAVAILABLE_RETRY = 5.0
+
+# Shell protocol v2 packet ids (see adb's shell_protocol.h)
+SHELL_STDIN = 0
+SHELL_STDOUT = 1
+SHELL_STDERR = 2
+SHELL_EXIT = 3
+SHELL_CLOSE_STDIN = 4
+
+SYNC_CHUNK = 64 * 1024
+
+
+class AdbProtocolError(Exception):
+    pass
+
+
+class AdbServerUnavailable(AdbProtocolError):
+    pass
+
+
+class AdbTimeout(AdbProtocolError):
+    pass
+
+
+class AdbSyncFailure(AdbProtocolError):
+    """FAIL reply to a sync request (missing or unreadable file): retrying will not help"""
+
+
+class ShellResult(NamedTuple):
+    stdout: str
+    stderr: str
+    returncode: int
+
+
+class SyncStat(NamedTuple):
+    mode: int
+    size: int
+    mtime: int
+
+
+def server_address():
+    """Resolve the adb server address the same way the adb binary does"""
+    spec = os.environ.get("ADB_SERVER_SOCKET", "")
+    if spec.startswith("localfilesystem:"):
+        return spec.split(":", 1)[1]
+    if spec.startswith("tcp:"):
+        host, _, port = spec[4:].rpartition(":")
+        return (host or DEFAULT_HOST, int(port))
+    host = os.environ.get("ANDROID_ADB_SERVER_ADDRESS") or DEFAULT_HOST
+    port = int(os.environ.get("ANDROID_ADB_SERVER_PORT") or DEFAULT_PORT)
+    return (host, port)
+
+
+def parse_device_list(text):
+    """Parse a host:devices payload into (serial, state) pairs"""
+    devices = []
+    for line in text.splitlines():
+        parts = line.split("\t")
+        if len(parts) >= 2 and parts[0]:
+            devices.append((parts[0], parts[1].strip()))
+    return devices
+
+
+class TrackParser:
+    """
+    Incremental parser for host:track-devices output (also what `adb track-devices` prints):
+    each frame is 4 hex digits of length followed by that many bytes of serial/state lines.
+    """
+
+    def __init__(self):
+        self.buf = b""
+
+    def feed(self, data):
+        """Add received bytes; returns the device lists of every frame completed by them"""
+        self.buf += data
+        frames = []
+        while len(self.buf) >= 4:
+            try:
+                length = int(self.buf[:4], 16)
+            except ValueError:
+                raise AdbProtocolError("Malformed track-devices frame.")
+            if len(self.buf) < 4 + length:
+                break
+            frames.append(parse_device_list(self.buf[4:4 + length].decode("utf-8", "replace")))
+            self.buf = self.buf[4 + length:]
+        return frames
+
+
+class AdbConnection:
+    """One socket to the adb server, speaking the length-prefixed host protocol"""
+
+    def __init__(self, sock, span=None):
+        self.sock = sock
+        self.span = span
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if self.span is not None and exc_type is not None:
+            self.span.finish(failed=True)
+        self.close()
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        if self.span is not None:
+            self.span.finish()
+
+    def send(self, service):
+        data = service.encode("utf-8")
+        if self.span is not None:
+            if service.startswith("host:transport:"):
+                self.span.device = service[len("host:transport:"):]
+            elif not self.span.argv or self.span.argv == "host:transport-any":
+                self.span.argv = service
+                if service.startswith("host-serial:"):
+                    self.span.device = service.split(":")[1]
+        self.send_raw(b"%04x" % len(data) + data)
+
+    def send_raw(self, data):
+        if self.span is not None:
+            self.span.bytes_in += len(data)
+        try:
+            self.sock.sendall(data)
+        except socket.timeout:
+            raise AdbTimeout("Timed out writing to adb server.")
+        except OSError as e:
+            raise AdbProtocolError(f"Connection to adb server lost: {e}")
+
+    def recv_some(self, size=SYNC_CHUNK):
+        """Read up to size bytes; returns b'' once the peer closes"""
+        try:
+            data = self.sock.recv(size)
+        except socket.timeout:
+            raise AdbTimeout("Timed out waiting for adb server.")
+        except OSError as e:
+            raise AdbProtocolError(f"Connection to adb server lost: {e}")
+        if self.span is not None:
+            self.span.bytes_out += len(data)
+        return data
+
+    def recv_exact(self, size):
+        chunks = []
+        remaining = size
+        while remaining:
+            chunk = self.recv_some(min(remaining, SYNC_CHUNK))
+            if not chunk:
+                raise AdbProtocolError("Connection closed by adb server.")
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b"".join(chunks)
+
+    def recv_until_close(self):
+        chunks = []
+        while True:
+            chunk = self.recv_some()
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+    def read_status(self):
+        status = self.recv_exact(4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise AdbProtocolError(self.read_string())
+        raise AdbProtocolError(f"Unexpected adb reply: {status!r}")
+
+    def read_string(self):
+        try:
+            length = int(self.recv_exact(4), 16)
+        except ValueError:
+            raise AdbProtocolError("Malformed length prefix from adb server.")
+        return self.recv_exact(length).decode("utf-8", "replace")
+
+
+# The legacy shell: service has no exit status, so the command prints it after a marker
+
+def legacy_marker():
+    return f"ADBRV_RC_{uuid.uuid4().hex}:"
+
+
+def legacy_shell_service(command, marker):
+    return f"shell:{command}\necho {marker}$?"
+
+
+def split_legacy_output(output, marker):
+    """(output before the marker, exit status) of a legacy_shell_service() reply"""
+    head, found, tail = output.rpartition(marker)
+    if not found:
+        raise AdbProtocolError("Shell closed without an exit status.")
+    try:
+        return head, int(tail.strip())
+    except ValueError:
+        return head, 255
+
+
+class AdbClient:
+    """Client for the adb server; every method opens its own short-lived connection"""
+
+    def __init__(self, address=None, timeout=10.0):
+        self.address = address or server_address()
+        self.timeout = timeout
+        self._features = {}
+
+    def connect(self, timeout=None, trace=True):
+        """Open a server connection; trace=False for long-lived channels that trace per command"""
+        from .profiler import span
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            if isinstance(self.address, str):
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(timeout)
+                sock.connect(self.address)
+            else:
+                sock = socket.create_connection(self.address, timeout=timeout)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as e:
+            raise AdbServerUnavailable(f"adb server not reachable at {self.address}: {e}")
+        sock.settimeout(timeout)
+        return AdbConnection(sock, span("adb-native") if trace else None)
+
+    def host_query(self, service, timeout=None):
+        with self.connect(timeout) as conn:
+            conn.send(service)
+            conn.read_status()
+            return conn.read_string()
+
+    def devices(self):
+        return parse_device_list(self.host_query("host:devices"))
+
+    def track_devices(self):
+        """Yield the full (serial, state) list every time the server reports a change"""
+        conn = self.connect(timeout=None, trace=False)
+        conn.sock.settimeout(None)
+        try:
+            conn.send("host:track-devices")
+            conn.read_status()
+            while True:
+                yield parse_device_list(conn.read_string())
+        finally:
+            conn.close()
+
+    def transport(self, serial, service, timeout=None, trace=True):
+        """Switch a fresh connection to a device and open a service on it"""
+        conn = self.connect(timeout, trace)
+        try:
+            conn.send(f"host:transport:{serial}" if serial else "host:transport-any")
+            conn.read_status()
+            conn.send(service)
+            conn.read_status()
+        except Exception:
+            if conn.span is not None:
+                conn.span.finish(failed=True)
+            conn.close()
+            raise
+        return conn
+
+    def features(self, serial):
+        key = serial or ""
+        if key not in self._features:
+            service = f"host-serial:{serial}:features" if serial else "host:features"
+            self._features[key] = set(self.host_query(service).split(","))
+        return self._features[key]
+
+    def forget(self, serial):
+        """Drop cached per-device state (call when a device reconnects)"""
+        self._features.pop(serial or "", None)
+
+    def shell(self, serial, command, timeout=None):
+        if "shell_v2" in self.features(serial):
+            return self._shell_v2(serial, command, timeout)
+        return self._shell_legacy(serial, command, timeout)
+
+    def _shell_v2(self, serial, command, timeout):
+        stdout, stderr = [], []
+        with self.transport(serial, f"shell,v2,raw:{command}", timeout) as conn:
+            while True:
+                packet = read_shell_packet(conn)
+                if packet is None:
+                    raise AdbProtocolError("Shell closed without an exit status.")
+                packet_id, payload = packet
+                if packet_id == SHELL_STDOUT:
+                    stdout.append(payload)
+                elif packet_id == SHELL_STDERR:
+                    stderr.append(payload)
+                elif packet_id == SHELL_EXIT:
+                    returncode = payload[0] if payload else 255
+                    if conn.span is not None:
+                        conn.span.returncode = returncode
+                    break
+        return ShellResult(decode_output(b"".join(stdout)), decode_output(b"".join(stderr)), returncode)
+
+    def _shell_legacy(self, serial, command, timeout):
+        marker = legacy_marker()
+        with self.transport(serial, legacy_shell_service(command, marker), timeout) as conn:
+            head, returncode = split_legacy_output(decode_output(conn.recv_until_close()), marker)
+            if conn.span is not None:
+                conn.span.returncode = returncode
+        return ShellResult(head, "", returncode)
+
+    def exec_out(self, serial, command, timeout=None):
+        """Raw stdout of command (exec: service, no pty, no exit status)"""
+        with self.transport(serial, f"exec:{command}", timeout) as conn:
+            return conn.recv_until_close()
+
+    def exec_stream(self, serial, command, sink, timeout=None, trace=True):
+        """Feed the raw stdout of command to sink(chunk) as it arrives; returns the byte count (trace=False for long-lived watches)"""
+        total = 0
+        with self.transport(serial, f"exec:{command}", timeout, trace) as conn:
+            while True:
+                chunk = conn.recv_some()
+                if not chunk:
+                    return total
+                sink(chunk)
+                total += len(chunk)
+
+    def reverse_list(self, serial):
+        with self.transport(serial, "reverse:list-forward") as conn:
+            return conn.read_string()
+
+    def reverse_forward(self, serial, remote, local):
+        with self.transport(serial, f"reverse:forward:{remote};{local}") as conn:
+            conn.read_status()
+
+    def reverse_remove_all(self, serial):
+        with self.transport(serial, "reverse:killforward-all") as conn:
+            conn.read_status()
+
+    def stat(self, serial, path):
+        with self.transport(serial, "sync:") as conn:
+            conn.send_raw(sync_request(b"STAT", path))
+            ident, mode, size, mtime = struct.unpack("<4sIII", conn.recv_exact(16))
+            if ident != b"STAT":
+                raise AdbProtocolError(f"Unexpected sync reply: {ident!r}")
+            conn.send_raw(sync_request(b"QUIT", ""))
+        return SyncStat(mode, size, mtime)
+
+    def pull(self, serial, path, fileobj, progress=None, timeout=None):
+        """Stream a device file into fileobj over sync:RECV; returns bytes written"""
+        total = 0
+        with self.transport(serial, "sync:", timeout) as conn:
+            conn.send_raw(sync_request(b"RECV", path))
+            while True:
+                ident, length = struct.unpack("<4sI", conn.recv_exact(8))
+                if ident == b"DATA":
+                    data = conn.recv_exact(length)
+                    fileobj.write(data)
+                    total += length
+                    if progress:
+                        progress(length)
+                elif ident == b"DONE":
+                    break
+                elif ident == b"FAIL":
+                    raise AdbSyncFailure(conn.recv_exact(length).decode("utf-8", "replace"))
+                else:
+                    raise AdbProtocolError(f"Unexpected sync reply: {ident!r}")
+            conn.send_raw(sync_request(b"QUIT", ""))
+        return total
+
+
+    def push(self, serial, fileobj, path, mode=0o644, progress=None, timeout=None):
+        """Stream fileobj to a device file over sync:SEND (created with mode); returns bytes sent"""
+        total = 0
+        with self.transport(serial, "sync:", timeout) as conn:
+            conn.send_raw(sync_request(b"SEND", f"{path},{0o100000 | mode}"))
+            for chunk in iter(lambda: fileobj.read(SYNC_CHUNK), b""):
+                conn.send_raw(b"DATA" + struct.pack("<I", len(chunk)) + chunk)
+                total += len(chunk)
+                if progress:
+                    progress(len(chunk))
+            conn.send_raw(b"DONE" + struct.pack("<I", int(time.time())))
+            ident, length = struct.unpack("<4sI", conn.recv_exact(8))
+            if ident == b"FAIL":
+                raise AdbSyncFailure(conn.recv_exact(length).decode("utf-8", "replace"))
+            if ident != b"OKAY":
+                raise AdbProtocolError(f"Unexpected sync reply: {ident!r}")
+            conn.send_raw(sync_request(b"QUIT", ""))
+        return total
+
+
+def read_shell_packet(conn):
+    """Read one shell v2 packet as (id, payload); None on a clean close"""
+    first = conn.recv_some(1)
+    if not first:
+        return None
+    header = first + conn.recv_exact(4)
+    packet_id, length = struct.unpack("<BI", header)
+    return packet_id, conn.recv_exact(length)
+
+
+def shell_packet(packet_id, payload=b""):
+    return struct.pack("<BI", packet_id, len(payload)) + payload
+
+
+def sync_request(ident, path):
+    data = path.encode("utf-8")
+    return ident + struct.pack("<I", len(data)) + data
+
+
+def decode_output(data):
+    return data.decode("utf-8", "replace").replace("\r\n", "\n")
+
+
+_client = None
+_client_lock = threading.Lock()
+_unavailable_until = 0.0
+
+
+def get_client():
+    """Shared client, or None while the native path is disabled or the server is down"""
+    global _client
+    if os.environ.get("ADBRV_NATIVE_ADB", "1") == "0":
+        return None
+    if time.monotonic() < _unavailable_until:
+        return None
+    with _client_lock:
+        if _client is None:
+            from . import replay
+            # Recording and replay go through the same requests, answered by replay.Client
+            _client = replay.Client() if replay.mode() else AdbClient()
+        return _client
+
+
+def mark_unavailable():
+    """Route calls through the adb binary for a while (it also starts the server)"""
+    global _unavailable_until
+    _unavailable_until = time.monotonic() + UNAVAILABLE_RETRY
@@ -0,0 +1,429 @@
+"""
+APK metadata without aapt or frida
+
+Decodes the binary AndroidManifest.xml (AXML) and resources.arsc of an APK in
+pure Python: package, label, versionName, versionCode, minSdk and the ABIs
+of bundled native code. Only the zip central directory, the manifest entry and
+the parts of resources.arsc needed to resolve the label are read, so the same
+code works on a local file and, through RemoteFile, on an APK that is still on
+the device (ranged `dd` reads over exec-out).
+"""
+
+import io
+import struct
+import zipfile
+from typing import NamedTuple, Optional, Tuple
+
+# Chunk types (frameworks/base/libs/androidfw/include/androidfw/ResourceTypes.h)
+RES_STRING_POOL = 0x0001
+RES_TABLE = 0x0002
+RES_XML = 0x0003
+RES_XML_START_ELEMENT = 0x0102
+RES_XML_RESOURCE_MAP = 0x0180
+RES_TABLE_PACKAGE = 0x0200
+RES_TABLE_TYPE = 0x0201
+
+UTF8_FLAG = 0x100
+TYPE_FLAG_SPARSE = 0x01
+TYPE_FLAG_OFFSET16 = 0x02
+ENTRY_FLAG_COMPLEX = 0x0001
+ENTRY_FLAG_COMPACT = 0x0008
+NO_ENTRY = 0xFFFFFFFF
+
+TYPE_REFERENCE = 0x01
+TYPE_STRING = 0x03
+TYPE_INT_DEC = 0x10
+TYPE_INT_HEX = 0x11
+
+# android:* attribute resource ids, used when attribute names are stripped
+ATTR_IDS = {
+    0x01010001: "label",
+    0x0101020C: "minSdkVersion",
+    0x0101021B: "versionCode",
+    0x0101021C: "versionName",
+}
+
+MAX_REFERENCE_DEPTH = 5
+REMOTE_BLOCK = 64 << 10
+
+
+class ApkInfoError(Exception):
+    pass
+
+
+class ApkInfo(NamedTuple):
+    package: str
+    label: Optional[str]
+    version_name: Optional[str]
+    version_code: Optional[int]
+    min_sdk: Optional[int]
+    abis: Tuple[str, ...]
+
+
+def _read(f, offset, size):
+    f.seek(offset)
+    data = f.read(size)
+    if len(data) != size:
+        raise ApkInfoError("Truncated resource data")
+    return data
+
+
+class _StringPool:
+    """Lazy view of a ResStringPool chunk at offset in f"""
+
+    def __init__(self, f, offset):
+        self.f = f
+        _, header_size, _, self.count, _, flags, strings_start, _ = struct.unpack("<HHIIIIII", _read(f, offset, 28))
+        self.utf8 = bool(flags & UTF8_FLAG)
+        self.offsets_at = offset + header_size
+        self.strings_at = offset + strings_start
+        self._cache = {}
+
+    def get(self, index):
+        if not 0 <= index < self.count:
+            return None
+        if index not in self._cache:
+            (rel,) = struct.unpack("<I", _read(self.f, self.offsets_at + 4 * index, 4))
+            self._cache[index] = self._decode(self.strings_at + rel)
+        return self._cache[index]
+
+    def _decode(self, at):
+        if self.utf8:
+            head = _read(self.f, at, 4)
+            pos = 2 if head[0] & 0x80 else 1  # character count, unused
+            length = head[pos]
+            if length & 0x80:
+                length = ((length & 0x7F) << 8) | head[pos + 1]
+                pos += 2
+            else:
+                pos += 1
+            return _read(self.f, at + pos, length).decode("utf-8", "replace")
+        (length,) = struct.unpack("<H", _read(self.f, at, 2))
+        pos = 2
+        if length & 0x8000:
+            (low,) = struct.unpack("<H", _read(self.f, at + 2, 2))
+            length = ((length & 0x7FFF) << 16) | low
+            pos = 4
+        return _read(self.f, at + pos, length * 2).decode("utf-16-le", "replace")
+
+
+def parse_manifest(data):
+    """Manifest facts from binary AndroidManifest.xml bytes: {"package", "versionCode", ..., "label"}"""
+    f = io.BytesIO(data)
+    kind, header_size, size = struct.unpack("<HHI", _read(f, 0, 8))
+    if kind != RES_XML:
+        raise ApkInfoError("Not a binary XML document")
+    strings, resource_ids = None, []
+    facts = {}
+    pos = header_size
+    while pos + 8 <= min(size, len(data)):
+        kind, header_size, chunk_size = struct.unpack("<HHI", _read(f, pos, 8))
+        if chunk_size < 8:
+            raise ApkInfoError("Corrupt binary XML chunk")
+        if kind == RES_STRING_POOL:
+            strings = _StringPool(f, pos)
+        elif kind == RES_XML_RESOURCE_MAP:
+            count = (chunk_size - header_size) // 4
+            resource_ids = struct.unpack(f"<{count}I", _read(f, pos + header_size, 4 * count))
+        elif kind == RES_XML_START_ELEMENT and strings is not None:
+            _start_element(f, pos + header_size, strings, resource_ids, facts)
+        pos += chunk_size
+    if "package" not in facts:
+        raise ApkInfoError("No <manifest package> in AndroidManifest.xml")
+    return facts
+
+
+def _start_element(f, at, strings, resource_ids, facts):
+    _, name, attr_start, attr_size, attr_count = struct.unpack("<IIHHH", _read(f, at, 14))
+    element = strings.get(name)
+    if element not in ("manifest", "uses-sdk", "application"):
+        return
+    for i in range(attr_count):
+        _, attr_name, raw, _, _, data_type, value = struct.unpack(
+            "<IIIHBBI", _read(f, at + attr_start + i * attr_size, 20)
+        )
+        key = ATTR_IDS.get(resource_ids[attr_name]) if attr_name < len(resource_ids) else None
+        key = key or strings.get(attr_name)
+        if data_type == TYPE_STRING:
+            value = strings.get(value)
+        elif data_type == TYPE_REFERENCE:
+            value = ("@", value)
+        elif data_type not in (TYPE_INT_DEC, TYPE_INT_HEX):
+            value = strings.get(raw) if raw != NO_ENTRY else None
+        if element == "manifest" and key in ("package", "versionCode", "versionName"):
+            facts[key] = value
+        elif element == "uses-sdk" and key == "minSdkVersion":
+            facts["minSdk"] = value
+        elif element == "application" and key == "label":
+            facts["label"] = value
+
+
+def _config_rank(config):
+    """Lower is better: the default configuration, then English, then anything else"""
+    language = config[8:10] if len(config) >= 10 else b"\0\0"
+    rest = config[4:8] + config[10:]
+    if language == b"\0\0":
+        return 0 if not any(rest) else 1
+    return 2 if language == b"en" else 3
+
+
+class ResourceTable:
+    """Lazy resources.arsc reader: resolves single resource ids with a handful of reads"""
+
+    def __init__(self, f):
+        self.f = f
+        kind, header_size, self.size = struct.unpack("<HHI", _read(f, 0, 8))
+        if kind != RES_TABLE:
+            raise ApkInfoError("Not a resource table")
+        self.strings = None
+        self.packages = {}  # package id -> offset of its first type/spec chunk and end
+        pos = header_size
+        while pos + 8 <= self.size:
+            kind, chunk_header, chunk_size = struct.unpack("<HHI", _read(f, pos, 8))
+            if chunk_size < 8:
+                raise ApkInfoError("Corrupt resource table chunk")
+            if kind == RES_STRING_POOL and self.strings is None:
+                self.strings = _StringPool(f, pos)
+            elif kind == RES_TABLE_PACKAGE:
+                (package_id,) = struct.unpack("<I", _read(f, pos + 8, 4))
+                self.packages[package_id] = (pos, chunk_header, chunk_size)
+            pos += chunk_size
+        self._types = {}
+
+    def _type_chunks(self, package_id, type_id):
+        """(offset, header size, config bytes) of every type chunk of type_id"""
+        key = (package_id, type_id)
+        if key in self._types:
+            return self._types[key]
+        found = []
+        if package_id in self.packages:
+            start, header_size, size = self.packages[package_id]
+            pos, end = start + header_size, start + size
+            while pos + 8 <= end:
+                kind, chunk_header, chunk_size = struct.unpack("<HHI", _read(self.f, pos, 8))
+                if chunk_size < 8:
+                    break
+                if kind == RES_TABLE_TYPE:
+                    chunk_type_id = _read(self.f, pos + 8, 1)[0]
+                    if chunk_type_id == type_id:
+                        (config_size,) = struct.unpack("<I", _read(self.f, pos + 20, 4))
+                        found.append((pos, chunk_header, _read(self.f, pos + 20, min(config_size, chunk_header - 20))))
+                pos += chunk_size
+        self._types[key] = found
+        return found
+
+    def _entry(self, chunk, chunk_header, entry_index):
+        """(data type, data) of entry_index in one type chunk, or None"""
+        _, flags, _, count, entries_start = struct.unpack("<BBHII", _read(self.f, chunk + 8, 12))
+        if flags & TYPE_FLAG_SPARSE:
+            # (u16 index, u16 offset / 4) pairs sorted by index
+            lo, hi = 0, count
+            offset = None
+            while lo < hi:
+                mid = (lo + hi) // 2
+                idx, off = struct.unpack("<HH", _read(self.f, chunk + chunk_header + 4 * mid, 4))
+                if idx == entry_index:
+                    offset = off * 4
+                    break
+                if idx < entry_index:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            if offset is None:
+                return None
+        elif entry_index >= count:
+            return None
+        elif flags & TYPE_FLAG_OFFSET16:
+            (off,) = struct.unpack("<H", _read(self.f, chunk + chunk_header + 2 * entry_index, 2))
+            if off == 0xFFFF:
+                return None
+            offset = off * 4
+        else:
+            (offset,) = struct.unpack("<I", _read(self.f, chunk + chunk_header + 4 * entry_index, 4))
+            if offset == NO_ENTRY:
+                return None
+        at = chunk + entries_start + offset
+        size, entry_flags, data = struct.unpack("<HHI", _read(self.f, at, 8))
+        if entry_flags & ENTRY_FLAG_COMPACT:
+            return entry_flags >> 8, data
+        if entry_flags & ENTRY_FLAG_COMPLEX:
+            return None
+        _, _, data_type, value = struct.unpack("<HBBI", _read(self.f, at + size, 8))
+        return data_type, value
+
+    def resolve(self, res_id, depth=0):
+        """String value of a resource id in the best configuration, following references"""
+        package_id, type_id, entry_index = res_id >> 24, (res_id >> 16) & 0xFF, res_id & 0xFFFF
+        candidates = sorted(self._type_chunks(package_id, type_id), key=lambda c: _config_rank(c[2]))
+        for chunk, chunk_header, _ in candidates:
+            entry = self._entry(chunk, chunk_header, entry_index)
+            if entry is None:
+                continue
+            data_type, value = entry
+            if data_type == TYPE_STRING and self.strings is not None:
+                return self.strings.get(value)
+            if data_type == TYPE_REFERENCE and depth < MAX_REFERENCE_DEPTH:
+                return self.resolve(value, depth + 1)
+            return None
+        return None
+
+
+class _Window(io.RawIOBase):
+    """Read-only view of size bytes of f starting at start"""
+
+    def __init__(self, f, start, size):
+        self.f, self.start, self.size, self.pos = f, start, size, 0
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.pos, io.SEEK_END: self.size}[whence]
+        self.pos = max(0, base + offset)
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self.pos
+        size = max(0, min(size, self.size - self.pos))
+        self.f.seek(self.start + self.pos)
+        data = self.f.read(size)
+        self.pos += len(data)
+        return data
+
+
+def _stored_entry(zf, fileobj, info):
+    """Seekable window over an uncompressed zip entry, without reading it"""
+    fileobj.seek(info.header_offset)
+    header = fileobj.read(30)
+    if len(header) != 30 or header[:4] != b"PK\x03\x04":
+        raise ApkInfoError(f"Bad local header for {info.filename}")
+    name_len, extra_len = struct.unpack("<HH", header[26:30])
+    return _Window(fileobj, info.header_offset + 30 + name_len + extra_len, info.file_size)
+
+
+def read_info(source):
+    """ApkInfo of an APK given as a path or a seekable binary file object"""
+    try:
+        zf = zipfile.ZipFile(source)
+    except (zipfile.BadZipFile, ValueError) as e:
+        raise ApkInfoError(f"Not an APK: {e}")
+    try:
+        with zf:
+            return _read_info(zf)
+    except (struct.error, zipfile.BadZipFile, ValueError, IndexError) as e:
+        raise ApkInfoError(f"Bad APK: {e}")
+
+
+def _read_info(zf):
+    try:
+        facts = parse_manifest(zf.read("AndroidManifest.xml"))
+    except KeyError:
+        raise ApkInfoError("No AndroidManifest.xml")
+    label = facts.get("label")
+    if isinstance(label, tuple):
+        label = _resolve_label(zf, label[1])
+    abis = {n.split("/")[1] for n in zf.namelist() if n.startswith("lib/") and n.count("/") >= 2 and n.endswith(".so")}
+
+    def integer(key):
+        value = facts.get(key)
+        return value if isinstance(value, int) else None
+
+    version_name = facts.get("versionName")
+    return ApkInfo(
+        package=facts["package"],
+        label=label if isinstance(label, str) and label else None,
+        version_name=version_name if isinstance(version_name, str) else None,
+        version_code=integer("versionCode"),
+        min_sdk=integer("minSdk"),
+        abis=tuple(sorted(abis)),
+    )
+
+
+def _resolve_label(zf, res_id):
+    try:
+        info = zf.getinfo("resources.arsc")
+    except KeyError:
+        return None
+    try:
+        if info.compress_type == zipfile.ZIP_STORED and zf.fp is not None:
+            table = ResourceTable(_stored_entry(zf, zf.fp, info))
+        else:
+            table = ResourceTable(io.BytesIO(zf.read(info)))
+        return table.resolve(res_id)
+    except (struct.error, zipfile.BadZipFile, ValueError, IndexError, ApkInfoError):
+        return None
+
+
+class RemoteFile(io.RawIOBase):
+    """Seekable read-only view of a device file, fetched in cached blocks with `dd` over exec-out"""
+
+    def __init__(self, serial, path, size, block=REMOTE_BLOCK):
+        self.serial, self.path, self.size, self.block = serial, path, size, block
+        self.pos = 0
+        self.blocks = {}
+        self.reads = 0
+
+    @classmethod
+    def open(cls, serial, path):
+        from .devices import adb_shell
+        out = adb_shell(["stat", "-c", "%s", path], serial, timeout=5)
+        if not out or not out.strip().isdigit():
+            raise ApkInfoError(f"Cannot stat {path}")
+        return cls(serial, path, int(out.strip()))
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.pos, io.SEEK_END: self.size}[whence]
+        self.pos = max(0, base + offset)
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def _fetch(self, first, last):
+        """Load blocks first..last (inclusive) that are not cached, in one round trip per run"""
+        from .devices import exec_out
+        missing = [b for b in range(first, last + 1) if b not in self.blocks]
+        while missing:
+            run = 1
+            while run < len(missing) and missing[run] == missing[0] + run:
+                run += 1
+            start = missing[0]
+            data = exec_out(f"dd if={self.path} bs={self.block} skip={start} count={run} 2>/dev/null", self.serial, timeout=30)
+            self.reads += 1
+            if data is None:
+                raise ApkInfoError(f"Cannot read {self.path}")
+            for i in range(run):
+                self.blocks[start + i] = data[i * self.block:(i + 1) * self.block]
+            missing = missing[run:]
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self.pos
+        size = max(0, min(size, self.size - self.pos))
+        if not size:
+            return b""
+        first, last = self.pos // self.block, (self.pos + size - 1) // self.block
+        self._fetch(first, last)
+        data = b"".join(self.blocks[b] for b in range(first, last + 1))
+        skip = self.pos - first * self.block
+        data = data[skip:skip + size]
+        self.pos += len(data)
+        return data
+
+
+def read_remote_info(serial, path):
+    """ApkInfo of an APK on the device, reading only the zip parts it needs"""
+    return read_info(RemoteFile.open(serial, path))
@@ -0,0 +1,214 @@
+"""
+Content-addressed local store of pulled APKs
+
+Every pulled APK is kept once under the cache directory, named by its SHA-256.
+Before a pull, each device file is looked up by (path, size, versionCode),
+which needs no device work, then by the SHA-256 computed on the device
+(`sha256sum`, one round trip for all files). A file found in the store is not
+transferred: the destination is materialized from the store as a reflink
+where the filesystem supports it, otherwise a copy. Either way it is a file
+of its own that tools may modify in place; stored objects are never linked
+out of the cache.
+
+The store is capped at ADBRV_APK_CACHE_MB (default 4096); the least recently
+used objects are evicted first.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+LIMIT_BYTES = int(os.environ.get("ADBRV_APK_CACHE_MB", "4096")) << 20
+
+_lock = threading.Lock()
+_index = None  # {"objects": {sha: {"size", "used"}}, "keys": {key: sha}}
+
+
+def _root():
+    from .utils import get_cache_dir
+    return get_cache_dir("apks")
+
+
+def _object_path(sha):
+    return os.path.join(_root(), sha[:2], f"{sha}.apk")
+
+
+def _index_path():
+    return os.path.join(_root(), "index.json")
+
+
+def _load():
+    # Caller holds _lock
+    global _index
+    if _index is None:
+        try:
+            with open(_index_path()) as f:
+                _index = json.load(f)
+        except (OSError, ValueError):
+            _index = {"objects": {}, "keys": {}}
+    return _index
+
+
+def _save():
+    # Caller holds _lock
+    path = _index_path()
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump(_index, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def file_key(path, size, version_code):
+    return f"{path}|{size}|{version_code}"
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def lookup(serial, files, version_code=None, digests=None):
+    """
+    Store objects for device files, {path: sha}, for files given as (path, size) pairs.
+    Known (path, size, versionCode) keys cost nothing; the rest are hashed on the device
+    in one round trip (skipped when the size is unknown or nothing stored has that size).
+    digests, when given, receives every hash computed on the device, stored or not, so the
+    pull of the files the store lacks can check against them instead of hashing again.
+    """
+    found, unknown = {}, []
+    with _lock:
+        index = _load()
+        sizes = {meta["size"] for meta in index["objects"].values()}
+        for path, size in files:
+            sha = index["keys"].get(file_key(path, size, version_code))
+            if sha in index["objects"] and os.path.exists(_object_path(sha)):
+                found[path] = sha
+            elif size in sizes:
+                unknown.append(path)
+    if unknown:
+        from .devices import remote_sha256
+        for path, sha in remote_sha256(serial, unknown).items():
+            if digests is not None:
+                digests[path] = sha
+            with _lock:
+                index = _load()
+                if sha in index["objects"] and os.path.exists(_object_path(sha)):
+                    found[path] = sha
+                    index["keys"][file_key(path, dict(files)[path], version_code)] = sha
+                    _save()
+    return found
+
+
+def _clone(src, dest):
+    """Reflink src to dest where the filesystem supports it (Linux FICLONE); False otherwise"""
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    FICLONE = 0x40049409
+    try:
+        with open(src, "rb") as s, open(dest, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return True
+    except OSError:
+        try:
+            os.unlink(dest)
+        except OSError:
+            pass
+        return False
+
+
+def materialize(sha, dest):
+    """Create dest from the stored object (reflink, else copy); returns its size, or None on failure"""
+    src = _object_path(sha)
+    try:
+        if os.path.lexists(dest):
+            os.unlink(dest)
+        # Never a hardlink: it would hand out the read-only object itself, and a write
+        # after a chmod would silently change the store
+        if not _clone(src, dest):
+            shutil.copyfile(src, dest)
+        size = os.path.getsize(dest)
+    except OSError:
+        return None
+    touch(sha)
+    return size
+
+
+def touch(sha):
+    with _lock:
+        index = _load()
+        if sha in index["objects"]:
+            index["objects"][sha]["used"] = time.time()
+            _save()
+
+
+def ingest(path, remote=None, version_code=None, sha=None):
+    """
+    Add a local file to the store (keyed by remote path too, when given); returns its sha256,
+    or None on failure. sha is the file's digest when the caller already has it (a verified pull).
+    """
+    try:
+        sha = sha or sha256_file(path)
+        size = os.path.getsize(path)
+    except OSError:
+        return None
+    target = _object_path(sha)
+    # The copy runs without the lock: other workers' lookups must not wait behind a large APK
+    if not os.path.exists(target):
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(target), mode=0o700, exist_ok=True)
+            # A copy (or reflink), not a link: the pulled file stays the caller's to modify
+            if not _clone(path, tmp):
+                shutil.copyfile(path, tmp)
+            os.chmod(tmp, 0o444)
+            os.replace(tmp, target)
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            return None
+    with _lock:
+        index = _load()
+        index["objects"][sha] = {"size": size, "used": time.time()}
+        if remote is not None:
+            index["keys"][file_key(remote, size, version_code)] = sha
+        _evict(index, keep=sha)
+        _save()
+    return sha
+
+
+def _evict(index, keep=None):
+    # Caller holds _lock
+    objects = index["objects"]
+    total = sum(meta["size"] for meta in objects.values())
+    for sha in sorted(objects, key=lambda s: objects[s]["used"]):
+        if total <= LIMIT_BYTES:
+            break
+        if sha == keep:
+            continue
+        try:
+            os.unlink(_object_path(sha))
+        except OSError:
+            pass
+        total -= objects.pop(sha)["size"]
+    alive = set(objects)
+    index["keys"] = {k: s for k, s in index["keys"].items() if s in alive}
+
+
+def usage():
+    """(objects, bytes) currently stored"""
+    with _lock:
+        objects = _load()["objects"]
+        return len(objects), sum(meta["size"] for meta in objects.values())
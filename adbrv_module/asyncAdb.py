@@ -0,0 +1,427 @@
+"""
+asyncio API for the device layer
+
+Async equivalents of get_connected_devices, adb_shell, get_proxy_status,
+get_reverse_ports, get_frida_status and pull_apk. They speak the adb server
+protocol over asyncio streams (falling back to asyncio subprocesses of the adb
+binary, like the blocking helpers do) so callers can await them with
+timeouts and cancellation instead of parking a thread per call.
+
+run_background() hands a coroutine to one shared event-loop thread for code
+that is not itself running inside an event loop; adb calls made there are
+scheduled at background priority.
+"""
+
+import asyncio
+import functools
+import os
+import struct
+import subprocess
+import threading
+
+from .adbClient import (
+    AdbProtocolError, AdbServerUnavailable, TrackParser,
+    SHELL_STDOUT, SHELL_EXIT,
+    get_client, mark_unavailable, parse_device_list, decode_output, sync_request,
+    legacy_marker, legacy_shell_service, split_legacy_output,
+)
+from .devices import AdbError, format_reverse_list
+from . import profiler, replay
+from .profiler import span
+from .scheduler import BACKGROUND, aslot, acoalesce, set_priority
+
+_features = {}
+
+
+async def _connect(address):
+    try:
+        if isinstance(address, str):
+            return await asyncio.open_unix_connection(address)
+        return await asyncio.open_connection(*address)
+    except OSError as e:
+        raise AdbServerUnavailable(f"adb server not reachable at {address}: {e}")
+
+
+class _Stream:
+    """asyncio counterpart of adbClient.AdbConnection"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.span = span("adb-native")
+
+    def close(self, failed=False):
+        self.writer.close()
+        self.span.finish(failed)
+
+    def write(self, data):
+        self.span.bytes_in += len(data)
+        self.writer.write(data)
+
+    async def send(self, service):
+        data = service.encode("utf-8")
+        self.write(b"%04x" % len(data) + data)
+        await self.writer.drain()
+
+    async def read_all(self):
+        data = await self.reader.read()
+        self.span.bytes_out += len(data)
+        return data
+
+    async def recv_exact(self, size):
+        try:
+            data = await self.reader.readexactly(size)
+        except asyncio.IncompleteReadError:
+            raise AdbProtocolError("Connection closed by adb server.")
+        self.span.bytes_out += size
+        return data
+
+    async def read_status(self):
+        status = await self.recv_exact(4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise AdbProtocolError(await self.read_string())
+        raise AdbProtocolError(f"Unexpected adb reply: {status!r}")
+
+    async def read_string(self):
+        try:
+            length = int(await self.recv_exact(4), 16)
+        except ValueError:
+            raise AdbProtocolError("Malformed length prefix from adb server.")
+        return (await self.recv_exact(length)).decode("utf-8", "replace")
+
+
+async def _open(address, service, serial=False):
+    """Connect, optionally switch to a device transport (serial=None means any), open service"""
+    stream = _Stream(*(await _connect(address)))
+    stream.span.argv = service
+    stream.span.device = serial or None
+    try:
+        if serial is not False:
+            await stream.send(f"host:transport:{serial}" if serial else "host:transport-any")
+            await stream.read_status()
+        await stream.send(service)
+        await stream.read_status()
+    except BaseException:
+        stream.close(failed=True)
+        raise
+    return stream
+
+
+async def _host_query(address, service):
+    stream = await _open(address, service)
+    try:
+        return await stream.read_string()
+    finally:
+        stream.close()
+
+
+async def _native(serial, fn, *args):
+    """Async twin of devices.native_call: (True, result) or (False, None) to fall back"""
+    client = get_client()
+    # These raw streams would bypass replay.Client: while recording or replaying, take run_adb
+    if client is None or replay.mode():
+        return False, None
+    try:
+        async with aslot(serial):
+            return True, await fn(client.address, *args)
+    except AdbServerUnavailable:
+        mark_unavailable()
+        return False, None
+
+
+async def run_adb(args, serial=None, timeout=None, input_bytes=None):
+    """Run the adb binary as an asyncio subprocess; returns (returncode, stdout_text)"""
+    adb_base = ["adb"]
+    if serial:
+        adb_base += ["-s", serial]
+    if replay.mode():
+        return await _run_recorded(adb_base + list(args), serial, timeout, input_bytes)
+    async with aslot(serial):
+        with span("adb", " ".join(args), serial) as sp:
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *(adb_base + list(args)),
+                    stdin=asyncio.subprocess.PIPE if input_bytes is not None else asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+                )
+            except OSError as e:
+                raise AdbError(f"Error running adb: {e}")
+            try:
+                out, _ = await asyncio.wait_for(proc.communicate(input_bytes), timeout)
+            except BaseException:
+                # Timeout or cancellation: don't leave the adb process behind
+                if proc.returncode is None:
+                    proc.kill()
+                raise
+            sp.returncode = proc.returncode
+            sp.bytes_in = len(input_bytes or b"")
+            sp.bytes_out = len(out)
+    return proc.returncode, decode_output(out)
+
+
+async def _run_recorded(argv, serial, timeout, input_bytes):
+    """run_adb through profiler.run on a worker thread, so the call is recorded or answered by the replay"""
+    run = functools.partial(profiler.run, argv, serial, input=input_bytes, capture_output=True, timeout=timeout,
+                            stdin=None if input_bytes is not None else subprocess.DEVNULL)
+    async with aslot(serial):
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(None, run)
+        except subprocess.TimeoutExpired:
+            raise asyncio.TimeoutError()
+        except OSError as e:
+            raise AdbError(f"Error running adb: {e}")
+    return result.returncode, decode_output(result.stdout)
+
+
+async def _shell(address, serial, command):
+    key = serial or ""
+    if key not in _features:
+        service = f"host-serial:{serial}:features" if serial else "host:features"
+        _features[key] = set((await _host_query(address, service)).split(","))
+    if "shell_v2" not in _features[key]:
+        marker = legacy_marker()
+        stream = await _open(address, legacy_shell_service(command, marker), serial)
+        try:
+            output, returncode = split_legacy_output(decode_output(await stream.read_all()), marker)
+            stream.span.returncode = returncode
+            return returncode, output
+        finally:
+            stream.close()
+    stream = await _open(address, f"shell,v2,raw:{command}", serial)
+    stdout = []
+    try:
+        while True:
+            # stderr and unknown packets are read and dropped, like adbClient does
+            packet_id, length = struct.unpack("<BI", await stream.recv_exact(5))
+            payload = await stream.recv_exact(length)
+            if packet_id == SHELL_STDOUT:
+                stdout.append(payload)
+            elif packet_id == SHELL_EXIT:
+                stream.span.returncode = payload[0] if payload else 255
+                return stream.span.returncode, decode_output(b"".join(stdout))
+    finally:
+        stream.close()
+
+
+async def get_connected_devices():
+    return await acoalesce(("devices",), _get_connected_devices)
+
+
+async def _get_connected_devices():
+    try:
+        ok, devices = await _native(None, lambda address: _host_query(address, "host:devices"))
+        if ok:
+            return [s for s, state in parse_device_list(devices) if state == "device"]
+    except AdbProtocolError:
+        pass
+    _, out = await run_adb(["devices"])
+    lines = out.strip().splitlines()[1:]
+    return [line.split()[0] for line in lines if '\tdevice' in line]
+
+
+async def adb_shell(cmd, serial=None, check=True, timeout=None):
+    """Same contract as devices.adb_shell: stripped stdout, None on failure when check is set"""
+    try:
+        ok, res = await asyncio.wait_for(_native(serial, _shell, serial, " ".join(cmd)), timeout)
+        if ok:
+            returncode, out = res
+            if check and returncode != 0:
+                return None
+            return out.strip()
+    except (AdbProtocolError, asyncio.TimeoutError):
+        return None if check else ""
+    try:
+        returncode, out = await run_adb(["shell"] + list(cmd), serial, timeout)
+    except asyncio.TimeoutError:
+        return None
+    if check and returncode != 0:
+        return None
+    return out.strip()
+
+
+async def get_proxy_status(serial=None):
+    out = await acoalesce(("proxy", serial), lambda: adb_shell(["settings", "get", "global", "http_proxy"], serial))
+    if out is None:
+        raise AdbError("Device disconnected or cannot get proxy status.")
+    return out
+
+
+async def get_reverse_ports(serial=None):
+    return await acoalesce(("reverse", serial), lambda: _get_reverse_ports(serial))
+
+
+async def _get_reverse_ports(serial):
+    async def _list(address):
+        stream = await _open(address, "reverse:list-forward", serial)
+        try:
+            return await stream.read_string()
+        finally:
+            stream.close()
+    try:
+        ok, out = await _native(serial, _list)
+    except AdbProtocolError:
+        raise AdbError("Device disconnected or cannot get reverse ports.")
+    if ok:
+        return format_reverse_list(out)
+    returncode, out = await run_adb(["reverse", "--list"], serial)
+    if returncode != 0:
+        raise AdbError("Device disconnected or cannot get reverse ports.")
+    return format_reverse_list(out)
+
+
+async def get_frida_status(serial=None):
+    from .fridaTools import format_frida_status, frida_processes
+    from .processTable import asnapshot
+    return format_frida_status(frida_processes(await asnapshot(serial)))
+
+
+async def pull_file(serial, remote, local):
+    """
+    Pull one device file to local over sync:RECV (or `adb pull`); returns bytes written.
+    Data goes to local + ".part", renamed only once the transfer completed.
+    """
+    part = local + ".part"
+
+    async def _recv(address):
+        stream = await _open(address, "sync:", serial)
+        total = 0
+        try:
+            stream.write(sync_request(b"RECV", remote))
+            with open(part, "wb") as f:
+                while True:
+                    ident, length = struct.unpack("<4sI", await stream.recv_exact(8))
+                    if ident == b"DATA":
+                        f.write(await stream.recv_exact(length))
+                        total += length
+                    elif ident == b"DONE":
+                        stream.write(sync_request(b"QUIT", ""))
+                        await stream.writer.drain()
+                        return total
+                    elif ident == b"FAIL":
+                        raise AdbProtocolError((await stream.recv_exact(length)).decode("utf-8", "replace"))
+                    else:
+                        raise AdbProtocolError(f"Unexpected sync reply: {ident!r}")
+        finally:
+            stream.close()
+    try:
+        ok, total = await _native(serial, _recv)
+        if ok:
+            os.replace(part, local)
+            return total
+    except AdbProtocolError as e:
+        raise AdbError(f"Cannot pull {remote}: {e}")
+    returncode, _ = await run_adb(["pull", remote, part], serial)
+    if returncode != 0:
+        raise AdbError(f"Cannot pull {remote}")
+    os.replace(part, local)
+    return os.path.getsize(local)
+
+
+async def pull_apk(package_name, dest_path=None, device=None, jobs=None):
+    """Non-interactive pull of every APK of a package, up to jobs files at a time; returns the local file paths"""
+    from .devices import PULL_CONCURRENCY
+    if device is None:
+        devices = await get_connected_devices()
+        if not devices:
+            raise AdbError("No devices connected.")
+        device = devices[0]
+    dest_path = os.path.abspath(dest_path or os.getcwd())
+    out = await adb_shell(["pm", "path", package_name], device)
+    paths = [line.split(":", 1)[1] for line in (out or "").splitlines() if line.startswith("package:")]
+    if not paths:
+        raise AdbError(f"Package {package_name} not found or has no APK paths.")
+    if len(paths) > 1:
+        dest_path = os.path.join(dest_path, f"{package_name}_apks")
+        os.makedirs(dest_path, exist_ok=True)
+    targets = [(p, os.path.join(dest_path, os.path.basename(p))) for p in paths]
+    limit = asyncio.Semaphore(max(1, jobs or PULL_CONCURRENCY))
+
+    async def pull_one(remote, local):
+        async with limit:
+            return await pull_file(device, remote, local)
+    await asyncio.gather(*(pull_one(remote, local) for remote, local in targets))
+    return [local for _, local in targets]
+
+
+async def track_devices():
+    """
+    Async generator yielding the full (serial, state) list each time it changes.
+    The stream is long-lived, so it takes no scheduler slot and is not traced.
+    While recording or replaying there is no stream: callers poll get_connected_devices.
+    """
+    if replay.mode():
+        return
+    client = get_client()
+    if client is not None:
+        try:
+            reader, writer = await _connect(client.address)
+        except AdbServerUnavailable:
+            mark_unavailable()
+        else:
+            try:
+                service = b"host:track-devices"
+                writer.write(b"%04x" % len(service) + service)
+                await writer.drain()
+                try:
+                    status = await reader.readexactly(4)
+                except asyncio.IncompleteReadError:
+                    raise AdbProtocolError("Connection closed by adb server.")
+                if status != b"OKAY":
+                    raise AdbProtocolError(f"track-devices refused: {status!r}")
+                async for entries in _track_frames(reader):
+                    yield entries
+            finally:
+                writer.close()
+            return
+    proc = await asyncio.create_subprocess_exec(
+        "adb", "track-devices", stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        async for entries in _track_frames(proc.stdout):
+            yield entries
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+
+
+async def _track_frames(reader):
+    parser = TrackParser()
+    while True:
+        data = await reader.read(4096)
+        if not data:
+            return
+        for entries in parser.feed(data):
+            yield entries
+
+
+def forget(serial):
+    """Drop cached per-device state (call when a device reconnects)"""
+    _features.pop(serial or "", None)
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _run_loop(loop):
+    set_priority(BACKGROUND)  # the shared loop only runs background refreshes
+    loop.run_forever()
+
+
+def background_loop():
+    """The shared event loop running on a single daemon thread"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_run_loop, args=(_loop,), name="adbrv-async", daemon=True).start()
+        return _loop
+
+
+def run_background(coro):
+    """Schedule coro on the shared loop; returns a concurrent.futures.Future (cancel() cancels it)"""
+    return asyncio.run_coroutine_threadsafe(coro, background_loop())
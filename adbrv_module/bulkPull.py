@@ -0,0 +1,366 @@
+"""
+Bulk pull of many packages from one or several devices
+
+Per device, a resolver thread resolves packages in batches (one shell loop of
+`pm path` and `stat` per batch) into a bounded queue, and up to `jobs` workers
+take packages off it and transfer them while later batches are still being
+resolved: the USB link stays busy instead of waiting on one adb round trip
+per package. Devices run side by side.
+
+Every finished package is recorded in a manifest (.adbrv-pull.json) in the
+destination directory; running the same pull again skips packages already
+pulled at the same versionCode whose files are still there, so an interrupted
+sweep resumes where it stopped. write_summary() saves the outcome as JSON.
+"""
+
+import fnmatch
+import json
+import os
+import queue
+import re
+import threading
+import time
+from typing import NamedTuple
+
+from .devices import adb_shell, long_shell, pull_file, pull_files_as_root, remote_sha256_async, expected_sha256, AdbError, PULL_CONCURRENCY
+
+MANIFEST_NAME = ".adbrv-pull.json"
+RESOLVE_BATCH = 25
+RESOLVE_TIMEOUT = 60
+_MARK = "@@"
+_PACKAGE_RE = re.compile(r"^[A-Za-z0-9_.]+$")
+
+
+class BulkPullError(Exception):
+    pass
+
+
+class PackageResult(NamedTuple):
+    serial: str
+    package: str
+    status: str             # pulled | cached | skipped | failed | interrupted
+    files: int = 0
+    bytes: int = 0          # transferred from the device
+    reused_bytes: int = 0   # materialized from the local APK store
+    seconds: float = 0.0
+    version_code: int = None
+    error: str = None
+
+
+def is_pattern(name):
+    return any(c in name for c in "*?[")
+
+
+def select_packages(serial, patterns=(), third_party=False):
+    """
+    Package ids on serial matching any of patterns (globs or exact ids; all packages when empty).
+    third_party keeps only `pm list packages -3`. Exact ids are kept even when not installed,
+    so they are reported as failed rather than silently dropped.
+    """
+    from .packageCache import refresh
+    from .scheduler import coalesce
+    installed = [r["id"] for r in coalesce(("packages", serial), lambda: refresh(serial))]
+    if third_party:
+        out = adb_shell(["pm", "list", "packages", "-3"], serial, check=False, timeout=RESOLVE_TIMEOUT) or ""
+        user = {line.strip()[len("package:"):] for line in out.splitlines() if line.strip().startswith("package:")}
+        installed = [pkg for pkg in installed if pkg in user]
+    if not patterns:
+        return sorted(installed)
+    selected = {pkg for pkg in installed if any(fnmatch.fnmatchcase(pkg, p) for p in patterns)}
+    selected.update(p for p in patterns if not is_pattern(p))
+    return sorted(selected)
+
+
+def read_package_list(path):
+    """Package ids or globs from a file, one per line; blank lines and # comments are ignored"""
+    try:
+        with open(path) as f:
+            lines = [line.split("#", 1)[0].strip() for line in f]
+    except OSError as e:
+        raise BulkPullError(f"Cannot read package list {path}: {e}")
+    return [line for line in lines if line]
+
+
+def resolve_script(packages):
+    return (
+        f"for p in {' '.join(packages)}; do echo \"{_MARK}$p\"; "
+        "for f in $(pm path \"$p\" 2>/dev/null | sed 's/^package://'); do "
+        "stat -c '%s %n' \"$f\" 2>/dev/null || echo \"- $f\"; done; done"
+    )
+
+
+def parse_resolved(text):
+    """{id: [(path, size or None)]} from resolve_script output; [] when the package has no APK"""
+    resolved, pkg = {}, None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith(_MARK):
+            pkg = line[len(_MARK):]
+            resolved[pkg] = []
+        elif pkg is not None and " " in line:
+            size, _, path = line.partition(" ")
+            resolved[pkg].append((path, int(size) if size.isdigit() else None))
+    return resolved
+
+
+class Manifest:
+    """Packages already pulled into a destination, {serial: {id: entry}}, saved after every change"""
+
+    def __init__(self, dest):
+        self.path = os.path.join(dest, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f).get("devices", {})
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def done(self, serial, pkg, version_code):
+        entry = self.entries.get(serial, {}).get(pkg)
+        if not entry or entry.get("status") not in ("pulled", "cached"):
+            return False
+        if version_code is not None and entry.get("versionCode") != version_code:
+            return False
+        return all(os.path.exists(path) for path in entry.get("paths", []))
+
+    def record(self, result, paths):
+        with self._lock:
+            self.entries.setdefault(result.serial, {})[result.package] = {
+                "status": result.status,
+                "versionCode": result.version_code,
+                "paths": paths,
+                "bytes": result.bytes + result.reused_bytes,
+                "finished": time.time(),
+            }
+            tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp, "w") as f:
+                    json.dump({"devices": self.entries}, f, indent=1)
+                os.replace(tmp, self.path)
+            except OSError:
+                pass
+
+
+def pull_package(serial, pkg, files, dest, version_code=None, progress=None):
+    """Pull one resolved package into dest/<pkg>/; returns (PackageResult, local paths)"""
+    from . import apkStore
+    from .packageCache import learn_apk
+    start = time.perf_counter()
+    if not files:
+        return PackageResult(serial, pkg, "failed", version_code=version_code, error="not installed or no APK paths"), []
+    pkg_dir = os.path.join(dest, pkg)
+    os.makedirs(pkg_dir, exist_ok=True)
+    targets = [(path, os.path.join(pkg_dir, os.path.basename(path))) for path, _ in files]
+    digests = {}
+    stored = apkStore.lookup(serial, files, version_code, digests)
+    reused_bytes, missing = 0, []
+    for remote, local in targets:
+        size = apkStore.materialize(stored[remote], local) if remote in stored else None
+        if size is None:
+            missing.append((remote, local))
+        else:
+            reused_bytes += size
+            if progress:
+                progress(size)
+    written = 0
+    sizes = dict(files)
+    hashes = None
+    try:
+        hashes = remote_sha256_async(serial, [remote for remote, _ in missing], known=digests) if missing else None
+        for remote, local in missing:
+            written += pull_file(remote, local, serial, progress, size=sizes[remote], expected=hashes)
+    except AdbError as e:
+        from .capabilities import has_root
+        if not has_root(serial):
+            return PackageResult(serial, pkg, "failed", version_code=version_code, error=str(e)), []
+        try:
+            written = pull_files_as_root(serial, missing, progress)
+        except AdbError as e:
+            return PackageResult(serial, pkg, "failed", version_code=version_code, error=str(e)), []
+        hashes = None  # the root stream was checked against its own hashes
+    for remote, local in missing:
+        apkStore.ingest(local, remote, version_code, expected_sha256(hashes, remote))
+    learn_apk(targets[0][1])
+    status = "pulled" if missing else "cached"
+    result = PackageResult(serial, pkg, status, len(targets), written, reused_bytes,
+                           time.perf_counter() - start, version_code)
+    return result, [local for _, local in targets]
+
+
+def pull_device(serial, packages, dest, manifest, jobs=None, stop=None, on_resolved=None, on_progress=None, on_result=None):
+    """
+    Pull packages from one device into dest; returns PackageResults in package order.
+    on_resolved(nbytes) reports the size of each resolved package, on_progress(n) received bytes,
+    on_result(result) each finished package. Setting stop leaves queued packages as "interrupted".
+    """
+    from .packageCache import version_code
+    jobs = max(1, jobs or PULL_CONCURRENCY)
+    stop = stop or threading.Event()
+    results = {}
+    todo = []
+    for pkg in packages:
+        version = version_code(serial, pkg)
+        if not _PACKAGE_RE.match(pkg):
+            results[pkg] = PackageResult(serial, pkg, "failed", error="invalid package name")
+        elif manifest.done(serial, pkg, version):
+            results[pkg] = PackageResult(serial, pkg, "skipped", version_code=version)
+        else:
+            todo.append(pkg)
+    for result in results.values():
+        if on_result:
+            on_result(result)
+
+    work = queue.Queue(maxsize=jobs * 2)
+
+    def resolver():
+        try:
+            for i in range(0, len(todo), RESOLVE_BATCH):
+                batch = todo[i:i + RESOLVE_BATCH]
+                out = long_shell(resolve_script(batch), serial, timeout=RESOLVE_TIMEOUT)
+                resolved = parse_resolved(out or "")
+                for pkg in batch:
+                    if stop.is_set():
+                        return
+                    files = resolved.get(pkg, [])
+                    if on_resolved:
+                        on_resolved(sum(size or 0 for _, size in files))
+                    work.put((pkg, files))
+        finally:
+            for _ in range(jobs):
+                work.put(None)
+
+    def worker():
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            pkg, files = item
+            if stop.is_set():
+                continue
+            try:
+                result, paths = pull_package(serial, pkg, files, dest, version_code(serial, pkg), on_progress)
+            except Exception as e:
+                result, paths = PackageResult(serial, pkg, "failed", error=str(e)), []
+            results[pkg] = result
+            if result.status in ("pulled", "cached"):
+                manifest.record(result, paths)
+            if on_result:
+                on_result(result)
+
+    threads = [threading.Thread(target=resolver, daemon=True)]
+    threads += [threading.Thread(target=worker, daemon=True) for _ in range(jobs)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        # Short joins keep the caller's thread responsive to Ctrl-C
+        while t.is_alive():
+            t.join(0.2)
+    return [results.get(pkg) or PackageResult(serial, pkg, "interrupted") for pkg in packages]
+
+
+def write_summary(path, dest, results, seconds):
+    """Save a bulk pull's outcome as JSON: per-device totals and one entry per package"""
+    devices = {}
+    for r in results:
+        totals = devices.setdefault(r.serial, {"pulled": 0, "cached": 0, "skipped": 0, "failed": 0, "interrupted": 0,
+                                               "bytes": 0, "reused_bytes": 0})
+        totals[r.status] += 1
+        totals["bytes"] += r.bytes
+        totals["reused_bytes"] += r.reused_bytes
+    summary = {
+        "destination": dest,
+        "seconds": round(seconds, 3),
+        "devices": devices,
+        "packages": [r._asdict() for r in results],
+    }
+    try:
+        with open(path, "w") as f:
+            json.dump(summary, f, indent=2)
+    except OSError as e:
+        raise BulkPullError(f"Cannot write summary {path}: {e}")
+
+
+def bulk_pull(devices, patterns=(), third_party=False, dest_path=None, jobs=None, summary_path=None):
+    """
+    Pull every package matching patterns (and/or third-party) from each device into dest_path,
+    one directory per package (per device too when several are given); returns all PackageResults
+    """
+    from rich.console import Console
+    from rich.progress import Progress, TextColumn, BarColumn, DownloadColumn, TransferSpeedColumn
+    from .pullAPK import _fmt_size
+    console = Console()
+    dest = os.path.abspath(dest_path or os.getcwd())
+    os.makedirs(dest, exist_ok=True)
+    manifest = Manifest(dest)
+    stop = threading.Event()
+    start = time.perf_counter()
+
+    with console.status("[cyan]🔍 Listing packages...[/cyan]", spinner="dots"):
+        selected = {}
+        for serial in devices:
+            try:
+                selected[serial] = select_packages(serial, patterns, third_party)
+            except AdbError as e:
+                console.print(f"  [bold red]✖[/bold red] {serial:<12} [red]{e}[/red]")
+    selected = {s: pkgs for s, pkgs in selected.items() if pkgs}
+    if not selected:
+        console.print("[bold red]❌ No matching packages.[/bold red]")
+        return []
+
+    # serial -> {package: PackageResult} as each package finishes, so an interrupted
+    # run still reports the packages that completed before Ctrl-C
+    results = {s: {} for s in selected}
+    columns = (TextColumn("  {task.description}"), BarColumn(), DownloadColumn(), TransferSpeedColumn())
+    with Progress(*columns, console=console, transient=True) as progress:
+        def run(serial):
+            packages = selected[serial]
+            device_dest = os.path.join(dest, serial) if len(selected) > 1 else dest
+            task = progress.add_task(serial, total=0)
+            counts = {"done": 0, "total": 0}
+            lock = threading.Lock()
+
+            def describe():
+                return f"{serial:<12} {counts['done']}/{len(packages)} packages"
+
+            def on_resolved(nbytes):
+                with lock:
+                    counts["total"] += nbytes
+                    progress.update(task, total=counts["total"])
+
+            def on_result(result):
+                with lock:
+                    results[serial][result.package] = result
+                    counts["done"] += 1
+                    progress.update(task, description=describe())
+                if result.status == "failed":
+                    progress.console.print(f"  [bold red]✖[/bold red] {serial:<12} {result.package} [red]{result.error}[/red]")
+
+            progress.update(task, description=describe())
+            pull_device(serial, packages, device_dest, manifest, jobs, stop,
+                        on_resolved, lambda n: progress.advance(task, n), on_result)
+
+        threads = [threading.Thread(target=run, args=(s,), daemon=True) for s in selected]
+        for t in threads:
+            t.start()
+        try:
+            for t in threads:
+                while t.is_alive():
+                    t.join(0.2)
+        except KeyboardInterrupt:
+            stop.set()
+            console.print("[yellow]⚠️ Interrupted; run the same pull again to resume.[/yellow]")
+
+    every = [results[s].get(p) or PackageResult(s, p, "interrupted") for s in selected for p in selected[s]]
+    seconds = time.perf_counter() - start
+    for serial in selected:
+        rows = [r for r in every if r.serial == serial]
+        count = {status: sum(r.status == status for r in rows) for status in ("pulled", "cached", "skipped", "failed", "interrupted")}
+        moved = sum(r.bytes for r in rows)
+        mark = "[bold green]✔[/bold green]" if not count["failed"] and not count["interrupted"] else "[bold yellow]![/bold yellow]"
+        parts = ", ".join(f"{n} {status}" for status, n in count.items() if n)
+        console.print(f"  {mark} {serial:<12} [cyan]{parts}[/cyan] [dim]{_fmt_size(moved)} in {seconds:.1f}s ({_fmt_size(moved / seconds if seconds else 0)}/s)[/dim]")
+    console.print(f"  [dim]Saved @ {dest}[/dim]")
+    if summary_path:
+        write_summary(summary_path, dest, every, seconds)
+        console.print(f"  [dim]Summary @ {os.path.abspath(summary_path)}[/dim]")
+    return every
@@ -0,0 +1,152 @@
+"""
+Per-device capability profile
+
+Detects once per boot how privileged commands can run on a device (adbd
+already root, `su -c` vs `su 0` syntax, or no root at all) and whether
+`settings put` works without root, then lets proxy, frida and pull code take
+the working route directly instead of trying su and falling back every time.
+The profile lives in the boot-keyed property cache and is used without asking
+the device again. One round trip re-verifies it (boot id and `id -u`; su only
+on a new boot or after a failed route) when a snapshot sees a new boot id,
+after a track-devices event (`adb root`/`adb unroot` restart adbd), or when a
+root command fails through a profile read from an earlier run.
+"""
+
+import shlex
+import threading
+
+CAPS_DELIM = "---CAPS---"
+SAME_BOOT = "SAME_BOOT"
+
+# Prints which su syntax yields uid 0 ("c", "0" or nothing)
+SU_SCRIPT = (
+    "if [ -n \"$(which su)\" ]; then "
+    "if su -c id 2>/dev/null | grep -q 'uid=0'; then echo c; "
+    "elif su 0 id 2>/dev/null | grep -q 'uid=0'; then echo 0; fi; fi"
+)
+
+_memory = {}  # serial -> (verified by this process, caps), or None once forgotten
+_lock = threading.Lock()
+
+
+def get_capabilities(serial):
+    """
+    Capability dict for serial:
+      adbd_root      - adbd (and so every shell) already runs as uid 0
+      su_syntax      - "c" for `su -c CMD`, "0" for `su 0 sh -c CMD`, "" when su is unusable
+      settings_plain - True/False once a non-root `settings put` has been tried, else None
+    """
+    from .propCache import load
+    with _lock:
+        known = serial in _memory
+        hit = _memory.get(serial)
+    if hit is not None:
+        return hit[1]
+    entry = load(serial)
+    caps = entry.get("caps") if entry else None
+    if caps is None or known:
+        # Nothing cached, or forgotten since: the device may have changed under the cached profile
+        return detect(serial, entry)
+    with _lock:
+        _memory[serial] = (False, caps)
+    return caps
+
+
+def detect(serial, cached=None):
+    """
+    Check the boot id and `id -u` in one round trip; su is probed again only on a new boot
+    (or when nothing is cached). Stores and returns the profile.
+    """
+    from .devices import adb_shell, AdbError
+    from .propCache import snapshot_script, resolve, update
+    known = cached.get("caps") if cached else None
+    su_part = SU_SCRIPT
+    if known is not None:
+        # $b is the boot id read by snapshot_script
+        su_part = f"if [ \"$b\" != '{cached['boot_id']}' ]; then {SU_SCRIPT}; else echo {SAME_BOOT}; fi"
+    out = adb_shell([f"{snapshot_script(cached)}; echo '{CAPS_DELIM}'; id -u; echo '{CAPS_DELIM}'; {su_part}"],
+                    serial, check=False, timeout=20)
+    if not out or CAPS_DELIM not in out:
+        raise AdbError("Device disconnected or cannot detect device capabilities.")
+    parts = out.split(CAPS_DELIM)
+    parts += [""] * (3 - len(parts))
+    resolve(serial, cached, parts[0])
+    su = parts[2].strip()
+    same_boot = known is not None and su == SAME_BOOT
+    caps = {
+        "adbd_root": parts[1].strip() == "0",
+        "su_syntax": known["su_syntax"] if same_boot else su,
+        "settings_plain": known["settings_plain"] if same_boot else None,
+    }
+    if caps != known or not same_boot:
+        update(serial, caps=caps)
+    with _lock:
+        _memory[serial] = (True, caps)
+    return caps
+
+
+def forget(serial=None):
+    """Drop the in-process profile (all devices when serial is None); the next use re-verifies it"""
+    with _lock:
+        for s in list(_memory) if serial is None else [serial]:
+            _memory[s] = None
+
+
+def recheck(serial, cmd):
+    """
+    After a root command built for cmd failed through a profile read from the cache, re-detect
+    the profile once; returns the root command of the new route, or None when it did not change
+    """
+    from .propCache import load
+    with _lock:
+        hit = _memory.get(serial)
+    if hit is None or hit[0]:
+        return None
+    before = root_command(serial, cmd)
+    entry = load(serial)
+    # The route just failed, so su is probed again even on the same boot
+    detect(serial, dict(entry, caps=None) if entry else None)
+    after = root_command(serial, cmd)
+    return after if after != before else None
+
+
+def learn(serial, **facts):
+    """Record something discovered while running a command (e.g. settings_plain=False)"""
+    from .propCache import update
+    caps = dict(get_capabilities(serial), **facts)
+    with _lock:
+        verified = bool(_memory.get(serial) and _memory[serial][0])
+        _memory[serial] = (verified, caps)
+    update(serial, caps=caps)
+    return caps
+
+
+def has_root(serial):
+    caps = get_capabilities(serial)
+    return caps["adbd_root"] or bool(caps["su_syntax"])
+
+
+def root_command(serial, cmd):
+    """Shell command string running cmd as root, or None when the device has no root route"""
+    caps = get_capabilities(serial)
+    if caps["adbd_root"]:
+        return cmd
+    if caps["su_syntax"] == "c":
+        return f"su -c {shlex.quote(cmd)}"
+    if caps["su_syntax"] == "0":
+        return f"su 0 sh -c {shlex.quote(cmd)}"
+    return None
+
+
+def run_as_root(serial, cmd, timeout=None):
+    """Run cmd as root; returns its output, or None if there is no root route or it failed"""
+    from .devices import adb_shell
+    root_cmd = root_command(serial, cmd)
+    if root_cmd is None:
+        return None
+    out = adb_shell([root_cmd], serial, timeout=timeout)
+    if out is None:
+        root_cmd = recheck(serial, cmd)
+        if root_cmd is not None:
+            out = adb_shell([root_cmd], serial, timeout=timeout)
+    return out
@@ -3,12 +3,12 @@ Native library symbol checking tools
 """
 
 import os
-import subprocess
 import sys
 from rich.console import Console
 from rich.table import Table
 from rich import box
 from rich.panel import Panel
+from . import profiler
 
 console = Console()
 
@@ -92,7 +92,7 @@ def check_internal_symbols(nm_path, so_path):
     """Check for internal/debug symbols using nm -a"""
     has_internal = False
     try:
-        symbol_all = subprocess.run([nm_path, '-a', so_path], capture_output=True, text=True)
+        symbol_all = profiler.run([nm_path, '-a', so_path], capture_output=True, text=True)
         lines_all = [l for l in symbol_all.stdout.splitlines() if 'no symbols' not in l and not l.endswith(':')]
     except Exception:
         lines_all = []
@@ -110,7 +110,7 @@ def check_exported_symbols(nm_path, so_path):
     """Check for exported/dynamic symbols using nm -D"""
     has_exported = False
     try:
-        symbol_dyn = subprocess.run([nm_path, '-D', so_path], capture_output=True, text=True)
+        symbol_dyn = profiler.run([nm_path, '-D', so_path], capture_output=True, text=True)
         lines_dyn = [l for l in symbol_dyn.stdout.splitlines() if 'no symbols' not in l and not l.endswith(':')]
     except Exception:
         lines_dyn = []
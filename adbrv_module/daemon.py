@@ -0,0 +1,273 @@
+"""
+Background daemon that keeps device state warm
+
+`adbrv daemon start` runs a small server on a Unix socket that owns the device
+list (fed by host:track-devices), recent status probes and package lists.
+One-shot CLI commands ask it first and fall back to direct mode when it is
+not running.
+
+Wire format: one JSON object per line in each direction.
+"""
+
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+from .devices import DEFAULT_DEVICE_DEADLINE
+
+PROBE_TTL = 3.0
+REQUEST_TIMEOUT = 2.0
+# A cold status probes every device, each under map_devices' deadline
+STATUS_TIMEOUT = DEFAULT_DEVICE_DEADLINE + REQUEST_TIMEOUT
+
+
+class DaemonError(Exception):
+    pass
+
+
+def socket_path():
+    from .utils import get_cache_dir
+    return os.environ.get("ADBRV_DAEMON_SOCKET") or os.path.join(get_cache_dir(), "daemon.sock")
+
+
+def request(op, timeout=REQUEST_TIMEOUT, **params):
+    """
+    Send one request to the daemon; returns its reply dict, or None if no daemon is running.
+    Raises DaemonError when the daemon fails the request or does not answer within timeout.
+    """
+    if not hasattr(socket, "AF_UNIX") or os.environ.get("ADBRV_NO_DAEMON") == "1":
+        return None
+    path = socket_path()
+    if not os.path.exists(path):
+        return None
+    params["op"] = op
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(path)
+        except OSError:
+            return None  # stale socket file
+        try:
+            sock.sendall(json.dumps(params).encode("utf-8") + b"\n")
+            data = b""
+            while not data.endswith(b"\n"):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+        except socket.timeout:
+            # Still working on it: answering from here would repeat what the daemon is doing
+            raise DaemonError(f"Daemon did not answer {op} within {timeout:g}s")
+        except OSError:
+            return None
+    try:
+        reply = json.loads(data.decode("utf-8"))
+    except ValueError:
+        return None
+    if not reply.get("ok"):
+        raise DaemonError(reply.get("error", "daemon request failed"))
+    return reply
+
+
+def invalidate(serial=None):
+    """Tell a running daemon that a command changed device state (best effort)"""
+    try:
+        request("invalidate", serial=serial)
+    except DaemonError:
+        pass
+
+
+class DeviceState:
+    """Device list, probe cache and package lists shared by all daemon clients"""
+
+    def __init__(self):
+        self.devices = []
+        self.tracking = False
+        self.probes = {}
+        self.packages = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def forget(self, serial):
+        # In-memory state only: the on-disk property cache is keyed by boot id and stays valid across reconnects
+        from .adbClient import get_client
+        from .capabilities import forget
+        from .shellSession import drop_session
+        forget(serial)
+        with self.lock:
+            self.probes.pop(serial, None)
+            self.packages.pop(serial, None)
+        drop_session(serial)
+        client = get_client()
+        if client is not None:
+            client.forget(serial)
+
+    def invalidate(self, serial=None):
+        with self.lock:
+            serials = [serial] if serial else list(set(self.probes) | set(self.packages))
+            for s in serials:
+                self.probes.pop(s, None)
+                self.packages.pop(s, None)
+
+    def on_devices(self, entries):
+        online = [s for s, state in entries if state == "device"]
+        with self.lock:
+            changed = set(online) ^ set(self.devices)
+            self.devices = online
+        for s in changed:
+            self.forget(s)
+
+    def track(self):
+        from .adbClient import get_client, mark_unavailable, AdbServerUnavailable, AdbProtocolError
+        from .devices import get_connected_devices, AdbError
+        from .scheduler import BACKGROUND, set_priority
+        set_priority(BACKGROUND)
+        while True:
+            client = get_client()
+            try:
+                if client is None:
+                    raise AdbServerUnavailable("native client disabled")
+                for entries in client.track_devices():
+                    self.tracking = True
+                    self.on_devices(entries)
+            except AdbServerUnavailable:
+                mark_unavailable()
+            except AdbProtocolError:
+                pass
+            self.tracking = False
+            # No track stream: poll until the server comes back
+            try:
+                self.on_devices([(s, "device") for s in get_connected_devices()])
+            except AdbError:
+                pass
+            time.sleep(2)
+
+    def connected(self):
+        if self.tracking:
+            return list(self.devices)
+        from .devices import get_connected_devices
+        self.on_devices([(s, "device") for s in get_connected_devices()])
+        return list(self.devices)
+
+    def status(self, serial=None):
+        from .devices import probe_device, map_devices
+        connected = self.connected()
+        if serial and serial not in connected:
+            raise DaemonError(f"Device {serial} not found.")
+        devices = [serial] if serial else connected
+        now = time.monotonic()
+        with self.lock:
+            stale = [s for s in devices if now - self.probes.get(s, (0, None))[0] > PROBE_TTL]
+        for res in map_devices(probe_device, stale):
+            if res.error is not None:
+                entry = {"error": str(res.error), "timeout": isinstance(res.error, TimeoutError)}
+            else:
+                entry = res.value._asdict()
+            entry["serial"] = res.serial
+            with self.lock:
+                self.probes[res.serial] = (time.monotonic(), entry)
+        with self.lock:
+            return [self.probes[s][1] for s in devices if s in self.probes]
+
+    def installed_packages(self, serial=None):
+        from .pullAPK import get_installed_packages
+        if serial is None:
+            devices = self.connected()
+            if not devices:
+                return []
+            serial = devices[0]
+        # Always diffed against the device (one pm list), so installs and removals show up;
+        # the last good list only covers a failed refresh
+        pkgs = get_installed_packages(serial)
+        with self.lock:
+            if pkgs:
+                self.packages[serial] = pkgs
+                return pkgs
+            return self.packages.get(serial, [])
+
+
+def _handle(state, req):
+    op = req.get("op")
+    if op == "ping":
+        return {"pid": os.getpid(), "uptime": time.time() - state.started, "devices": list(state.devices)}
+    if op == "devices":
+        return {"devices": state.connected()}
+    if op == "status":
+        return {"devices": state.status(req.get("serial"))}
+    if op == "packages":
+        return {"packages": state.installed_packages(req.get("serial"))}
+    if op == "invalidate":
+        state.invalidate(req.get("serial"))
+        return {}
+    raise DaemonError(f"unknown op: {op}")
+
+
+def serve(path=None):
+    """Run the daemon in the foreground until `adbrv daemon stop`"""
+    import socketserver
+    path = path or socket_path()
+    if request("ping") is not None:
+        raise DaemonError(f"Daemon already running on {path}")
+    if os.path.exists(path):
+        os.unlink(path)  # stale socket left by a crashed daemon
+
+    state = DeviceState()
+    threading.Thread(target=state.track, daemon=True).start()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            line = self.rfile.readline()
+            try:
+                req = json.loads(line.decode("utf-8"))
+                if req.get("op") == "shutdown":
+                    reply = {"ok": True}
+                    threading.Thread(target=server.shutdown, daemon=True).start()
+                else:
+                    reply = _handle(state, req)
+                    reply["ok"] = True
+            except Exception as e:
+                reply = {"ok": False, "error": str(e)}
+            self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    server = Server(path, Handler)
+    os.chmod(path, 0o600)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def start_detached():
+    """Spawn `python -m adbrv_module.daemon` in its own session and wait until it answers"""
+    import subprocess
+    subprocess.Popen(
+        [sys.executable, "-m", "adbrv_module.daemon"],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        reply = request("ping")
+        if reply is not None:
+            return reply
+        time.sleep(0.1)
+    raise DaemonError("Daemon did not come up within 5 seconds.")
+
+
+def stop():
+    try:
+        return request("shutdown") is not None
+    except DaemonError:
+        return False
+
+
+if __name__ == "__main__":
+    serve()
@@ -1,11 +1,62 @@
-import subprocess, sys
+import os, subprocess, sys
+from typing import NamedTuple, Optional
+
+# Concurrent file transfers per command (split APKs)
+PULL_CONCURRENCY = int(os.environ.get("ADBRV_PULL_CONCURRENCY", "4"))
 
 class AdbError(Exception):
     pass
 
+def run_adb(args, serial=None, **kwargs):
+    """Run the adb binary (the fallback path when the native client is unavailable)"""
+    from . import profiler
+    from .scheduler import slot
+    adb_base = ["adb"]
+    if serial:
+        adb_base += ["-s", serial]
+    with slot(serial):
+        return profiler.run(adb_base + list(args), serial, **kwargs)
+
+def native_call(serial, fn, *args, **kwargs):
+    """
+    Run fn(client, ...) against the adb server socket, holding a scheduler slot for serial.
+    Returns (True, result) on success, (False, None) when the caller should fall back to the adb binary.
+    Protocol failures (device gone, FAIL replies) are raised as AdbProtocolError.
+    """
+    from .adbClient import get_client, mark_unavailable, AdbServerUnavailable
+    from .scheduler import slot
+    client = get_client()
+    if client is None:
+        return False, None
+    try:
+        with slot(serial):
+            return True, fn(client, *args, **kwargs)
+    except AdbServerUnavailable:
+        mark_unavailable()
+        return False, None
+
+def _session_shell(client, serial, command, timeout=None):
+    from .shellSession import get_session
+    session = get_session(client, serial)
+    if session is not None:
+        return session.run(command, timeout)
+    return client.shell(serial, command, timeout=timeout)
+
 def get_connected_devices():
+    """Coalesced: concurrent callers share one in-flight query"""
+    from .scheduler import coalesce
+    return coalesce(("devices",), lambda: _get_connected_devices())
+
+def _get_connected_devices():
+    from .adbClient import AdbProtocolError
+    try:
+        ok, devices = native_call(None, lambda c: [s for s, state in c.devices() if state == "device"])
+        if ok:
+            return devices
+    except AdbProtocolError:
+        pass
     try:
-        result = subprocess.run(["adb", "devices"], capture_output=True, text=True)
+        result = run_adb(["devices"], capture_output=True, text=True)
         lines = result.stdout.strip().splitlines()[1:]  # skip first line
         devices = [line.split()[0] for line in lines if '\tdevice' in line]
         return devices
@@ -40,26 +91,77 @@ def select_device(serial_arg=None):
     return selected
 
 def get_proxy_status(serial=None):
-    adb_base = ["adb"]
-    if serial:
-        adb_base += ["-s", serial]
+    """Coalesced: concurrent callers share one in-flight query"""
+    from .scheduler import coalesce
+    return coalesce(("proxy", serial), lambda: _get_proxy_status(serial))
+
+def _get_proxy_status(serial=None):
+    from .adbClient import AdbProtocolError
+    try:
+        ok, res = native_call(serial, _session_shell, serial, "settings get global http_proxy")
+    except AdbProtocolError:
+        raise AdbError("Device disconnected or cannot get proxy status.")
+    if ok:
+        if res.returncode != 0:
+            raise AdbError("Device disconnected or cannot get proxy status.")
+        return res.stdout.strip()
     try:
-        result = subprocess.run(adb_base + ["shell", "settings", "get", "global", "http_proxy"], capture_output=True, text=True, check=True)
+        result = run_adb(["shell", "settings", "get", "global", "http_proxy"], serial, capture_output=True, text=True, check=True)
         return result.stdout.strip()
     except subprocess.CalledProcessError:
         raise AdbError("Device disconnected or cannot get proxy status.")
 
+def format_reverse_list(output):
+    result_cut = output.split()[-2:]
+    return ' '.join(result_cut) if result_cut else "(none)"
+
 def get_reverse_ports(serial=None):
-    adb_base = ["adb"]
-    if serial:
-        adb_base += ["-s", serial]
+    """Coalesced: concurrent callers share one in-flight query"""
+    from .scheduler import coalesce
+    return coalesce(("reverse", serial), lambda: _get_reverse_ports(serial))
+
+def _get_reverse_ports(serial=None):
+    from .adbClient import AdbProtocolError
+    try:
+        ok, out = native_call(serial, lambda c: c.reverse_list(serial))
+    except AdbProtocolError:
+        raise AdbError("Device disconnected or cannot get reverse ports.")
+    if ok:
+        return format_reverse_list(out)
     try:
-        result = subprocess.run(adb_base + ["reverse", "--list"], capture_output=True, text=True, check=True)
-        result_cut = result.stdout.split()[-2:]
-        return ' '.join(result_cut) if result_cut else "(none)"
+        result = run_adb(["reverse", "--list"], serial, capture_output=True, text=True, check=True)
+        return format_reverse_list(result.stdout)
     except subprocess.CalledProcessError:
         raise AdbError("Device disconnected or cannot get reverse ports.")
 
+def add_reverse(serial, remote, local):
+    """adb reverse <remote> <local>; raises AdbError on failure"""
+    from .adbClient import AdbProtocolError
+    try:
+        ok, _ = native_call(serial, lambda c: c.reverse_forward(serial, remote, local))
+    except AdbProtocolError as e:
+        raise AdbError(f"Cannot reverse {remote}: {e}")
+    if ok:
+        return
+    try:
+        run_adb(["reverse", remote, local], serial, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        raise AdbError(f"Cannot reverse {remote}: {e}")
+
+def remove_all_reverse(serial=None):
+    """adb reverse --remove-all; raises AdbError on failure"""
+    from .adbClient import AdbProtocolError
+    try:
+        ok, _ = native_call(serial, lambda c: c.reverse_remove_all(serial))
+    except AdbProtocolError as e:
+        raise AdbError(f"Cannot remove reverse ports: {e}")
+    if ok:
+        return
+    try:
+        run_adb(["reverse", "--remove-all"], serial, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        raise AdbError(f"Cannot remove reverse ports: {e}")
+
 def print_all_status(serial=None):
     if serial:
         devices = [serial]
@@ -78,8 +180,8 @@ _last_table_lines = 0
 
 def check_devices_info(serial=None, show_title=True):
     from rich.console import Console
-    from rich.table import Table
-    from rich import box
+    from rich.live import Live
+    from rich.padding import Padding
     console = Console()
     
     if serial:
@@ -90,6 +192,35 @@ def check_devices_info(serial=None, show_title=True):
         console.print("[bold red][!] No devices connected.[/bold red]")
         return
         
+    # Rows start as placeholders and fill in as each device's probe returns
+    rows = [[s, "[dim]…[/dim]", "", "", "", "", ""] for s in devices]
+
+    def on_result(index, res):
+        rows[index] = _status_row(res)
+        live.update(Padding(_status_table(rows), (0, 0, 0, 2)))
+
+    with Live(Padding(_status_table(rows), (0, 0, 0, 2)), console=console, refresh_per_second=8) as live:
+        map_devices(probe_device, devices, on_result=on_result)
+
+def print_status_entries(entries):
+    """Render the status table from daemon replies (probe dicts, or serial + error)"""
+    from rich.console import Console
+    from rich.padding import Padding
+    results = []
+    for entry in entries:
+        if "error" in entry:
+            error = TimeoutError(entry["error"]) if entry.get("timeout") else AdbError(entry["error"])
+            results.append(DeviceResult(entry["serial"], None, error))
+        else:
+            results.append(DeviceResult(entry["serial"], DeviceProbe(**entry), None))
+    if not results:
+        Console().print("[bold red][!] No devices connected.[/bold red]")
+        return
+    Console().print(Padding(_status_table([_status_row(r) for r in results]), (0, 0, 0, 2)))
+
+def _status_table(rows):
+    from rich.table import Table
+    from rich import box
     table = Table(title=None, box=box.ROUNDED)
     table.add_column("Device Serial", style="cyan", no_wrap=True)
     table.add_column("Model", style="magenta")
@@ -98,81 +229,651 @@ def check_devices_info(serial=None, show_title=True):
     table.add_column("Frida", justify="center")
     table.add_column("Proxy", style="yellow")
     table.add_column("Reverse", style="green")
+    for row in rows:
+        table.add_row(*row)
+    return table
+
+def _status_row(res):
+    if res.error is not None:
+        reason = "timeout" if isinstance(res.error, TimeoutError) else "unreachable"
+        return [res.serial, f"[bold red]{reason}[/bold red]", "-", "-", "-", "-", "-"]
+    probe = res.value
+    root_style = "[bold green]Yes[/bold green]" if probe.root else "[bold red]No[/bold red]"
+    if probe.frida_running:
+        frida_style = f"[bold green]{probe.frida_status}[/bold green]"
+    else:
+        frida_style = f"[dim]{probe.frida_status}[/dim]"
+    return [probe.serial, probe.model, probe.android, root_style, frida_style, probe.proxy, probe.reverse]
+
+DEFAULT_FANOUT_WORKERS = 8
+DEFAULT_DEVICE_DEADLINE = 20.0
+
+class DeviceResult(NamedTuple):
+    serial: str
+    value: object
+    error: Optional[Exception]
 
-    for s in devices:
-        adb_base = ["adb", "-s", s] if s else ["adb"]
+def map_devices(fn, devices, max_workers=DEFAULT_FANOUT_WORKERS, deadline=DEFAULT_DEVICE_DEADLINE, on_result=None):
+    """
+    Run fn(serial) for every device with bounded concurrency and return DeviceResults in input order.
+    A device that exceeds its deadline is reported with a TimeoutError and its worker slot is replaced,
+    so one slow or offline device never stalls the rest. on_result(index, result) is called from the
+    caller's thread as each device finishes.
+    """
+    import queue, threading, time
+    from .scheduler import current_priority, set_priority
+    from .profiler import current_source, set_source
+    priority, label = current_priority(), current_source()
+    devices = list(devices)
+    results = [None] * len(devices)
+    todo = queue.Queue()
+    done = queue.Queue()
+    started = {}
+    for item in enumerate(devices):
+        todo.put(item)
+
+    def worker():
+        set_priority(priority)  # background fan-outs stay behind interactive adb calls
+        set_source(label)
+        while True:
+            try:
+                index, s = todo.get_nowait()
+            except queue.Empty:
+                return
+            started[index] = time.monotonic()
+            try:
+                done.put((index, fn(s), None))
+            except Exception as e:
+                done.put((index, None, e))
+
+    def spawn():
+        threading.Thread(target=worker, daemon=True).start()
+
+    for _ in range(min(max_workers, len(devices))):
+        spawn()
+
+    pending = set(range(len(devices)))
+    while pending:
         try:
-            res = subprocess.run(adb_base + ["shell", "getprop ro.product.model; getprop ro.build.version.release; which su"], capture_output=True, text=True, timeout=5)
-            lines = res.stdout.strip().splitlines()
-        except:
-            lines = []
-            
-        model = lines[0] if len(lines) > 0 and lines[0].strip() else "?"
-        android = lines[1] if len(lines) > 1 and lines[1].strip() else "?"
-        su_check = lines[2] if len(lines) > 2 else ""
-        
-        root = "Yes" if su_check and su_check.strip() else "No"
-        root_style = "[bold green]Yes[/bold green]" if root == "Yes" else "[bold red]No[/bold red]"
-        
-        from .fridaTools import get_frida_status
-        frida_status = get_frida_status(s)
-        if "On" in frida_status:
-            frida_style = f"[bold green]{frida_status}[/bold green]"
-        else:
-            frida_style = f"[dim]{frida_status}[/dim]"
-            
-        proxy = get_proxy_status(s)
-        reverse = get_reverse_ports(s)
-        
-        table.add_row(
-            s,
-            model,
-            android,
-            root_style,
-            frida_style,
-            proxy,
-            reverse
-        )
-    from rich.padding import Padding
-    console.print(Padding(table, (0, 0, 0, 2)))
+            index, value, error = done.get(timeout=0.1)
+        except queue.Empty:
+            now = time.monotonic()
+            for index in sorted(pending):
+                if index in started and now - started[index] > deadline:
+                    value, error = None, TimeoutError(f"{devices[index]} did not answer within {deadline:g}s")
+                    break
+            else:
+                continue
+            spawn()
+        if index not in pending:
+            continue  # late answer from a device already reported as timed out
+        pending.discard(index)
+        results[index] = DeviceResult(devices[index], value, error)
+        if on_result:
+            on_result(index, results[index])
+    return results
 
-def adb_shell(cmd, serial=None, check=True, input_text=None):
-    adb_base = ["adb"]
-    if serial:
-        adb_base += ["-s", serial]
+def adb_shell(cmd, serial=None, check=True, input_text=None, timeout=None):
+    from .adbClient import AdbProtocolError
+    if input_text is None:
+        try:
+            ok, res = native_call(serial, _session_shell, serial, " ".join(cmd), timeout)
+        except AdbProtocolError:
+            return None if check else ""
+        if ok:
+            if check and res.returncode != 0:
+                return None
+            return res.stdout.strip()
     try:
-        result = subprocess.run(adb_base + ["shell"] + cmd, capture_output=True, text=True, check=check, input=input_text)
+        result = run_adb(["shell"] + cmd, serial, capture_output=True, text=True, check=check, input=input_text, timeout=timeout)
         return result.stdout.strip()
-    except subprocess.CalledProcessError:
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+        return None
+
+def exec_out(cmd, serial=None, timeout=None):
+    """Raw stdout bytes of a shell command string (adb exec-out), or None on failure"""
+    from .adbClient import AdbProtocolError
+    try:
+        ok, out = native_call(serial, lambda c: c.exec_out(serial, cmd, timeout=timeout))
+    except AdbProtocolError:
+        return None
+    if ok:
+        return out
+    try:
+        return run_adb(["exec-out", cmd], serial, capture_output=True, check=True, timeout=timeout).stdout
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
         return None
 
+def long_shell(cmd, serial=None, timeout=None):
+    """
+    Output of a long-running shell command string (hashing, batched pm/dumpsys loops), "" on
+    failure. It gets a one-shot shell of its own: on the shared session it would hold up every
+    other command on the device for its full duration. Like a transfer it takes no scheduler slot.
+    """
+    from . import profiler
+    from .adbClient import get_client, mark_unavailable, AdbServerUnavailable, AdbProtocolError
+    client = get_client()
+    if client is not None:
+        try:
+            return client.shell(serial, cmd, timeout=timeout).stdout.strip()
+        except AdbServerUnavailable:
+            mark_unavailable()
+        except AdbProtocolError:
+            return ""
+    adb = ["adb", "-s", serial] if serial else ["adb"]
+    try:
+        return profiler.run(adb + ["shell", cmd], serial, capture_output=True, text=True, timeout=timeout).stdout.strip()
+    except subprocess.TimeoutExpired:
+        return ""
 
+HASH_TIMEOUT = 120
 
-def get_device_info(serial):
-    adb_base = ["adb"]
-    if serial:
-        adb_base += ["-s", serial]
+def remote_sha256(serial, paths, timeout=HASH_TIMEOUT, as_root=False):
+    """
+    {path: sha256} of device files, computed on the device in one round trip (through
+    root_command when as_root); unreadable files are left out
+    """
+    import shlex
+    files = " ".join(shlex.quote(p) for p in paths)
+    cmd = f"sha256sum {files} 2>/dev/null || toybox sha256sum {files} 2>/dev/null"
+    if as_root:
+        from .capabilities import root_command
+        cmd = root_command(serial, cmd)
+        if cmd is None:
+            return {}
+    out = long_shell(cmd, serial, timeout=timeout)
+    hashes = {}
+    for line in (out or "").splitlines():
+        digest, _, path = line.strip().partition(" ")
+        path = path.strip().lstrip("*")
+        if len(digest) == 64 and path in paths:
+            hashes[path] = digest.lower()
+    return hashes
+
+def remote_sha256_async(serial, paths, as_root=False, known=None):
+    """
+    Start remote_sha256 in a background thread (the device hashes while files transfer); returns a
+    Future. Paths already in known ({path: sha256}, e.g. from apkStore.lookup) are not hashed again.
+    """
+    import threading
+    from concurrent.futures import Future
+    future = Future()
+    known = {p: known[p] for p in paths if p in (known or {})}
+    rest = [p for p in paths if p not in known]
+    if not rest:
+        future.set_result(known)
+        return future
+
+    def run():
+        try:
+            future.set_result(dict(known, **remote_sha256(serial, rest, as_root=as_root)))
+        except Exception as e:
+            future.set_exception(e)
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+# Transfers: retries after the first attempt, and seconds without data before an attempt is abandoned
+PULL_RETRIES = int(os.environ.get("ADBRV_PULL_RETRIES", "4"))
+PULL_STALL_TIMEOUT = 30.0
+
+class _PullRefused(AdbError):
+    """The device refused the file (missing, unreadable): not retried"""
+
+class _HashingWriter:
+    """Writes to f and feeds the same bytes to digest"""
+
+    def __init__(self, f, digest, progress=None):
+        self.f = f
+        self.digest = digest
+        self.progress = progress
+        self.count = 0
+
+    def write(self, data):
+        self.f.write(data)
+        self.digest.update(data)
+        self.count += len(data)
+
+    def __call__(self, data):
+        self.write(data)
+        if self.progress:
+            self.progress(len(data))
+
+    def tell(self):
+        return self.f.tell()
+
+    def seek(self, *args):
+        return self.f.seek(*args)
+
+    def truncate(self, size):
+        return self.f.truncate(size)
+
+    def extend(self, size):
+        """Account for size bytes whose content is unknown (a replayed transfer): the file grows sparse, nothing is hashed"""
+        self.f.truncate(self.f.tell() + size)
+        self.f.seek(0, os.SEEK_END)
+        self.count += size
+
+def expected_sha256(expected, remote):
+    """
+    The device-side hash of remote from a pull_file expected argument, None when unknown.
+    After pull_file returns, a non-None value is the verified hash of the local file.
+    """
+    from concurrent.futures import Future
+    from . import replay
+    if replay.mode() == "replay":
+        return None  # replayed pulls deliver placeholder content
+    if isinstance(expected, Future):
+        try:
+            return expected.result(timeout=HASH_TIMEOUT).get(remote)
+        except Exception:
+            return None
+    return expected
+
+def _warn_unverified(remote):
+    from . import replay
+    from .utils import print_warning
+    if replay.mode() != "replay":
+        print_warning(f"{remote}: no device-side SHA-256 (unreadable, or hashing timed out), kept unverified")
+
+def _remote_size(serial, remote):
+    from .adbClient import AdbProtocolError
     try:
-        res = subprocess.run(adb_base + ["shell", "getprop ro.product.model; getprop ro.build.version.release; which su"], capture_output=True, text=True, timeout=5)
-        lines = res.stdout.strip().splitlines()
-    except:
-        lines = []
+        ok, st = native_call(serial, lambda c: c.stat(serial, remote))
+    except AdbProtocolError:
+        return None
+    if ok:
+        return st.size if st.mode else None
+    out = adb_shell(["stat", "-c", "%s", remote], serial, check=False, timeout=10)
+    return int(out) if out and out.isdigit() else None
 
-    model = lines[0] if len(lines) > 0 and lines[0].strip() else "?"
-    android = lines[1] if len(lines) > 1 and lines[1].strip() else "?"
-    su_check = lines[2] if len(lines) > 2 else ""
-    
-    root = "Yes" if su_check and su_check.strip() else "No"
-    from .fridaTools import get_frida_status
-    frida_status = get_frida_status(serial)
-    proxy = get_proxy_status(serial)
-    reverse = get_reverse_ports(serial)
+def _fetch(remote, part, serial, offset, sink, timeout):
+    """
+    Append remote from byte offset to the open file behind sink: sync:RECV from the start,
+    `tail -c +N` over exec-out to resume. Raises AdbError on a failed or stalled attempt,
+    _PullRefused when the device refuses the file.
+    """
+    import shlex
+    from . import profiler
+    from .adbClient import get_client, mark_unavailable, AdbServerUnavailable, AdbProtocolError, AdbSyncFailure
+    resume = f"tail -c +{offset + 1} {shlex.quote(remote)} 2>/dev/null"
+    client = get_client()
+    if client is not None:
+        try:
+            if offset:
+                client.exec_stream(serial, resume, sink, timeout or PULL_STALL_TIMEOUT)
+            else:
+                client.pull(serial, remote, sink, sink.progress, timeout or PULL_STALL_TIMEOUT)
+            return
+        except AdbServerUnavailable:
+            mark_unavailable()
+        except AdbSyncFailure as e:
+            raise _PullRefused(str(e))
+        except AdbProtocolError as e:
+            raise AdbError(str(e))
+    adb = ["adb", "-s", serial] if serial else ["adb"]
+    if offset:
+        proc = subprocess.Popen(adb + ["exec-out", resume], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        with proc.stdout:
+            for chunk in iter(lambda: proc.stdout.read(1 << 16), b""):
+                sink(chunk)
+        if proc.wait() != 0:
+            raise AdbError("adb exec-out failed")
+        return
+    # `adb pull` reports a missing or unreadable file reliably; the result is hashed afterwards
+    sink.f.close()
+    try:
+        profiler.run(adb + ["pull", remote, part], serial, check=True, capture_output=True, timeout=timeout)
+    except subprocess.CalledProcessError as e:
+        message = (e.stderr or b"").decode("utf-8", "replace").strip()
+        if "Permission denied" in message or "No such file" in message:
+            raise _PullRefused(message)
+        raise AdbError(message or "adb pull failed")
+    except subprocess.TimeoutExpired:
+        raise AdbError("adb pull timed out")
+    with open(part, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sink.digest.update(chunk)
+            sink.count += len(chunk)
+            if sink.progress:
+                sink.progress(len(chunk))
+
+def pull_file(remote, local, serial=None, progress=None, timeout=None, size=None, expected=None):
+    """
+    Pull one device file to local; returns the bytes transferred. progress(n) is called as data arrives.
+
+    Data goes to local + ".part" (resumed when an earlier run left one) and is hashed while it is
+    written. A failed or stalled attempt is retried from the last received byte, with backoff, up to
+    ADBRV_PULL_RETRIES times. The file is renamed to local only once its size matches size (looked up
+    when not given) and its SHA-256 matches the device's: expected, a Future of {remote: sha256}
+    (remote_sha256_async) or None to hash on the device meanwhile. On a mismatch the transfer starts
+    over once. Transfers take no scheduler slot: a long pull must not hold up the device's other calls.
+    """
+    import hashlib, time
+    part = local + ".part"
+    if expected is None:
+        expected = remote_sha256_async(serial, [remote])
+    if size is None:
+        size = _remote_size(serial, remote)
+    digest, offset = hashlib.sha256(), 0
+    if os.path.exists(part):
+        # Left by an interrupted pull: hash what is there and continue after it
+        with open(part, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+                offset += len(chunk)
+        if size is not None and offset > size:
+            os.unlink(part)
+            digest, offset = hashlib.sha256(), 0
+        elif offset and progress:
+            progress(offset)
+    transferred, failures, restarted = 0, 0, False
+    while True:
+        with open(part, "ab") as f:
+            sink = _HashingWriter(f, digest, progress)
+            try:
+                _fetch(remote, part, serial, offset, sink, timeout)
+                error = None
+            except _PullRefused as e:
+                error, failures = e, PULL_RETRIES
+            except AdbError as e:
+                error = e
+        offset += sink.count
+        transferred += sink.count
+        if error is None and size is not None and offset < size:
+            error = AdbError(f"transfer ended at {offset} of {size} bytes")
+        if error is not None:
+            failures += 1
+            if failures > PULL_RETRIES:
+                if not os.path.getsize(part):
+                    os.unlink(part)
+                raise AdbError(f"Cannot pull {remote}: {error}")
+            time.sleep(min(8.0, 0.5 * 2 ** (failures - 1)))
+            continue
+        want = expected_sha256(expected, remote)
+        if (want is None or want == digest.hexdigest()) and (size is None or offset == size):
+            if want is None:
+                _warn_unverified(remote)
+            break
+        os.unlink(part)
+        if restarted:
+            raise AdbError(f"Cannot pull {remote}: checksum mismatch")
+        restarted = True
+        digest, offset = hashlib.sha256(), 0
+    os.replace(part, local)
+    return transferred
+
+def push_file(local, remote, serial=None, mode=0o644, progress=None, timeout=None):
+    """
+    Push local to a device path created with mode; returns bytes sent. Like pull_file it
+    takes no scheduler slot. Raises AdbError when the device refuses the file.
+    """
+    from . import profiler
+    from .adbClient import get_client, mark_unavailable, AdbServerUnavailable, AdbProtocolError
+    client = get_client()
+    if client is not None:
+        try:
+            with open(local, "rb") as f:
+                return client.push(serial, f, remote, mode, progress, timeout or PULL_STALL_TIMEOUT)
+        except AdbServerUnavailable:
+            mark_unavailable()
+        except AdbProtocolError as e:
+            raise AdbError(f"Cannot push {remote}: {e}")
+    adb = ["adb", "-s", serial] if serial else ["adb"]
+    try:
+        profiler.run(adb + ["push", local, remote], serial, check=True, capture_output=True, timeout=timeout)
+    except subprocess.CalledProcessError as e:
+        raise AdbError(f"Cannot push {remote}: {(e.stderr or b'').decode('utf-8', 'replace').strip()}")
+    except subprocess.TimeoutExpired:
+        raise AdbError(f"Cannot push {remote}: timed out")
+    adb_shell(["chmod", oct(mode)[2:], remote], serial, check=False)
+    size = os.path.getsize(local)
+    if progress:
+        progress(size)
+    return size
+
+ROOT_STREAM_END = "ADBRV_STREAM_END"
+
+def root_stream_script(remotes):
+    """Shell script writing `<size> <path>` then the bytes of each file, and an end marker"""
+    import shlex
+    files = " ".join(shlex.quote(r) for r in remotes)
+    # A read error must not put text into the byte stream
+    return f"for f in {files}; do stat -c '%s %n' \"$f\" 2>/dev/null && cat \"$f\" 2>/dev/null; done; echo {ROOT_STREAM_END}"
+
+class _StreamSplitter:
+    """
+    Writes a root_stream_script() stream into local files as it arrives. Each file is
+    checked against its device-side SHA-256 (expected, as for pull_file) before it is
+    renamed into place.
+    """
+
+    def __init__(self, targets, progress=None, expected=None):
+        self.targets = dict(targets)
+        self.progress = progress
+        self.expected = expected
+        self.buf = b""
+        self.current = None  # (_HashingWriter, bytes left, remote)
+        self.written = {}
+        self.ended = False
+
+    def __call__(self, data):
+        while data:
+            if self.current is not None:
+                f, left, remote = self.current
+                part = data[:left]
+                f.write(part)
+                data = data[len(part):]
+                left -= len(part)
+                self.written[remote] += len(part)
+                if self.progress:
+                    self.progress(len(part))
+                self.current = (f, left, remote) if left else None
+                if not left:
+                    self._finish(f, remote)
+                continue
+            self.buf += data
+            line, sep, data = self.buf.partition(b"\n")
+            if not sep:
+                if len(self.buf) > 4096:
+                    raise AdbError("Unexpected data in the root stream")
+                return
+            self.buf = b""
+            self._header(line.decode("utf-8", "replace"))
+
+    def _header(self, text):
+        if self.ended or text == ROOT_STREAM_END:
+            self.ended = True
+            return
+        size, _, remote = text.partition(" ")
+        if remote not in self.targets or remote in self.written or not size.isdigit():
+            raise AdbError(f"Unexpected header in the root stream: {text[:80]}")
+        # Written as .part and renamed once complete: a cut stream never leaves a file looking whole
+        import hashlib
+        f = _HashingWriter(open(self.targets[remote] + ".part", "wb"), hashlib.sha256())
+        self.written[remote] = 0
+        if int(size):
+            self.current = (f, int(size), remote)
+        else:
+            self._finish(f, remote)
+
+    def _finish(self, f, remote):
+        f.f.close()
+        part = self.targets[remote] + ".part"
+        want = expected_sha256(self.expected, remote)
+        if want is None:
+            _warn_unverified(remote)
+        elif want != f.digest.hexdigest():
+            os.unlink(part)
+            raise AdbError(f"Checksum mismatch for {remote} in the root stream")
+        os.replace(part, self.targets[remote])
+
+    def abort(self):
+        if self.current is not None:
+            self.current[0].f.close()
+            self.current = None
+
+    def close(self):
+        """Total bytes written; raises AdbError when a file is missing or cut short"""
+        if self.current is not None:
+            self.abort()
+            raise AdbError("Root stream ended early (truncated)")
+        missing = [r for r in self.targets if r not in self.written]
+        if not self.ended or missing:
+            raise AdbError(f"Root stream ended early ({', '.join(missing) or 'truncated'})")
+        return sum(self.written.values())
+
+def pull_files_as_root(serial, targets, progress=None, timeout=None):
+    """
+    Stream (remote, local) files out of su in one exec-out round trip, written straight
+    to their local paths: no copy in /data/local/tmp. Each file is checked against a
+    SHA-256 computed as root on the device. Returns the bytes written.
+    """
+    from . import profiler
+    from .adbClient import get_client, mark_unavailable, AdbServerUnavailable, AdbProtocolError
+    from .capabilities import root_command
+    remotes = [remote for remote, _ in targets]
+    cmd = root_command(serial, root_stream_script(remotes))
+    if cmd is None:
+        raise AdbError(f"No root access on {serial}.")
+    expected = remote_sha256_async(serial, remotes, as_root=True)
+    splitter = _StreamSplitter(targets, progress, expected)
+    client = get_client()
+    if client is not None:
+        try:
+            client.exec_stream(serial, cmd, splitter, timeout)
+            return splitter.close()
+        except AdbServerUnavailable:
+            mark_unavailable()
+        except AdbProtocolError as e:
+            splitter.abort()
+            raise AdbError(f"Root stream failed: {e}")
+        except AdbError:
+            splitter.abort()
+            raise
+    # The adb binary buffers exec-out in a local file (still nothing staged on the device)
+    import tempfile
+    adb = ["adb", "-s", serial] if serial else ["adb"]
+    with tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(targets[0][1]))) as raw:
+        try:
+            profiler.run(adb + ["exec-out", cmd], serial, check=True, stdout=raw, stderr=subprocess.PIPE, timeout=timeout)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+            raise AdbError("Root stream failed")
+        raw.seek(0)
+        splitter = _StreamSplitter(targets, progress, expected)
+        try:
+            for chunk in iter(lambda: raw.read(1 << 16), b""):
+                splitter(chunk)
+        finally:
+            splitter.abort()
+    return splitter.close()
+
+
+PROBE_DELIM = "---DELIM---"
+
+def probe_script(cached_props):
+    """Everything `status` needs from the device shell, in one round trip"""
+    from .propCache import snapshot_script
+    from .processTable import PS_SCRIPT
+    return f"; echo '{PROBE_DELIM}'; ".join([
+        snapshot_script(cached_props),
+        PS_SCRIPT,
+        "settings get global http_proxy",
+    ])
+
+class DeviceProbe(NamedTuple):
+    serial: str
+    model: str
+    android: str
+    root: bool
+    frida_status: str
+    proxy: str
+    reverse: str
+    abi: str = "?"
+
+    @property
+    def frida_running(self):
+        return self.frida_status.startswith("On")
+
+    @property
+    def proxy_set(self):
+        return bool(self.proxy) and self.proxy not in (":0", "null")
+
+    @property
+    def reverse_set(self):
+        return self.reverse != "(none)"
+
+def parse_probe(serial, output, reverse, cached_props=None):
+    """Split the probe_script() output into a DeviceProbe"""
+    from .fridaTools import format_frida_status, frida_processes
+    from .propCache import resolve
+    from . import processTable
+    parts = [p.strip() for p in output.split(PROBE_DELIM)]
+    parts += [""] * (3 - len(parts))
+    props, su = resolve(serial, cached_props, parts[0])
+    # The probe's process table serves frida commands that follow within the snapshot TTL
+    procs = processTable.parse(parts[1])
+    processTable.store(serial, procs)
+    return DeviceProbe(
+        serial=serial,
+        model=props.get("ro.product.model") or "?",
+        android=props.get("ro.build.version.release") or "?",
+        root=bool(su),
+        frida_status=format_frida_status(frida_processes(procs)),
+        proxy=parts[2],
+        reverse=reverse,
+        abi=props.get("ro.product.cpu.abi") or "?",
+    )
+
+def get_device_props(serial):
+    """Full getprop snapshot for serial, served from the boot-keyed disk cache when still valid"""
+    from .propCache import load, resolve, snapshot_script
+    cached = load(serial)
+    out = adb_shell([snapshot_script(cached)], serial, check=False, timeout=10)
+    if not out:
+        raise AdbError("Device disconnected or cannot read properties.")
+    return resolve(serial, cached, out)[0]
+
+def probe_device(serial, timeout=5):
+    """Coalesced: a status probe already running for serial is shared"""
+    from .scheduler import coalesce
+    return coalesce(("probe", serial), lambda: _probe_device(serial, timeout))
+
+def _probe_device(serial, timeout=5):
+    """
+    Collect model, Android version, root, frida, proxy and reverse state in one device exchange.
+    Static properties come from the on-disk cache while the boot id is unchanged.
+    The reverse list is a separate adb service, so it is fetched concurrently with the shell batch.
+    """
+    import threading
+    from .scheduler import current_priority, set_priority
+    reverse = {}
+    from .profiler import current_source, set_source
+    priority, label = current_priority(), current_source()
+    def _reverse():
+        set_priority(priority)
+        set_source(label)
+        try:
+            reverse["value"] = get_reverse_ports(serial)
+        except AdbError as e:
+            reverse["error"] = e
+    from .propCache import load
+    cached = load(serial)
+    t = threading.Thread(target=_reverse, daemon=True)
+    t.start()
+    out = adb_shell([probe_script(cached)], serial, check=False, timeout=timeout)
+    t.join()
+    if not out or PROBE_DELIM not in out or "error" in reverse:
+        raise AdbError("Device disconnected or cannot probe device status.")
+    return parse_probe(serial, out, reverse["value"], cached)
+
+def get_device_info(serial):
+    probe = probe_device(serial)
     return {
         "serial": serial,
-        "model": model,
-        "android": android,
-        "root": root,
-        "frida_status": frida_status,
-        "proxy": proxy,
-        "reverse": reverse,
-    }
\ No newline at end of file
+        "model": probe.model,
+        "android": probe.android,
+        "root": "Yes" if probe.root else "No",
+        "frida_status": probe.frida_status,
+        "proxy": probe.proxy,
+        "reverse": probe.reverse,
+    }
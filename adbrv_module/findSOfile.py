@@ -6,6 +6,7 @@ import os
 import subprocess
 import sys
 from .utils import print_colored, print_error, print_success, RED, GREEN, check_dependencies
+from . import profiler
 
 def find_so_files():
     """
@@ -22,7 +23,7 @@ def find_so_files():
     for apk in apk_files:
         try:
             # Use unzip -l to list contents and grep for .so files
-            result = subprocess.run(
+            result = profiler.run(
                 ['unzip', '-l', apk], 
                 capture_output=True, 
                 text=True, 
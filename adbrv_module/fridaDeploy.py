@@ -0,0 +1,326 @@
+"""
+frida-server deployment
+
+Server binaries are kept in a local versioned cache,
+<cache>/frida/<version>/frida-server-<version>-android-<arch>, filled from
+release downloads or local files (`.xz` archives are decompressed as they are
+read, never held in memory). Each device's ABI comes from ro.product.cpu.abi
+in the property cache; the matching binary is pushed only when the SHA-256 of
+the file already on the device differs. The push goes to a temporary name
+and is renamed into place, so a running server is never written over: it keeps
+its old binary until restarted (`--restart` restarts it on the new one).
+"""
+
+import json
+import lzma
+import os
+import re
+import threading
+import time
+from typing import NamedTuple
+
+RELEASE_URL = "https://github.com/frida/frida/releases/download/{version}/frida-server-{version}-android-{arch}.xz"
+LATEST_URL = "https://api.github.com/repos/frida/frida/releases/latest"
+REMOTE_DIR = "/data/local/tmp"
+DEFAULT_NAME = "frida-server"
+# Seconds one device may take (a ~50 MB push over a slow USB link included)
+DEPLOY_DEADLINE = 600
+DOWNLOAD_TIMEOUT = 60
+CHUNK = 1 << 20
+
+# ro.product.cpu.abi -> frida release architecture
+ABI_ARCH = {
+    "arm64-v8a": "arm64",
+    "armeabi-v7a": "arm",
+    "armeabi": "arm",
+    "x86_64": "x86_64",
+    "x86": "x86",
+}
+ARCHES = ("arm64", "arm", "x86_64", "x86")
+# ELF e_machine -> frida release architecture
+_ELF_MACHINES = {0x28: "arm", 0xB7: "arm64", 0x03: "x86", 0x3E: "x86_64"}
+_NAME_RE = re.compile(r"-(\d+(?:\.\d+)+)-android-(arm64|arm|x86_64|x86)(?:\.xz)?$")
+
+_lock = threading.Lock()
+
+
+class FridaDeployError(Exception):
+    pass
+
+
+class DeployResult(NamedTuple):
+    serial: str
+    arch: str
+    version: str
+    action: str         # "pushed" or "unchanged"
+    bytes: int          # sent to the device
+    seconds: float
+    restarted: bool     # a running server was restarted on the new binary
+
+
+# -- local cache ----------------------------------------------------------
+
+def _version_key(version):
+    return tuple(int(p) if p.isdigit() else 0 for p in version.split("."))
+
+
+def cached_versions():
+    """Versions in the cache, newest first"""
+    from .utils import get_cache_dir
+    root = get_cache_dir("frida")
+    versions = [v for v in os.listdir(root) if os.path.isdir(os.path.join(root, v))]
+    return sorted(versions, key=_version_key, reverse=True)
+
+
+def binary_path(version, arch):
+    from .utils import get_cache_dir
+    return os.path.join(get_cache_dir("frida", version), f"frida-server-{version}-android-{arch}")
+
+
+def cached_binary(version, arch):
+    """The cached binary for (version, arch), or None"""
+    path = binary_path(version, arch)
+    return path if os.path.isfile(path) else None
+
+
+def parse_name(filename):
+    """(version, arch) from a release file name such as frida-server-16.6.3-android-arm64.xz, or (None, None)"""
+    match = _NAME_RE.search(os.path.basename(filename))
+    return match.groups() if match else (None, None)
+
+
+def elf_arch(path):
+    """Architecture of an ELF executable from its header, or None"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(20)
+    except OSError:
+        return None
+    if len(header) < 20 or header[:4] != b"\x7fELF":
+        return None
+    return _ELF_MACHINES.get(int.from_bytes(header[18:20], "big" if header[5] == 2 else "little"))
+
+
+def _store(chunks, target_for, xz):
+    """
+    Write chunks (decompressed on the fly when xz) to a temporary file, then move it to
+    target_for(tmp); returns the final path. The SHA-256 is computed while writing and kept
+    next to the binary.
+    """
+    import hashlib
+    from .utils import get_cache_dir
+    tmp = os.path.join(get_cache_dir("frida"), f".import.{os.getpid()}.{threading.get_ident()}.tmp")
+    digest = hashlib.sha256()
+    decompressor = lzma.LZMADecompressor() if xz else None
+    try:
+        with open(tmp, "wb") as f:
+            for chunk in chunks:
+                data = decompressor.decompress(chunk) if decompressor else chunk
+                digest.update(data)
+                f.write(data)
+        if decompressor is not None and not decompressor.eof:
+            raise FridaDeployError("Truncated .xz archive")
+        os.chmod(tmp, 0o755)
+        target = target_for(tmp)
+        with open(f"{target}.sha256", "w") as f:
+            f.write(digest.hexdigest())
+        os.replace(tmp, target)
+    except lzma.LZMAError as e:
+        raise FridaDeployError(f"Cannot decompress archive: {e}")
+    except OSError as e:
+        raise FridaDeployError(f"Cannot write to the frida cache: {e}")
+    finally:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+    return target
+
+
+def _read_chunks(stream):
+    return iter(lambda: stream.read(CHUNK), b"")
+
+
+def import_server(path, version=None):
+    """
+    Add a local frida-server binary or .xz archive to the cache; returns (version, arch).
+    The architecture comes from the ELF header (else the file name), the version from the
+    file name unless given.
+    """
+    name_version, name_arch = parse_name(path)
+    version = version or name_version
+    if not version:
+        raise FridaDeployError(f"Cannot tell the frida version of {os.path.basename(path)}; pass --version")
+    found = {}
+
+    def target_for(tmp):
+        arch = elf_arch(tmp) or name_arch
+        if arch not in ARCHES:
+            raise FridaDeployError(f"{os.path.basename(path)} is not an Android frida-server binary")
+        found["arch"] = arch
+        return binary_path(version, arch)
+    try:
+        with open(path, "rb") as f:
+            _store(_read_chunks(f), target_for, path.endswith(".xz"))
+    except OSError as e:
+        raise FridaDeployError(f"Cannot read {path}: {e}")
+    return version, found["arch"]
+
+
+def latest_version():
+    """Tag of the latest frida release"""
+    import urllib.request
+    try:
+        with urllib.request.urlopen(LATEST_URL, timeout=DOWNLOAD_TIMEOUT) as response:
+            return json.load(response)["tag_name"]
+    except (OSError, ValueError, KeyError) as e:
+        raise FridaDeployError(f"Cannot look up the latest frida release: {e}")
+
+
+def download(version, arch):
+    """Download and decompress the release binary for (version, arch) into the cache unless present; returns its path"""
+    from .scheduler import coalesce
+
+    def fetch():
+        import urllib.request
+        cached = cached_binary(version, arch)
+        if cached:
+            return cached
+        url = RELEASE_URL.format(version=version, arch=arch)
+        try:
+            with urllib.request.urlopen(url, timeout=DOWNLOAD_TIMEOUT) as response:
+                return _store(_read_chunks(response), lambda tmp: binary_path(version, arch), xz=True)
+        except OSError as e:
+            raise FridaDeployError(f"Cannot download {url}: {e}")
+    return coalesce(("frida-download", version, arch), fetch)
+
+
+def local_sha256(path):
+    """SHA-256 of a cached binary, from its sidecar file when that is newer than the binary"""
+    from .apkStore import sha256_file
+    sidecar = f"{path}.sha256"
+    try:
+        if os.path.getmtime(sidecar) >= os.path.getmtime(path):
+            with open(sidecar) as f:
+                return f.read().strip()
+    except OSError:
+        pass
+    sha = sha256_file(path)
+    try:
+        with open(sidecar, "w") as f:
+            f.write(sha)
+    except OSError:
+        pass
+    return sha
+
+
+# -- devices --------------------------------------------------------------
+
+def device_arch(serial):
+    """frida architecture of the device's primary ABI"""
+    from .devices import get_device_props
+    abi = get_device_props(serial).get("ro.product.cpu.abi", "")
+    arch = ABI_ARCH.get(abi)
+    if arch is None:
+        raise FridaDeployError(f"Unsupported ABI '{abi or 'unknown'}'")
+    return arch
+
+
+def resolve_binary(arch, version=None, fetch=False):
+    """(version, path) of the binary to deploy for arch: the given or newest cached version, downloaded when fetch"""
+    if version is None and not fetch:
+        for v in cached_versions():
+            if cached_binary(v, arch):
+                return v, binary_path(v, arch)
+        raise FridaDeployError(f"No frida-server for {arch} in the cache; use --download or --file")
+    if version is None:
+        raise FridaDeployError("No frida version given")
+    path = cached_binary(version, arch)
+    if path is None and fetch:
+        path = download(version, arch)
+    if path is None:
+        raise FridaDeployError(f"frida-server {version} for {arch} is not in the cache; use --download or --file")
+    return version, path
+
+
+def deploy_device(serial, version=None, fetch=False, name=DEFAULT_NAME, restart=False, progress=None):
+    """
+    Put the cached server matching serial's ABI at REMOTE_DIR/name, skipping the push when the
+    device already has the same file; returns a DeployResult
+    """
+    import shlex
+    from .devices import adb_shell, push_file, remote_sha256, AdbError
+    from .fridaTools import frida_processes, kill_frida_processes, launch_frida_server, _runs
+    from . import processTable
+    start = time.perf_counter()
+    arch = device_arch(serial)
+    version, local = resolve_binary(arch, version, fetch)
+    remote = f"{REMOTE_DIR}/{name}"
+
+    if remote_sha256(serial, [remote]).get(remote) == local_sha256(local):
+        return DeployResult(serial, arch, version, "unchanged", 0, time.perf_counter() - start, False)
+
+    # Pushed next to the target and renamed over it: writing to a running binary fails (ETXTBSY)
+    tmp = f"{REMOTE_DIR}/.adbrv-deploy-{arch}"
+    try:
+        sent = push_file(local, tmp, serial, mode=0o755, progress=progress)
+    except AdbError as e:
+        raise FridaDeployError(str(e))
+    out = adb_shell([f"mv -f {shlex.quote(tmp)} {shlex.quote(remote)} && echo OK"], serial, check=False)
+    if (out or "").strip() != "OK":
+        adb_shell(["rm", "-f", tmp], serial, check=False)
+        raise FridaDeployError(f"Cannot replace {remote}")
+
+    restarted = False
+    if restart:
+        running = [p for p in frida_processes(processTable.snapshot(serial, max_age=0)) if _runs(p, name)]
+        if running:
+            kill_frida_processes(serial, running)
+            launch = launch_frida_server(serial, remote)
+            processTable.invalidate(serial)
+            if not launch.ready:
+                raise FridaDeployError(f"Pushed {name}, but the restarted server did not come up")
+            restarted = True
+    return DeployResult(serial, arch, version, "pushed", sent, time.perf_counter() - start, restarted)
+
+
+def deploy_all(devices, version=None, fetch=False, name=DEFAULT_NAME, restart=False):
+    """Deploy to every device concurrently with live push progress; returns the DeviceResults"""
+    from rich.console import Console
+    from rich.progress import Progress, TextColumn, BarColumn, DownloadColumn, TransferSpeedColumn
+    from .devices import map_devices
+    from .fridaTools import frida_processes, _runs
+    from .processTable import snapshot
+    from .pullAPK import _fmt_size
+    console = Console()
+    if "rida-server" not in name or "/" in name:
+        raise FridaDeployError("The server name must contain 'frida-server' or 'florida-server' (no directories)")
+    if fetch and version is None:
+        with console.status("[cyan]🔍 Looking up the latest frida release...[/cyan]", spinner="dots"):
+            version = latest_version()
+
+    columns = (TextColumn("  {task.description}"), BarColumn(), DownloadColumn(), TransferSpeedColumn())
+    with Progress(*columns, console=console, transient=True) as progress:
+        def run(serial):
+            task = progress.add_task(serial, total=None)
+            try:
+                return deploy_device(serial, version, fetch, name, restart, lambda n: progress.advance(task, n))
+            finally:
+                progress.remove_task(task)
+        results = map_devices(run, devices, deadline=DEPLOY_DEADLINE)
+
+    for res in results:
+        if res.error is not None:
+            console.print(f"  [bold red]✖[/bold red] {res.serial:<12} [red]{res.error}[/red]")
+            continue
+        r = res.value
+        label = f"{name} {r.version} ({r.arch})"
+        if r.action == "unchanged":
+            console.print(f"  [bold green]✔[/bold green] {r.serial:<12} [cyan]{label}[/cyan] [dim]up to date[/dim]")
+            continue
+        rate = _fmt_size(r.bytes / r.seconds if r.seconds else 0)
+        note = ", server restarted" if r.restarted else ""
+        console.print(f"  [bold green]✔[/bold green] {r.serial:<12} [cyan]{label}[/cyan] [dim]pushed {_fmt_size(r.bytes)} in {r.seconds:.1f}s ({rate}/s){note}[/dim]")
+        if not restart and any(_runs(p, name) for p in frida_processes(snapshot(r.serial))):
+            console.print(f"  [bold yellow]![/bold yellow] {r.serial:<12} [yellow]running server keeps the old binary until restarted (--restart)[/yellow]")
+    return results
@@ -2,95 +2,148 @@
 Frida server management tools for Android devices
 """
 
+import os
 import subprocess
 import time
+from typing import NamedTuple
 from .devices import get_connected_devices, adb_shell, AdbError
 from .utils import print_success, print_error, print_info, print_warning
 
+FRIDA_GLOB = "/data/local/tmp/*rida-server*"
+FRIDA_PORT = 27042
+# Seconds to wait for a launched server to listen before giving up
+READY_TIMEOUT = float(os.environ.get("ADBRV_FRIDA_READY_TIMEOUT", "10"))
+_PORTS_MARK = "---PORTS---"
+
+class FridaLaunch(NamedTuple):
+    ready: bool
+    seconds: float      # from launch until ready (or until giving up)
+    listening: bool     # confirmed listening on FRIDA_PORT, not only seen as a process
+
+def list_frida_servers(serial):
+    """Server binaries in /data/local/tmp, or None if the glob matched nothing"""
+    ls_out = adb_shell(["ls", FRIDA_GLOB], serial)
+    if ls_out is None:
+        return None
+    return ls_out.splitlines()
+
+def frida_processes(procs):
+    """frida/florida server processes from a process table"""
+    from .processTable import matching
+    return matching(procs, "rida-server")
+
+def is_frida_running(serial):
+    from .processTable import snapshot
+    return bool(frida_processes(snapshot(serial)))
+
+def readiness_script():
+    """The process table, then the device's TCP sockets, in one round trip"""
+    from .processTable import PS_SCRIPT
+    return f"{PS_SCRIPT}; echo '{_PORTS_MARK}'; cat /proc/net/tcp /proc/net/tcp6 2>/dev/null"
+
+def listening_ports(proc_net_tcp):
+    """Local ports in LISTEN state from /proc/net/tcp{,6} text"""
+    ports = set()
+    for line in proc_net_tcp.splitlines():
+        fields = line.split()
+        if len(fields) > 3 and fields[3] == "0A" and ":" in fields[1]:
+            try:
+                ports.add(int(fields[1].rsplit(":", 1)[1], 16))
+            except ValueError:
+                pass
+    return ports
+
+def _runs(proc, binary):
+    """proc was started from binary (a server file name)"""
+    argv0 = proc.cmdline.split()[0] if proc.cmdline.strip() else proc.name
+    return os.path.basename(proc.name) == binary or os.path.basename(argv0) == binary
+
+def wait_for_frida(serial, port=FRIDA_PORT, timeout=READY_TIMEOUT, binary=None):
+    """
+    Poll with backoff until a server (started from binary, when given) runs and port listens;
+    returns (running, listening). Where /proc/net/tcp is not readable a running process is
+    taken as ready; a process that shows up and then exits ends the wait early.
+    """
+    from . import processTable
+    deadline = time.monotonic() + timeout
+    delay, seen = 0.05, False
+    while True:
+        out = adb_shell([readiness_script()], serial, check=False, timeout=5) or ""
+        table, _, net = out.partition(_PORTS_MARK)
+        procs = processTable.parse(table)
+        processTable.store(serial, procs)
+        running = any(binary is None or _runs(p, binary) for p in frida_processes(procs))
+        if running and port in listening_ports(net):
+            return True, True
+        if running and not net.strip():
+            return True, False
+        if (seen and not running) or time.monotonic() + delay > deadline:
+            return running, False
+        seen = seen or running
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+def launch_frida_server(serial, fsName):
+    """Make fsName executable, start it as root detached from the shell and wait until it listens; returns a FridaLaunch"""
+    # Set executable permission
+    # Root route first when the device has one (root-owned files), fallback to shell, then proceed anyway
+    import shlex
+    from .capabilities import run_as_root, root_command
+    safe_name = shlex.quote(fsName)
+    if run_as_root(serial, f"chmod +x {safe_name}") is None:
+        if adb_shell(["chmod", "+x", fsName], serial) is None:
+            print_warning(f"chmod failed for {fsName}, file may already have execute permission — proceeding anyway.")
+
+    # Start with root privileges in the background; with no stdio left attached the
+    # one-shot exec returns at once instead of waiting out a timeout
+    from .devices import exec_out
+    detached = f"{safe_name} </dev/null >/dev/null 2>&1 &"
+    start = time.perf_counter()
+    exec_out(root_command(serial, detached) or detached, serial, timeout=10)
+    running, listening = wait_for_frida(serial, binary=os.path.basename(fsName))
+    return FridaLaunch(running, time.perf_counter() - start, listening)
+
 def start_frida_server(serial=None):
     """Start frida-server on Android device"""
     from .devices import select_device
     serial = select_device(serial)
     
-    adb_base = ["adb"]
-    if serial:
-        adb_base += ["-s", serial]
     from rich.console import Console
     console = Console()
     
-    fs = "/data/local/tmp/*rida-server*"
-    
     try:
         # Check if frida-server exists
-        result = subprocess.run(adb_base + ["shell", "ls", fs], capture_output=True, text=True)
+        frida_files = list_frida_servers(serial)
         
-        if result.returncode != 0:
+        if frida_files is None:
             console.print("  [bold red][!] Frida/Florida Server Not Found!![/bold red]")
             console.print("  [yellow][!] Please check the server filename in /data/local/tmp.[/yellow]")
             return False
             
         # Get server filename
-        frida_files = result.stdout.strip().splitlines()
         if not frida_files:
             console.print("  [bold red][!] No Frida/Florida server files found![/bold red]")
             console.print("  [yellow][!] Please check the server filename in /data/local/tmp.[/yellow]")
             return False
             
-        if len(frida_files) == 1:
-            fsName = frida_files[0]
-            console.print(f"  [cyan][i] Found: {fsName}[/cyan]")
-        else:
-            import questionary
-            fsName = questionary.select(
-                "Select which server to start:",
-                choices=frida_files,
-                instruction="(Use arrow keys)"
-            ).ask()
-            
-            if not fsName:  # User cancelled
-                return False
-                
-            console.print(f"  [cyan][i] Selected: {fsName}[/cyan]")
+        fsName = _choose_server(frida_files, console)
+        if not fsName:  # User cancelled
+            return False
 
         # Check if already running
-        ps_result = subprocess.run(adb_base + ["shell", "ps | grep rida-server"], 
-                                 capture_output=True, text=True)
-
-        if "rida-server" in ps_result.stdout:
+        if is_frida_running(serial):
             console.print("  [bold yellow][!] Frida/Florida Server Is Already Running[/bold yellow]")
             return True
 
         # Start frida-server
         with console.status("  [cyan]Starting server...[/cyan]", spinner="bouncingBar"):
-            # Set executable permission
-            # Try su first (for root-owned files), fallback to shell, then proceed anyway
-            import shlex
-            safe_name = shlex.quote(fsName)
-            su_chmod = subprocess.run(adb_base + ["shell", "su", "-c", f"chmod +x {safe_name}"], capture_output=True)
-            if su_chmod.returncode != 0:
-                plain_chmod = subprocess.run(adb_base + ["shell", "chmod", "+x", fsName], capture_output=True)
-                if plain_chmod.returncode != 0:
-                    print_warning(f"chmod failed for {fsName}, file may already have execute permission — proceeding anyway.")
-
-            # Start with root privileges (run in background)
-            try:
-                subprocess.run(adb_base + ["shell", "su", "-c", f"{fsName} &"], check=True, timeout=10)
-            except subprocess.TimeoutExpired:
-                # Timeout is expected when starting background process
-                pass
-
-            time.sleep(2)
-
-            # Verify start
-            verify_result = subprocess.run(adb_base + ["shell", "ps | grep rida-server"], 
-                                         capture_output=True, text=True)
-            
-            if "rida-server" in verify_result.stdout:
-                console.print(f"  [bold green]✔[/bold green] Server     [cyan]{fsName}[/cyan]")
-                return True
-            else:
-                console.print("  [bold red]✖ Server Start Failed!! Check & Try Again[/bold red]")
-                return False
+            launch = launch_frida_server(serial, fsName)
+        if launch.ready:
+            console.print(f"  [bold green]✔[/bold green] Server     [cyan]{fsName}[/cyan] [dim]{_describe_launch(launch)}[/dim]")
+            return True
+        else:
+            console.print("  [bold red]✖ Server Start Failed!! Check & Try Again[/bold red]")
+            return False
             
     except subprocess.CalledProcessError as e:
         console.print(f"  [bold red][!] Error: {e}[/bold red]")
@@ -99,64 +152,107 @@ def start_frida_server(serial=None):
         console.print(f"  [bold red][!] Unexpected error: {e}[/bold red]")
         return False
 
+def _describe_launch(launch):
+    where = f"listening on {FRIDA_PORT}" if launch.listening else "running"
+    return f"({where} after {launch.seconds:.2f}s)"
+
+def _choose_server(frida_files, console, serial=None):
+    where = f" on {serial}" if serial else ""
+    if len(frida_files) == 1:
+        console.print(f"  [cyan][i] Found{where}: {frida_files[0]}[/cyan]")
+        return frida_files[0]
+    import questionary
+    fsName = questionary.select(
+        f"Select which server to start{where}:",
+        choices=frida_files,
+        instruction="(Use arrow keys)"
+    ).ask()
+    if fsName:
+        console.print(f"  [cyan][i] Selected{where}: {fsName}[/cyan]")
+    return fsName
+
+def start_frida_all(devices):
+    """Start frida-server on every device; binaries are chosen up front, launches run concurrently"""
+    from rich.console import Console
+    from .devices import map_devices
+    console = Console()
+
+    listings = map_devices(lambda s: (list_frida_servers(s), is_frida_running(s)), devices)
+    targets = {}
+    for res in listings:
+        if res.error is not None:
+            console.print(f"  [bold red]✖[/bold red] {res.serial:<12} [red]{res.error}[/red]")
+            continue
+        frida_files, running = res.value
+        if running:
+            console.print(f"  [bold yellow]![/bold yellow] {res.serial:<12} [yellow]server already running[/yellow]")
+        elif not frida_files:
+            console.print(f"  [bold red]✖[/bold red] {res.serial:<12} [red]no frida/florida server in /data/local/tmp[/red]")
+        else:
+            fsName = _choose_server(frida_files, console, res.serial)
+            if fsName:
+                targets[res.serial] = fsName
+    if not targets:
+        return
+
+    with console.status(f"  [cyan]Starting server on {len(targets)} devices...[/cyan]", spinner="bouncingBar"):
+        results = map_devices(lambda s: launch_frida_server(s, targets[s]), list(targets))
+    for res in results:
+        if res.error is None and res.value.ready:
+            console.print(f"  [bold green]✔[/bold green] {res.serial:<12} [cyan]{targets[res.serial]}[/cyan] [dim]{_describe_launch(res.value)}[/dim]")
+        else:
+            reason = res.error or "server start failed"
+            console.print(f"  [bold red]✖[/bold red] {res.serial:<12} [red]{reason}[/red]")
+
+def find_frida_processes(serial):
+    """Every running frida/florida server process (processTable.Process)"""
+    from .processTable import snapshot
+    return frida_processes(snapshot(serial))
+
+def kill_frida_processes(serial, procs):
+    """Kill the given processes with one kill command and check a fresh process table; returns [(pid, killed)]"""
+    from .capabilities import run_as_root
+    from . import processTable
+    if not procs:
+        return []
+    pids = " ".join(str(p.pid) for p in procs)
+    if run_as_root(serial, f"kill -9 {pids}") is None:
+        # Servers started as shell (no root) can still be killed by the shell user
+        adb_shell([f"kill -9 {pids}"], serial, check=False)
+    processTable.invalidate(serial)
+    alive = {p.pid for p in processTable.snapshot(serial)}
+    return [(str(p.pid), p.pid not in alive) for p in procs]
+
 def frida_kill(serial=None):
     """Kill all running frida/florida server processes on the device"""
     from .devices import select_device
+    from rich.console import Console
     serial = select_device(serial)
             
     # List server processes
-    ps_out = adb_shell(["ps", "|", "grep", "rida-server"], serial)
-    if not ps_out or "rida-server" not in ps_out:
-        from rich.console import Console
-        Console().print("  [dim][i] No frida/florida server process running.[/dim]")
-        return
-        
-    # Parse PIDs
-    procs = []
-    for line in ps_out.splitlines():
-        if "rida-server" in line:
-            parts = line.split()
-            pid = None
-            for p in parts[1:]:
-                if p.isdigit():
-                    pid = p
-                    break
-            if pid:
-                procs.append((pid, line))
-                
+    procs = find_frida_processes(serial)
     if not procs:
-        from rich.console import Console
         Console().print("  [dim][i] No frida/florida server process running.[/dim]")
         return
         
     if len(procs) > 1:
         print("Multiple server processes found:")
-        for pid, line in procs:
-            print(f"  PID {pid}: {line}")
+        for p in procs:
+            print(f"  PID {p.pid}: {p.user} {p.cmdline}")
         import questionary
         confirm = questionary.confirm(
             "Do you want to kill all server processes?"
         ).ask()
         if not confirm:
-            from rich.console import Console
             Console().print("  [dim][i] Abort killing server processes.[/dim]")
             return
             
-    for pid, _ in procs:
-        # Use correct shell quoting for Android su
-        adb_base = ["adb"]
-        if serial:
-            adb_base += ["-s", serial]
-        kill_cmd = f"su -c 'kill -9 {pid}'"
-        try:
-            subprocess.run(adb_base + ["shell", kill_cmd], check=True)
-            from rich.console import Console
+    for pid, killed in kill_frida_processes(serial, procs):
+        if killed:
             Console().print(f"  [bold green]✔[/bold green] Killed    [cyan]PID {pid} on {serial}[/cyan]")
-        except Exception as e:
-            from rich.console import Console
-            Console().print(f"  [bold red]✖[/bold red] Failed to kill PID {pid}: {e}")
+        else:
+            Console().print(f"  [bold red]✖[/bold red] Failed to kill PID {pid}")
             
-    from rich.console import Console
     _console = Console()
     with _console.status("  [dim]Verifying...[/dim]", spinner="dots"):
         frida_status = get_frida_status(serial)
@@ -165,27 +261,38 @@ def frida_kill(serial=None):
     else:
         _console.print(f"  [bold green]✔[/bold green] Frida     [cyan]stopped[/cyan]")
 
+def _kill_and_verify(serial):
+    procs = find_frida_processes(serial)
+    killed = kill_frida_processes(serial, procs)
+    return killed, get_frida_status(serial) if procs else "Off"
+
+def frida_kill_all(devices):
+    """Kill every frida/florida server process on every device concurrently (no prompts)"""
+    from rich.console import Console
+    from .devices import map_devices
+    console = Console()
+    with console.status(f"  [dim]Killing servers on {len(devices)} devices...[/dim]", spinner="dots"):
+        results = map_devices(_kill_and_verify, devices)
+    for res in results:
+        if res.error is not None:
+            console.print(f"  [bold red]✖[/bold red] {res.serial:<12} [red]{res.error}[/red]")
+            continue
+        killed, frida_status = res.value
+        if not killed:
+            console.print(f"  [dim][i] {res.serial:<12} no frida/florida server process running.[/dim]")
+        elif "On" in frida_status:
+            console.print(f"  [bold yellow]⚠[/bold yellow] {res.serial:<12} still running: [cyan]{frida_status}[/cyan]")
+        else:
+            pids = ", ".join(pid for pid, _ in killed)
+            console.print(f"  [bold green]✔[/bold green] {res.serial:<12} [cyan]stopped (PID {pids})[/cyan]")
+
 def get_frida_status(serial):
     """Get frida/florida server status for a device"""
-    frida_ps = adb_shell(["ps", "|", "grep", "rida-server"], serial)
-    if frida_ps and "rida-server" in frida_ps:
-        try:
-            pid = None
-            user = "shell"
-            for line in frida_ps.splitlines():
-                if "rida-server" in line:
-                    parts = line.split()
-                    # First column is usually USER
-                    if len(parts) > 0:
-                        user = parts[0]
-                    for p in parts[1:]:
-                        if p.isdigit():
-                            pid = p
-                            break
-                    if pid:
-                        break
-            return f"On ({user} - PID: {pid})" if pid else f"On ({user})"
-        except Exception:
-            return "On"
-    else:
+    from .processTable import snapshot
+    return format_frida_status(frida_processes(snapshot(serial)))
+
+def format_frida_status(procs):
+    """Turn frida_processes() into the On/Off status string"""
+    if not procs:
         return "Off"
+    return f"On ({procs[0].user} - PID: {procs[0].pid})"
@@ -0,0 +1,273 @@
+"""
+frida-server watchdog
+
+Each watched device runs one long-lived `exec:` stream with a small script.
+The script checks /proc/<pid>/stat of the server once a second, using the
+shell's `read` builtin so a check spawns nothing but `sleep`. It prints a
+keep-alive line every HEARTBEAT checks and `exited` when the server dies. The
+host side is one blocked socket read per device, with no `ps` polling. When
+the stream ends for any reason (server exit, reboot, cable pulled), a fresh
+process table decides what happened:
+
+  - the same server still runs: the watch is re-armed
+  - another server started from the same binary: that one is adopted
+  - no server: the binary it was started from is launched again
+
+Restart latency (exit noticed to listening) and restart/failure counts are
+printed as they happen, summarised on exit and optionally appended to a JSON
+lines log.
+"""
+
+import json
+import os
+import subprocess
+import threading
+import time
+from typing import NamedTuple
+
+from .devices import AdbError
+
+WATCH_INTERVAL = 1          # seconds between device-side checks
+HEARTBEAT = 15              # checks between keep-alive lines
+STALL_TIMEOUT = 3 * HEARTBEAT * WATCH_INTERVAL
+CRASH_WINDOW = 10           # a server dying sooner than this after a restart counts as a crash loop
+MAX_BACKOFF = 60
+OFFLINE_POLL = 2
+
+
+class WatchdogError(Exception):
+    pass
+
+
+class RestartEvent(NamedTuple):
+    serial: str
+    binary: str
+    old_pid: int
+    new_pid: int        # 0 when the restart failed
+    seconds: float      # exit noticed -> server ready (or given up)
+    ready: bool
+
+
+class WatchStats:
+    """Restart counters of one device"""
+
+    def __init__(self, serial, binary):
+        self.serial = serial
+        self.binary = binary
+        self.restarts = 0
+        self.failures = 0
+        self.latencies = []
+
+    def add(self, event):
+        if event.ready:
+            self.restarts += 1
+            self.latencies.append(event.seconds)
+        else:
+            self.failures += 1
+
+
+def watch_script(pid, interval=WATCH_INTERVAL, heartbeat=HEARTBEAT):
+    """Device shell loop that returns once pid is gone (a zombie counts as gone), printing keep-alives meanwhile"""
+    return (
+        f"p={int(pid)}; n=0; "
+        f"while read -r _ _ st _ < /proc/$p/stat 2>/dev/null && [ \"$st\" != Z ]; do "
+        f"sleep {interval}; n=$((n+1)); [ $n -ge {heartbeat} ] && {{ echo alive; n=0; }}; "
+        f"done; echo exited"
+    )
+
+
+def server_binary(proc):
+    """Device path a server process was started from"""
+    from .fridaTools import FRIDA_GLOB
+    argv0 = proc.cmdline.split()[0] if proc.cmdline.strip() else proc.name
+    if argv0.startswith("/"):
+        return argv0
+    return f"{os.path.dirname(FRIDA_GLOB)}/{os.path.basename(argv0)}"
+
+
+def wait_for_exit(serial, pid, stop):
+    """
+    Block until pid exits on the device (True) or the watch stream ends without
+    reporting it, e.g. the device went away (False)
+    """
+    from .adbClient import get_client, mark_unavailable, AdbServerUnavailable, AdbProtocolError
+    script = watch_script(pid)
+    seen = []
+    client = get_client()
+    if client is not None:
+        try:
+            client.exec_stream(serial, script, seen.append, timeout=STALL_TIMEOUT, trace=False)
+            return b"exited" in b"".join(seen)
+        except AdbServerUnavailable:
+            mark_unavailable()
+        except (AdbProtocolError, OSError):
+            return False
+    adb = ["adb", "-s", serial] if serial else ["adb"]
+    proc = subprocess.Popen(adb + ["exec-out", script], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def stopper():
+        while not stop.wait(0.5):
+            if proc.poll() is not None:
+                return
+        proc.kill()
+    threading.Thread(target=stopper, daemon=True).start()
+    with proc.stdout:
+        out = proc.stdout.read()
+    proc.wait()
+    return b"exited" in out
+
+
+def _online(serial):
+    from .devices import get_connected_devices
+    try:
+        return serial in get_connected_devices()
+    except AdbError:
+        return False
+
+
+def _current_server(serial, binary):
+    """The running process started from binary, or None"""
+    from .fridaTools import frida_processes, _runs
+    from .processTable import snapshot
+    for p in frida_processes(snapshot(serial, max_age=0)):
+        if _runs(p, os.path.basename(binary)):
+            return p
+    return None
+
+
+def watch_device(serial, binary, pid, stop, on_event=None, stats=None):
+    """Keep a server from binary running on serial until stop is set; restarts are reported to on_event(kind, info)"""
+    from .fridaTools import launch_frida_server
+    from .daemon import invalidate
+    stats = stats or WatchStats(serial, binary)
+    emit = on_event or (lambda kind, info: None)
+    backoff, last_start = 0, float("-inf")  # a server started before the watch is not a crash loop
+    while not stop.is_set():
+        exited = wait_for_exit(serial, pid, stop)
+        noticed = time.monotonic()
+        if stop.is_set():
+            break
+        if not _online(serial):
+            emit("offline", {"serial": serial})
+            while not stop.wait(OFFLINE_POLL) and not _online(serial):
+                pass
+            if stop.is_set():
+                break
+            emit("online", {"serial": serial})
+            noticed = time.monotonic()
+        current = _current_server(serial, binary)
+        if current is not None:
+            if current.pid != pid:
+                emit("adopted", {"serial": serial, "pid": current.pid, "old_pid": pid})
+            pid = current.pid
+            continue
+        # Crash loops and failed launches back off instead of hammering the device
+        backoff = min(max(1, backoff * 2), MAX_BACKOFF) if noticed - last_start < CRASH_WINDOW else 0
+        emit("exited", {"serial": serial, "pid": pid, "reported": exited, "backoff": backoff})
+        if backoff and stop.wait(backoff):
+            break
+        try:
+            launch = launch_frida_server(serial, binary)
+            ready = launch.ready
+        except AdbError:
+            ready = False
+        last_start = time.monotonic()
+        current = _current_server(serial, binary) if ready else None
+        # Latency leaves out the deliberate backoff wait
+        event = RestartEvent(serial, binary, pid, current.pid if current else 0,
+                             last_start - noticed - backoff, current is not None)
+        stats.add(event)
+        emit("restarted" if event.ready else "failed", dict(event._asdict(), restarts=stats.restarts, failures=stats.failures))
+        invalidate(serial)
+        if current is not None:
+            pid = current.pid
+    return stats
+
+
+def _select_targets(devices, console):
+    """{serial: (binary, pid)} for every device, starting a server where none runs"""
+    from .devices import map_devices
+    from .fridaTools import find_frida_processes, list_frida_servers, launch_frida_server, _choose_server
+    targets = {}
+    pending = {}
+    for res in map_devices(lambda s: (find_frida_processes(s), list_frida_servers(s)), devices):
+        if res.error is not None:
+            console.print(f"  [bold red]✖[/bold red] {res.serial:<12} [red]{res.error}[/red]")
+            continue
+        procs, frida_files = res.value
+        if procs:
+            targets[res.serial] = (server_binary(procs[0]), procs[0].pid)
+        elif not frida_files:
+            console.print(f"  [bold red]✖[/bold red] {res.serial:<12} [red]no frida/florida server in /data/local/tmp[/red]")
+        else:
+            fsName = _choose_server(frida_files, console, res.serial)
+            if fsName:
+                pending[res.serial] = fsName
+    if pending:
+        with console.status(f"  [cyan]Starting server on {len(pending)} devices...[/cyan]", spinner="bouncingBar"):
+            launches = map_devices(lambda s: (launch_frida_server(s, pending[s]), _current_server(s, pending[s])), list(pending))
+        for res in launches:
+            current = res.value[1] if res.error is None else None
+            if current is None:
+                console.print(f"  [bold red]✖[/bold red] {res.serial:<12} [red]{res.error or 'server start failed'}[/red]")
+            else:
+                targets[res.serial] = (pending[res.serial], current.pid)
+    return targets
+
+
+def watch_all(devices, log_path=None):
+    """Watch frida-server on every device until Ctrl-C, then print restart counts and latencies; returns the WatchStats"""
+    from rich.console import Console
+    console = Console()
+    targets = _select_targets(devices, console)
+    if not targets:
+        raise WatchdogError("No frida-server to watch")
+    log = open(log_path, "a") if log_path else None
+    lock = threading.Lock()
+
+    def on_event(kind, info):
+        stamp = time.strftime("%H:%M:%S")
+        s = info["serial"]
+        if kind == "restarted":
+            line = f"  [bold green]✔[/bold green] {s:<12} [cyan]restarted {info['binary']} (PID {info['new_pid']})[/cyan] [dim]in {info['seconds']:.2f}s, restart #{info['restarts']}[/dim]"
+        elif kind == "failed":
+            line = f"  [bold red]✖[/bold red] {s:<12} [red]restart of {info['binary']} failed[/red] [dim]({info['failures']} failed)[/dim]"
+        elif kind == "exited":
+            wait = f", retrying in {info['backoff']}s" if info["backoff"] else ""
+            line = f"  [bold yellow]![/bold yellow] {s:<12} [yellow]server PID {info['pid']} exited{wait}[/yellow]"
+        elif kind == "adopted":
+            line = f"  [dim][i] {s:<12} now watching PID {info['pid']} (started outside the watchdog)[/dim]"
+        else:
+            line = f"  [dim][i] {s:<12} device {kind}[/dim]"
+        with lock:
+            console.print(f"[dim]{stamp}[/dim]{line}")
+            if log is not None:
+                log.write(json.dumps(dict(info, event=kind, time=time.time())) + "\n")
+                log.flush()
+
+    stop = threading.Event()
+    stats = {s: WatchStats(s, binary) for s, (binary, _) in targets.items()}
+    threads = [threading.Thread(target=watch_device, args=(s, binary, pid, stop, on_event, stats[s]), daemon=True)
+               for s, (binary, pid) in targets.items()]
+    for s, (binary, pid) in targets.items():
+        console.print(f"  [bold green]✔[/bold green] {s:<12} [cyan]watching {binary} (PID {pid})[/cyan]")
+    console.print("  [dim]Press Ctrl-C to stop.[/dim]")
+    for t in threads:
+        t.start()
+    try:
+        while any(t.is_alive() for t in threads):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        if log is not None:
+            log.close()
+
+    for st in stats.values():
+        if st.latencies:
+            timing = f", restart latency avg {sum(st.latencies) / len(st.latencies):.2f}s / max {max(st.latencies):.2f}s"
+        else:
+            timing = ""
+        console.print(f"  [bold cyan]•[/bold cyan] {st.serial:<12} [cyan]{st.restarts} restarts, {st.failures} failed{timing}[/cyan]")
+    return list(stats.values())
@@ -6,6 +6,7 @@ import os
 import subprocess
 import sys
 from .utils import print_colored, print_error, print_success, print_warning, RED, GREEN, YELLOW, RESET, check_dependencies
+from . import profiler
 
 def check_lib_security():
     """
@@ -14,7 +15,7 @@ def check_lib_security():
     check_dependencies(['find', 'greadelf', 'strings'])
     # Find all .so files in current directory and subdirectories
     try:
-        result = subprocess.run(['find', '.', '-name', '*.so'], capture_output=True, text=True, check=True)
+        result = profiler.run(['find', '.', '-name', '*.so'], capture_output=True, text=True, check=True)
         so_files = [line.strip() for line in result.stdout.splitlines() if line.strip()]
     except subprocess.CalledProcessError:
         print_error("Error finding .so files")
@@ -47,7 +48,7 @@ def check_lib_security():
 def check_pie_pic(sofile):
     """Check if PIE/PIC is enabled"""
     try:
-        result = subprocess.run(['greadelf', '-h', sofile], capture_output=True, text=True, check=True)
+        result = profiler.run(['greadelf', '-h', sofile], capture_output=True, text=True, check=True)
         for line in result.stdout.splitlines():
             if 'Type:' in line:
                 type_value = line.split()[1]
@@ -66,7 +67,7 @@ def check_pie_pic(sofile):
 def check_stack_canary(sofile):
     """Check if Stack Canary is enabled"""
     try:
-        result = subprocess.run(['strings', sofile], capture_output=True, text=True, check=True)
+        result = profiler.run(['strings', sofile], capture_output=True, text=True, check=True)
         if '__stack_chk_fail' in result.stdout:
             return f"[{GREEN}PASS{RESET}] - MASTG-TEST-0223: Stack Canary detected"
         else:
@@ -79,7 +80,7 @@ def check_stack_canary(sofile):
 def check_debug_symbols(sofile):
     """Check if debug symbols are present"""
     try:
-        result = subprocess.run(['greadelf', '-S', sofile], capture_output=True, text=True, check=True)
+        result = profiler.run(['greadelf', '-S', sofile], capture_output=True, text=True, check=True)
         if '.debug' in result.stdout:
             return f"{RED}[FAIL] - MASTG-TEST-0288: Debugging symbols present{RESET}"
         else:
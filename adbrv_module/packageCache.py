@@ -0,0 +1,291 @@
+"""
+On-disk index of installed packages, refreshed incrementally
+
+Per serial the index holds every installed package with its label, versionCode,
+uid, lastUpdateTime and APK paths. A refresh is one
+`pm list packages -f -U --show-versioncode` (base APK path, versionCode and
+uid of every package); a package whose base path or versionCode did not
+change keeps its cached record. Only new or updated packages are re-resolved
+(resolve_details()): labels are read from the APK on the device by apkInfo,
+paths and lastUpdateTime come from a batched shell loop.
+
+Labels are also kept in a table keyed by (package, versionCode) that outlives
+the per-device index, so a package seen before (on any device, or pulled
+locally) is named without touching the device, and frida-ps is not needed.
+
+Readers that can show stale data (Workspace completion) call cached() first
+and refresh() in the background.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+
+LIST_CMD = ["pm", "list", "packages", "-f", "-U", "--show-versioncode"]
+# Android < 9 has no -U/--show-versioncode; the base path still changes on update
+LEGACY_LIST_CMD = ["pm", "list", "packages", "-f"]
+
+LIST_TIMEOUT = 5
+DETAILS_CHUNK = 40
+DETAILS_TIMEOUT = 30
+_MARK = "@@"
+
+_memory = {}
+_labels = None  # "package@versionCode" -> label ("" when the APK has none)
+_lock = threading.Lock()
+# Serializes read-diff-write of an index (refresh and resolve_details may overlap)
+_update_lock = threading.RLock()
+
+
+def _path(serial):
+    from .utils import get_cache_dir
+    safe = re.sub(r"[^A-Za-z0-9._-]", "_", serial or "default")
+    return os.path.join(get_cache_dir("packages"), f"{safe}.json")
+
+
+def parse_list(text):
+    """Parse `pm list packages [-f] [-U] [--show-versioncode]` into {id: record}"""
+    records = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line.startswith("package:"):
+            continue
+        first, *fields = line[len("package:"):].split(" ")
+        base, _, pkg = first.rpartition("=")
+        record = {"id": pkg, "base": base or None, "versionCode": None, "uid": None}
+        for field in fields:
+            key, _, value = field.partition(":")
+            if key in ("versionCode", "uid") and value.isdigit():
+                record[key] = int(value)
+        record["stamp"] = f"{record['base']}@{record['versionCode']}"
+        records[pkg] = record
+    return records
+
+
+def _load(serial):
+    with _lock:
+        if serial in _memory:
+            return _memory[serial]
+    try:
+        with open(_path(serial)) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    with _lock:
+        _memory[serial] = entry
+    return entry
+
+
+def _save(serial, entry):
+    entry["saved"] = time.time()
+    with _lock:
+        _memory[serial] = entry
+    path = _path(serial)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _ordered(records):
+    """Records as the completion list: labelled packages first, then by id"""
+    return sorted(records.values(), key=lambda r: (not r.get("name"), r["id"]))
+
+
+def cached(serial):
+    """The last known package list of serial (no adb call), or None"""
+    entry = _load(serial)
+    if entry is None:
+        return None
+    return _ordered(entry["packages"])
+
+
+def version_code(serial, pkg):
+    """Indexed versionCode of pkg on serial (no adb call), or None"""
+    entry = _load(serial)
+    record = entry["packages"].get(pkg) if entry else None
+    return record.get("versionCode") if record else None
+
+
+def _list(serial, legacy):
+    from .devices import adb_shell
+    if not legacy:
+        out = adb_shell(LIST_CMD, serial, timeout=LIST_TIMEOUT)
+        if out and out.startswith("package:"):
+            return out, False
+    out = adb_shell(LEGACY_LIST_CMD, serial, timeout=LIST_TIMEOUT)
+    return out, True
+
+
+def _label_path():
+    from .utils import get_cache_dir
+    return os.path.join(get_cache_dir(), "labels.json")
+
+
+def _label_key(pkg, version_code):
+    return f"{pkg}@{version_code}"
+
+
+def _label_table():
+    # Caller holds _lock
+    global _labels
+    if _labels is None:
+        try:
+            with open(_label_path()) as f:
+                _labels = json.load(f)
+        except (OSError, ValueError):
+            _labels = {}
+    return _labels
+
+
+def known_label(pkg, version_code):
+    """Label of pkg at version_code from the label table, or None when not known"""
+    if version_code is None:
+        return None
+    with _lock:
+        return _label_table().get(_label_key(pkg, version_code))
+
+
+def remember_labels(infos):
+    """Add ApkInfo results to the label table"""
+    infos = [i for i in infos if i.version_code is not None]
+    if not infos:
+        return
+    with _lock:
+        table = _label_table()
+        for info in infos:
+            table[_label_key(info.package, info.version_code)] = info.label or ""
+        path = _label_path()
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(table, f)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+
+def learn_apk(path):
+    """Record the label of a local APK (e.g. one just pulled); returns its ApkInfo or None"""
+    from .apkInfo import read_info, ApkInfoError
+    try:
+        info = read_info(path)
+    except (ApkInfoError, OSError):
+        return None
+    remember_labels([info])
+    return info
+
+
+def refresh(serial):
+    """Diff the device's package list against the index and save it; returns the package list ([] on failure)"""
+    entry = _load(serial) or {"serial": serial, "legacy": False, "packages": {}}
+    out, legacy = _list(serial, entry.get("legacy", False))
+    if not out:
+        return []
+    listed = parse_list(out)
+    with _update_lock:
+        return _merge(serial, _load(serial) or entry, listed, legacy)
+
+
+def _merge(serial, entry, listed, legacy):
+    old = entry["packages"]
+    records, changed = {}, []
+    for pkg, fresh in listed.items():
+        record = old.get(pkg)
+        if record is None or record.get("stamp") != fresh["stamp"]:
+            # New or updated: label, paths and lastUpdateTime are resolved again
+            label = known_label(pkg, fresh["versionCode"])
+            record = dict(fresh, name=label or "", labelled=label is not None, paths=None, lastUpdateTime=None)
+            changed.append(pkg)
+        records[pkg] = record
+    if changed or len(records) != len(old) or legacy != entry.get("legacy"):
+        _save(serial, {"serial": serial, "legacy": legacy, "packages": records})
+    return _ordered(records)
+
+
+def details_script(packages):
+    return "; ".join(
+        f"echo '{_MARK}{pkg}'; pm path {pkg}; dumpsys package {pkg} | grep -m1 lastUpdateTime="
+        for pkg in packages
+    )
+
+
+def parse_details(text):
+    """{id: (paths, lastUpdateTime)} from details_script output"""
+    details = {}
+    pkg = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith(_MARK):
+            pkg = line[len(_MARK):]
+            details[pkg] = ([], None)
+        elif pkg is None:
+            continue
+        elif line.startswith("package:"):
+            details[pkg][0].append(line[len("package:"):])
+        elif line.startswith("lastUpdateTime="):
+            details[pkg] = (details[pkg][0], line.split("=", 1)[1])
+    return details
+
+
+def _read_labels(serial, pending):
+    """ApkInfo of each pending base APK path that could be read, {id: info}"""
+    from .apkInfo import read_remote_info, ApkInfoError
+    infos = {}
+    for pkg, base in pending:
+        try:
+            infos[pkg] = read_remote_info(serial, base)
+        except ApkInfoError:
+            pass
+    return infos
+
+
+def resolve_details(serial):
+    """Fill in labels, APK paths and lastUpdateTime of new or updated packages; returns how many records changed"""
+    from .devices import long_shell
+    entry = _load(serial)
+    if entry is None:
+        return 0
+    resolved = 0
+    # Labels first: they are what completion shows
+    unlabelled = [(pkg, r["base"]) for pkg, r in entry["packages"].items() if not r.get("labelled") and r.get("base")]
+    if unlabelled:
+        infos = _read_labels(serial, unlabelled)
+        remember_labels(infos.values())
+        with _update_lock:
+            entry = _load(serial)
+            for pkg, _ in unlabelled:
+                record = entry["packages"].get(pkg)
+                if record is None or record.get("labelled"):
+                    continue
+                info = infos.get(pkg)
+                # Unreadable APKs are not retried until the package changes
+                record["labelled"] = True
+                if info is not None:
+                    record["name"] = info.label or ""
+                    if record.get("versionCode") is None:
+                        record["versionCode"] = info.version_code
+                    resolved += 1
+            _save(serial, entry)
+    pending = [pkg for pkg, r in entry["packages"].items() if r.get("paths") is None]
+    for i in range(0, len(pending), DETAILS_CHUNK):
+        out = long_shell(details_script(pending[i:i + DETAILS_CHUNK]), serial, timeout=DETAILS_TIMEOUT)
+        if not out:
+            break
+        with _update_lock:
+            # A refresh may have replaced the index meanwhile: update what is current
+            entry = _load(serial)
+            for pkg, (paths, updated) in parse_details(out).items():
+                record = entry["packages"].get(pkg)
+                if record is not None and paths and record.get("paths") is None:
+                    record["paths"] = paths
+                    record["lastUpdateTime"] = updated
+                    resolved += 1
+            _save(serial, entry)
+    return resolved
+
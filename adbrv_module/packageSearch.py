@@ -0,0 +1,112 @@
+"""
+Indexed fuzzy search over installed packages, for `pull` completion
+
+PackageIndex is built once per package list: every package id and app name
+is normalized (lower case, accents stripped) and indexed by the characters
+it contains. A query is answered from the postings instead of a
+scan, ranked (exact, prefix, segment/word prefix, substring, then fuzzy
+subsequence), and memoized; a query that extends a memoized one only filters
+that result, so typing a package name narrows the set keystroke by keystroke.
+"""
+
+import unicodedata
+
+MEMO_SIZE = 256
+
+# Rank tiers, best first
+EXACT, PREFIX, NAME_PREFIX, SEGMENT_PREFIX, SUBSTRING, NAME_SUBSTRING, FUZZY = range(7)
+
+
+def normalize(text):
+    """Lower case without accents ("Đồng Hồ" -> "dong ho")"""
+    text = text.lower().replace("đ", "d")
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+
+
+def _subsequence_span(query, text):
+    """Length of the shortest-start greedy span of text containing query in order, or None"""
+    start = pos = text.find(query[0])
+    if pos < 0:
+        return None
+    for ch in query[1:]:
+        pos = text.find(ch, pos + 1)
+        if pos < 0:
+            return None
+    return pos - start + 1
+
+
+class PackageIndex:
+    """Search index over a package list ({"id", "name"} dicts or plain id strings)"""
+
+    def __init__(self, packages):
+        self.packages = list(packages)
+        self.keys = []  # (normalized id, normalized name, ".segment.segment", " word word")
+        self.chars = {}  # character -> indices of packages whose id or name contains it
+        for i, pkg in enumerate(self.packages):
+            if isinstance(pkg, dict):
+                pkg_id, name = pkg.get("id", ""), pkg.get("name") or ""
+            else:
+                pkg_id, name = pkg, ""
+            key_id, key_name = normalize(pkg_id), normalize(name)
+            self.keys.append((key_id, key_name, "." + key_id.replace("_", "."), " " + " ".join(key_name.split())))
+            for ch in set(key_id + key_name):
+                self.chars.setdefault(ch, set()).add(i)
+        self.has_names = any(k[1] for k in self.keys)
+        self._memo = {}
+
+    def __len__(self):
+        return len(self.packages)
+
+    def _rank(self, query, i):
+        """(tier, tie-break) of package i for query, or None if it does not match"""
+        key_id, key_name, segments, words = self.keys[i]
+        if query == key_id or query == key_name:
+            return (EXACT, 0)
+        if key_id.startswith(query):
+            return (PREFIX, len(key_id))
+        if key_name.startswith(query):
+            return (NAME_PREFIX, len(key_name))
+        pos = key_id.find(query)
+        if pos >= 0:
+            if "." + query in segments:
+                return (SEGMENT_PREFIX, len(key_id))
+            return (SUBSTRING, pos)
+        pos = key_name.find(query)
+        if pos >= 0:
+            if " " + query in words:
+                return (SEGMENT_PREFIX, len(key_id))
+            return (NAME_SUBSTRING, pos)
+        spans = [s for s in (_subsequence_span(query, key_id), _subsequence_span(query, key_name)) if s]
+        if spans:
+            return (FUZZY, min(spans))
+        return None
+
+    def _candidates(self, query):
+        """Indices that can match query: a memoized shorter query's matches, else the postings"""
+        for end in range(len(query) - 1, 0, -1):
+            hit = self._memo.get(query[:end])
+            if hit is not None:
+                return hit
+        postings = sorted((self.chars.get(ch, set()) for ch in set(query)), key=len)
+        return set.intersection(*postings)
+
+    def search(self, query, limit=None):
+        """Packages matching query (normalized, substring or fuzzy), best first"""
+        query = normalize(query.strip())
+        if not query:
+            return self.packages[:limit] if limit else list(self.packages)
+        matches = self._memo.get(query)
+        if matches is None:
+            ranked = []
+            for i in self._candidates(query):
+                rank = self._rank(query, i)
+                if rank is not None:
+                    ranked.append((rank, i))
+            ranked.sort()
+            matches = [i for _, i in ranked]
+            if len(self._memo) >= MEMO_SIZE:
+                self._memo.clear()
+            self._memo[query] = matches
+        if limit:
+            matches = matches[:limit]
+        return [self.packages[i] for i in matches]
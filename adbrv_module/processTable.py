@@ -0,0 +1,112 @@
+"""
+Per-device process table snapshots
+
+One shell round trip lists every process with its PID, user, name and command
+line (`ps -A -o PID,USER,NAME,CMDLINE`; plain `ps` on old toolbox builds). The
+parsed table is kept per device for SNAPSHOT_TTL seconds, so frida status,
+start, kill and the Workspace's frida check share one scan instead of each
+running its own `ps | grep`. Commands that start or kill processes call
+invalidate(); scans made for other reasons (the status probe, readiness polls)
+hand their output to store().
+"""
+
+import threading
+import time
+from typing import NamedTuple
+
+SNAPSHOT_TTL = 2.0
+PS_TIMEOUT = 10
+# toybox ps (Android 7+) takes -A -o; older toolbox ps ignores the options, so its header decides.
+# toybox right-aligns the PID column ("  PID USER ..."), so leading blanks are stripped before the check.
+PS_SCRIPT = (
+    "out=$(ps -A -o PID,USER,NAME,CMDLINE 2>/dev/null); "
+    "case \"${out#\"${out%%[! ]*}\"}\" in PID*) echo \"$out\" ;; *) ps ;; esac"
+)
+
+_memory = {}  # serial -> (monotonic time, [Process])
+_lock = threading.Lock()
+
+
+class Process(NamedTuple):
+    pid: int
+    user: str
+    name: str
+    cmdline: str
+
+
+def parse(text):
+    """Processes from PS_SCRIPT output, either `-o PID,USER,NAME,CMDLINE` or the classic ps columns"""
+    lines = [line for line in (text or "").splitlines() if line.strip()]
+    if not lines:
+        return []
+    header = lines[0].split()
+    procs = []
+    if header[:3] == ["PID", "USER", "NAME"]:
+        for line in lines[1:]:
+            fields = line.split(None, 3)
+            if len(fields) >= 3 and fields[0].isdigit():
+                procs.append(Process(int(fields[0]), fields[1], fields[2], fields[3] if len(fields) > 3 else fields[2]))
+        return procs
+    # USER PID PPID ... NAME: the PID column is found from the header, the name is the last field
+    pid_col = header.index("PID") if "PID" in header else 1
+    for line in lines[1:]:
+        fields = line.split()
+        if len(fields) > pid_col and fields[pid_col].isdigit():
+            procs.append(Process(int(fields[pid_col]), fields[0], fields[-1], fields[-1]))
+    return procs
+
+
+def store(serial, procs):
+    with _lock:
+        _memory[serial] = (time.monotonic(), procs)
+
+
+def invalidate(serial=None):
+    with _lock:
+        if serial is None:
+            _memory.clear()
+        else:
+            _memory.pop(serial, None)
+
+
+def _cached(serial, max_age):
+    with _lock:
+        entry = _memory.get(serial)
+    if entry is not None and time.monotonic() - entry[0] <= max_age:
+        return entry[1]
+    return None
+
+
+def snapshot(serial, max_age=SNAPSHOT_TTL):
+    """The process table of serial, scanned at most max_age seconds ago ([] when ps fails)"""
+    procs = _cached(serial, max_age)
+    if procs is not None:
+        return procs
+    from .devices import adb_shell
+    from .scheduler import coalesce
+
+    def scan():
+        procs = parse(adb_shell([PS_SCRIPT], serial, check=False, timeout=PS_TIMEOUT))
+        store(serial, procs)
+        return procs
+    return coalesce(("ps", serial), scan)
+
+
+async def asnapshot(serial, max_age=SNAPSHOT_TTL):
+    """asyncio counterpart of snapshot(), sharing its cache"""
+    procs = _cached(serial, max_age)
+    if procs is not None:
+        return procs
+    from .asyncAdb import adb_shell
+    from .scheduler import acoalesce
+
+    async def scan():
+        procs = parse(await adb_shell([PS_SCRIPT], serial, check=False, timeout=PS_TIMEOUT))
+        store(serial, procs)
+        return procs
+    return await acoalesce(("ps", serial), scan)
+
+
+def matching(procs, needle):
+    """Processes whose name or command line contains needle"""
+    return [p for p in procs if needle in p.name or needle in p.cmdline]
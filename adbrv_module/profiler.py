@@ -0,0 +1,214 @@
+"""
+Per-call latency tracing for external commands
+
+Every adb round trip (subprocess, native socket call or persistent-session
+command) and every external tool run (nm, greadelf, strings, unzip, java,
+frida-ps) is recorded with its argv, device, wall time, exit code and bytes
+in/out. Records are kept in a bounded in-memory ring; `adbrv --profile`
+prints a summary when the command finishes, `--profile-trace FILE` dumps a
+Chrome trace-event JSON (chrome://tracing, Perfetto), and the Workspace
+`stats` command shows the same summary at any time.
+
+Each record also carries a source label (the CLI command or Workspace refresh
+that issued the call), set with `with source("...")`.
+"""
+
+import collections
+import contextvars
+import json
+import os
+import subprocess
+import threading
+import time
+from typing import NamedTuple, Optional
+
+MAX_RECORDS = 10000
+
+_EPOCH = time.perf_counter()
+_records = collections.deque(maxlen=MAX_RECORDS)
+_source = contextvars.ContextVar("adbrv_trace_source", default="")
+
+
+class CallRecord(NamedTuple):
+    tool: str               # "adb", "adb-native", "adb-session", "nm", ...
+    argv: str
+    device: Optional[str]
+    start: float            # seconds since the profiler was loaded
+    duration: float
+    returncode: Optional[int]  # -1 when the call failed without an exit status
+    bytes_in: int           # sent to the tool / adb server
+    bytes_out: int          # received from it
+    source: str
+    thread: int
+
+    @property
+    def op(self):
+        """Short grouping key: tool plus the leading words of argv"""
+        words = [w for w in self.argv.split() if not w.startswith("-")][:2]
+        return " ".join([self.tool] + words)[:60]
+
+
+class Span:
+    """One in-progress call; fill in argv/device/returncode/bytes, then finish()"""
+
+    def __init__(self, tool, argv="", device=None):
+        self.tool = tool
+        self.argv = argv
+        self.device = device
+        self.returncode = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.source = _source.get()
+        self.start = time.perf_counter()
+        self.done = False
+
+    def finish(self, failed=False):
+        if self.done:
+            return
+        self.done = True
+        returncode = self.returncode
+        if failed and returncode is None:
+            returncode = -1
+        _records.append(CallRecord(
+            self.tool, self.argv, self.device, self.start - _EPOCH, time.perf_counter() - self.start,
+            returncode, self.bytes_in, self.bytes_out, self.source, threading.get_ident(),
+        ))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish(failed=exc_type is not None)
+
+
+def span(tool, argv="", device=None):
+    return Span(tool, argv, device)
+
+
+def current_source():
+    return _source.get()
+
+
+def set_source(name):
+    _source.set(name)
+
+
+class source:
+    """`with source("status"):` labels the calls made inside it"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.token = _source.set(self.name)
+
+    def __exit__(self, *exc):
+        _source.reset(self.token)
+
+
+def _size(data):
+    if data is None:
+        return 0
+    return len(data.encode("utf-8", "replace") if isinstance(data, str) else data)
+
+
+def run(args, device=None, **kwargs):
+    """subprocess.run() that records the call; device is only used for labelling"""
+    args = list(args)
+    shown = [str(a) for a in args[1:]]
+    if device and shown[:2] == ["-s", device]:
+        shown = shown[2:]  # recorded as the device instead
+    from .replay import run_process
+    tool = os.path.basename(str(args[0]))
+    with span(tool, " ".join(shown), device) as sp:
+        sp.bytes_in = _size(kwargs.get("input"))
+        try:
+            result = run_process(tool, shown, device, lambda: subprocess.run(args, **kwargs))
+        except subprocess.CalledProcessError as e:
+            sp.returncode = e.returncode
+            sp.bytes_out = _size(e.stdout) + _size(e.stderr)
+            raise
+        sp.returncode = result.returncode
+        sp.bytes_out = _size(result.stdout) + _size(result.stderr)
+        return result
+
+
+def records():
+    return list(_records)
+
+
+def clear():
+    _records.clear()
+
+
+def summarize(recs, key):
+    """Aggregate records by key(record): rows of (key, count, total, mean, max, failures, bytes_in, bytes_out), slowest total first"""
+    groups = collections.OrderedDict()
+    for r in recs:
+        groups.setdefault(key(r), []).append(r)
+    rows = []
+    for k, items in groups.items():
+        total = sum(r.duration for r in items)
+        rows.append((
+            k, len(items), total, total / len(items), max(r.duration for r in items),
+            sum(1 for r in items if r.returncode not in (0, None)),
+            sum(r.bytes_in for r in items), sum(r.bytes_out for r in items),
+        ))
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows
+
+
+def _fmt_bytes(n):
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024.0
+    return f"{n:.1f} GB"
+
+
+def print_report(console=None, limit=15):
+    """Print call and source summaries of the recorded calls"""
+    from rich.console import Console
+    from rich.table import Table
+    from rich import box
+    console = console or Console()
+    recs = records()
+    if not recs:
+        console.print("  [dim]No external calls recorded yet.[/dim]")
+        return
+    wall = sum(r.duration for r in recs)
+    console.print(f"  [bold]{len(recs)}[/bold] external calls, [bold]{wall:.2f}s[/bold] total call time")
+    for title, key in (("Call", lambda r: r.op), ("Source", lambda r: r.source or "(unlabelled)"), ("Device", lambda r: r.device or "-")):
+        table = Table(box=box.SIMPLE_HEAD, pad_edge=False, padding=(0, 2))
+        table.add_column(title, style="cyan", no_wrap=True)
+        for column in ("Calls", "Total", "Mean", "Max", "Fail", "In", "Out"):
+            table.add_column(column, justify="right")
+        for k, count, total, mean, worst, failed, b_in, b_out in summarize(recs, key)[:limit]:
+            table.add_row(
+                k, str(count), f"{total * 1000:.0f} ms", f"{mean * 1000:.1f} ms", f"{worst * 1000:.0f} ms",
+                f"[red]{failed}[/red]" if failed else "0", _fmt_bytes(b_in), _fmt_bytes(b_out),
+            )
+        console.print(table)
+
+
+def write_chrome_trace(path):
+    """Write the recorded calls as Chrome trace-event JSON (complete "X" events)"""
+    pid = os.getpid()
+    events = []
+    for r in records():
+        events.append({
+            "name": r.op,
+            "cat": r.tool,
+            "ph": "X",
+            "ts": round(r.start * 1e6),
+            "dur": round(r.duration * 1e6),
+            "pid": pid,
+            "tid": r.thread,
+            "args": {
+                "argv": r.argv, "device": r.device, "returncode": r.returncode,
+                "bytes_in": r.bytes_in, "bytes_out": r.bytes_out, "source": r.source,
+            },
+        })
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return len(events)
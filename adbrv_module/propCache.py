@@ -0,0 +1,133 @@
+"""
+On-disk cache of static device properties
+
+Holds the full `getprop` snapshot (plus the su path) per serial, keyed by the
+device boot id. Static properties never change within a boot, so once cached
+a probe only reads the boot id and skips getprop entirely. A new boot id, or
+an explicit invalidate() when adb reports a state change, refreshes it.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+
+SNAPSHOT_DELIM = "---PROPS---"
+
+# boot_id is per-boot random; btime (boot epoch) is the fallback on kernels without it
+BOOT_ID_CMD = "cat /proc/sys/kernel/random/boot_id 2>/dev/null || grep btime /proc/stat"
+
+_GETPROP_LINE = re.compile(r"^\[([^\]]+)\]: \[(.*)$")
+
+_memory = {}
+_lock = threading.Lock()
+
+
+def _path(serial):
+    from .utils import get_cache_dir
+    safe = re.sub(r"[^A-Za-z0-9._-]", "_", serial or "default")
+    return os.path.join(get_cache_dir("props"), f"{safe}.json")
+
+
+def parse_getprop(text):
+    """Parse `getprop` output ([key]: [value] lines, values may span lines) into a dict"""
+    props = {}
+    key = None
+    for line in text.splitlines():
+        if key is None:
+            m = _GETPROP_LINE.match(line)
+            if not m:
+                continue
+            key, value = m.groups()
+            lines = [value]
+        else:
+            lines.append(line)
+        if lines[-1].endswith("]"):
+            props[key] = "\n".join(lines)[:-1]
+            key = None
+    return props
+
+
+def load(serial):
+    with _lock:
+        if serial in _memory:
+            return _memory[serial]
+    try:
+        with open(_path(serial)) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    with _lock:
+        _memory[serial] = entry
+    return entry
+
+
+def save(serial, boot_id, props, su):
+    return save_entry(serial, {"serial": serial, "boot_id": boot_id, "props": props, "su": su, "saved": time.time()})
+
+
+def save_entry(serial, entry):
+    with _lock:
+        _memory[serial] = entry
+    path = _path(serial)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return entry
+
+
+def update(serial, **fields):
+    """Merge extra per-boot facts (e.g. capabilities) into the cached entry for serial"""
+    entry = load(serial)
+    if not entry:
+        return None
+    entry = dict(entry, **fields)
+    return save_entry(serial, entry)
+
+
+def invalidate(serial):
+    """Forget the snapshot for serial (reboot, reconnect, or adb state change), capabilities included"""
+    from .capabilities import forget
+    forget(serial)
+    with _lock:
+        _memory.pop(serial, None)
+    try:
+        os.unlink(_path(serial))
+    except OSError:
+        pass
+
+
+def snapshot_script(cached):
+    """
+    Shell snippet printing: boot id, DELIM, getprop, DELIM, su path.
+    getprop and `which su` are skipped when the boot id still matches the cached one.
+    """
+    boot_id = cached["boot_id"] if cached else ""
+    return (
+        f"b=$({BOOT_ID_CMD}); echo \"$b\"; echo '{SNAPSHOT_DELIM}'; "
+        f"if [ \"$b\" != '{boot_id}' ]; then getprop; echo '{SNAPSHOT_DELIM}'; which su; "
+        f"else echo '{SNAPSHOT_DELIM}'; fi"
+    )
+
+
+def resolve(serial, cached, output):
+    """Turn snapshot_script output into (props, su_path), refreshing the cache on a new boot"""
+    parts = output.split(SNAPSHOT_DELIM)
+    parts += [""] * (3 - len(parts))
+    boot_id = parts[0].strip()
+    if cached and boot_id and boot_id == cached["boot_id"]:
+        return cached["props"], cached["su"]
+    props = parse_getprop(parts[1].strip())
+    su = parts[2].strip()
+    if boot_id and props:
+        if cached:
+            # Rebooted: the capability profile is re-detected along with the properties
+            from .capabilities import forget
+            forget(serial)
+        save(serial, boot_id, props, su)
+    return props, su
@@ -1,47 +1,97 @@
-import subprocess, sys
+import sys
+from .devices import adb_shell, add_reverse, remove_all_reverse, AdbError
 
 class ProxyError(Exception):
     pass
 
+def _put_http_proxy(value, serial=None):
+    """
+    settings put global http_proxy via the route this device is known to accept.
+    Rooted devices try su first (strict ROMs like Xiaomi deny the shell user), others go straight to plain.
+    """
+    from .capabilities import get_capabilities, root_command, learn, recheck
+    caps = get_capabilities(serial)
+    cmd = f"settings put global http_proxy {value}"
+    plain = ["settings", "put", "global", "http_proxy", value]
+    root_cmd = root_command(serial, cmd)
+    if root_cmd is None:
+        routes = ["plain"]
+    elif caps["settings_plain"]:
+        routes = ["plain", "root"]
+    else:
+        routes = ["root", "plain"]
+    for route in routes:
+        if route == "root":
+            if adb_shell([root_cmd], serial) is not None:
+                return True
+            # A cached profile may predate adb root/unroot
+            retry = recheck(serial, cmd)
+            if retry is not None and adb_shell([retry], serial) is not None:
+                return True
+            continue
+        ok = adb_shell(plain, serial) is not None
+        if caps["settings_plain"] != ok:
+            learn(serial, settings_plain=ok)
+        if ok:
+            return True
+    return False
+
 def set_proxy(local_port, device_port, serial=None):
     from rich.console import Console
     console = Console()
-    adb_base = ["adb"]
-    if serial:
-        adb_base += ["-s", serial]
     try:
         with console.status(f"  [dim]Reversing port...[/dim]", spinner="dots"):
-            subprocess.run(adb_base + ["reverse", f"tcp:{local_port}", f"tcp:{device_port}"], check=True, capture_output=True)
+            add_reverse(serial, f"tcp:{local_port}", f"tcp:{device_port}")
         console.print(f"  [bold green]✔[/bold green] Reverse    [cyan]tcp:{local_port}[/cyan] → [cyan]tcp:{device_port}[/cyan]")
 
         with console.status(f"  [dim]Setting proxy...[/dim]", spinner="dots"):
-            cmd = f"settings put global http_proxy localhost:{local_port}"
-            su_result = subprocess.run(adb_base + ["shell", "su", "-c", cmd], capture_output=True)
-            if su_result.returncode != 0:
-                subprocess.run(adb_base + ["shell", "settings", "put", "global", "http_proxy", f"localhost:{local_port}"], check=True)
+            if not _put_http_proxy(f"localhost:{local_port}", serial):
+                raise ProxyError("Error setting proxy or reverse: settings put failed")
         console.print(f"  [bold green]✔[/bold green] Proxy      [cyan]localhost:{local_port}[/cyan]")
 
-    except subprocess.CalledProcessError as e:
+    except AdbError as e:
         raise ProxyError(f"Error setting proxy or reverse: {e}")
 
 
+def clear_proxy_and_reverse(serial=None):
+    """Non-interactive unset used when fanning out over several devices"""
+    if not _put_http_proxy(":0", serial):
+        raise ProxyError("Error unsetting proxy or reverse: settings put failed")
+    try:
+        remove_all_reverse(serial)
+    except AdbError as e:
+        raise ProxyError(f"Error unsetting proxy or reverse: {e}")
+
+
 def unset_proxy_and_reverse(serial=None):
     from rich.console import Console
     console = Console()
-    adb_base = ["adb"]
-    if serial:
-        adb_base += ["-s", serial]
     try:
         with console.status("  [dim]Removing proxy...[/dim]", spinner="dots"):
-            cmd = "settings put global http_proxy :0"
-            su_result = subprocess.run(adb_base + ["shell", "su", "-c", cmd], capture_output=True)
-            if su_result.returncode != 0:
-                subprocess.run(adb_base + ["shell", "settings", "put", "global", "http_proxy", ":0"], check=True)
+            if not _put_http_proxy(":0", serial):
+                raise ProxyError("Error unsetting proxy or reverse: settings put failed")
         console.print("  [bold green]✔[/bold green] Proxy      [cyan]cleared[/cyan]")
 
         with console.status("  [dim]Removing reverse ports...[/dim]", spinner="dots"):
-            subprocess.run(adb_base + ["reverse", "--remove-all"], check=True, capture_output=True)
+            remove_all_reverse(serial)
         console.print("  [bold green]✔[/bold green] Reverse    [cyan]all ports removed[/cyan]")
 
-    except subprocess.CalledProcessError as e:
-        raise ProxyError(f"Error unsetting proxy or reverse: {e}")
\ No newline at end of file
+    except AdbError as e:
+        raise ProxyError(f"Error unsetting proxy or reverse: {e}")
+
+
+def unset_all_devices(devices):
+    """Unset proxy and reverse on every device concurrently, reporting in device order"""
+    from rich.console import Console
+    from .devices import map_devices
+    console = Console()
+    with console.status(f"  [dim]Removing proxy & reverse ports on {len(devices)} devices...[/dim]", spinner="dots"):
+        results = map_devices(clear_proxy_and_reverse, devices)
+    failed = 0
+    for res in results:
+        if res.error is None:
+            console.print(f"  [bold green]✔[/bold green] {res.serial:<12} [cyan]proxy cleared, reverse ports removed[/cyan]")
+        else:
+            failed += 1
+            console.print(f"  [bold red]✖[/bold red] {res.serial:<12} [red]{res.error}[/red]")
+    return failed
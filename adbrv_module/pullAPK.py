@@ -1,63 +1,46 @@
 import os
 import shutil
 import subprocess
+import threading
+import time
+from typing import NamedTuple
 from rich.console import Console
 from rich import print as rprint
 from rich.panel import Panel
 from rich.table import Table
 from rich import box
-from .devices import select_device, get_connected_devices
+from .devices import select_device, get_connected_devices, run_adb, adb_shell, pull_file, pull_files_as_root, remote_sha256_async, expected_sha256, AdbError, PULL_CONCURRENCY
+from .packageCache import learn_apk, version_code
+from . import apkStore
 
 console = Console()
 
 def get_installed_packages(device=None):
-    cmd = ["adb"]
+    from .packageCache import refresh
+    from .scheduler import coalesce
     if device is None:
         devices = get_connected_devices()
         if devices:
             device = devices[0]
-            
-    if device:
-        cmd.extend(["-s", device])
-    cmd.extend(["shell", "pm", "list", "packages"])
-    try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
-        if result.returncode != 0:
-            return []
-            
-        packages = []
-        for line in result.stdout.splitlines():
-            line = line.strip()
-            if line.startswith("package:"):
-                pkg = line.split(":", 1)[1]
-                packages.append({"id": pkg, "name": ""})
-                
-        try:
-            frida_cmd = ["frida-ps", "-D", device, "-ia"] if device else ["frida-ps", "-Uia"]
-            frida_res = subprocess.run(frida_cmd, capture_output=True, text=True, timeout=8)
-            if frida_res.returncode == 0:
-                name_map = {}
-                for line in frida_res.stdout.splitlines():
-                    parts = line.split()
-                    if len(parts) >= 3:
-                        # Sometimes PID is `-`, so we just ensure there are at least 3 parts
-                        # (PID/Dash, Name, Identifier)
-                        identifier = parts[-1]
-                        name = " ".join(parts[1:-1])
-                        name_map[identifier] = name
-                
-                for pkg_obj in packages:
-                    if pkg_obj["id"] in name_map:
-                        pkg_obj["name"] = name_map[pkg_obj["id"]]
-        except Exception:
-            pass
-            
-        packages.sort(key=lambda x: not bool(x.get("name")))
-        return packages
-    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
-        return []
+    return coalesce(("packages", device), lambda: refresh(device))
+
+class TransferStats(NamedTuple):
+    files: int
+    bytes: int
+    seconds: float
+    reused_files: int = 0   # materialized from the local APK store, not transferred
+    reused_bytes: int = 0
+
+
+def _fmt_size(n):
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024.0
+    return f"{n:.2f} GB"
 
-def print_result_panel(package_name, final_dest, apk_type):
+
+def print_result_panel(package_name, final_dest, apk_type, stats=None):
     table = Table(box=None, show_header=False, pad_edge=True, padding=(0, 2))
     table.add_column("Key", style="bold cyan")
     table.add_column("Value")
@@ -65,6 +48,12 @@ def print_result_panel(package_name, final_dest, apk_type):
     table.add_row("📦 Package", package_name)
     table.add_row("📁 Saved @", final_dest)
     table.add_row("📄 Type", apk_type)
+    if stats is not None and stats.files:
+        table.add_row("📊 Size", f"{_fmt_size(stats.bytes)} in {stats.files} file{'s' if stats.files != 1 else ''}")
+        rate = stats.bytes / stats.seconds if stats.seconds > 0 else 0
+        table.add_row("⚡ Throughput", f"{_fmt_size(rate)}/s ({stats.seconds:.1f}s)")
+    if stats is not None and stats.reused_files:
+        table.add_row("♻️ Cached", f"{_fmt_size(stats.reused_bytes)} in {stats.reused_files} file{'s' if stats.reused_files != 1 else ''} (not transferred)")
     
     panel = Panel(
         table,
@@ -76,7 +65,61 @@ def print_result_panel(package_name, final_dest, apk_type):
     console.print(panel)
 
 
-def pull_apk(package_name: str, dest_path: str = None, device: str = None):
+def remote_sizes(device, paths):
+    """Sizes of device files in one round trip; None entries when unknown"""
+    out = adb_shell(["stat", "-c", "%s"] + list(paths), device, check=False, timeout=10)
+    sizes = (out or "").split()
+    if len(sizes) != len(paths) or not all(s.isdigit() for s in sizes):
+        return [None] * len(paths)
+    return [int(s) for s in sizes]
+
+
+def pull_files(device, targets, jobs=None, sizes=None, hashes=None):
+    """
+    Pull (remote, local) pairs, up to jobs at a time (ADBRV_PULL_CONCURRENCY by default),
+    with a live per-file and total progress view. Each file is checked against a SHA-256 the
+    device computes while the transfers run. Raises AdbError if any file fails;
+    files not started yet are then skipped. hashes is a remote_sha256_async() Future for the
+    targets, started here when not given.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from rich.progress import Progress, TextColumn, BarColumn, DownloadColumn, TransferSpeedColumn, TimeRemainingColumn
+    jobs = max(1, jobs or PULL_CONCURRENCY)
+    if sizes is None:
+        sizes = remote_sizes(device, [remote for remote, _ in targets])
+    if hashes is None:
+        hashes = remote_sha256_async(device, [remote for remote, _ in targets])
+    failed = threading.Event()
+    start = time.perf_counter()
+    columns = (TextColumn("  {task.description}"), BarColumn(), DownloadColumn(), TransferSpeedColumn(), TimeRemainingColumn())
+    with Progress(*columns, console=console, transient=True) as progress:
+        total = progress.add_task("[bold]Total[/bold]", total=None if None in sizes else sum(sizes))
+        tasks = [progress.add_task(os.path.basename(remote), total=size, visible=False) for (remote, _), size in zip(targets, sizes)]
+
+        def pull_one(index):
+            if failed.is_set():
+                return 0
+            remote, local = targets[index]
+            task = tasks[index]
+            progress.update(task, visible=True)
+
+            def advance(n):
+                progress.advance(task, n)
+                progress.advance(total, n)
+            try:
+                return pull_file(remote, local, device, advance, size=sizes[index], expected=hashes)
+            except AdbError:
+                failed.set()
+                raise
+            finally:
+                progress.update(task, visible=False)
+
+        with ThreadPoolExecutor(max_workers=min(jobs, len(targets))) as pool:
+            written = list(pool.map(pull_one, range(len(targets))))
+    return TransferStats(len(targets), sum(written), time.perf_counter() - start)
+
+
+def pull_apk(package_name: str, dest_path: str = None, device: str = None, jobs: int = None):
     target_device = select_device(device)
     if not target_device:
         console.print("[bold red]❌ No devices connected for pull operation.[/bold red]")
@@ -89,9 +132,8 @@ def pull_apk(package_name: str, dest_path: str = None, device: str = None):
 
     with console.status(f"[cyan]🔍 Locating package '{package_name}' on device...[/cyan]", spinner="dots") as status:
         # get paths
-        cmd = ["adb", "-s", target_device, "shell", "pm", "path", package_name]
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            result = run_adb(["shell", "pm", "path", package_name], target_device, capture_output=True, text=True, check=True)
         except subprocess.CalledProcessError:
             status.stop()
             console.print(f"[bold red]❌ Could not find package {package_name} on device {target_device}.[/bold red]")
@@ -107,82 +149,77 @@ def pull_apk(package_name: str, dest_path: str = None, device: str = None):
             status.stop()
             console.print(f"[bold red]❌ Package {package_name} not found or has no APK paths.[/bold red]")
             return
-            
-        if len(paths) == 1:
-            # Single APK
-            apk_path = paths[0]
-            filename = os.path.basename(apk_path)
-            final_dest = os.path.join(dest_path, filename)
-            status.update(f"[cyan]📦 Package found & Pulling (Single APK)...[/cyan]")
-            try:
-                pull_cmd = ["adb", "-s", target_device, "pull", apk_path, final_dest]
-                subprocess.run(pull_cmd, check=True, capture_output=True, text=True)
-                status.stop()
-                print_result_panel(package_name, final_dest, "Single APK")
-            except subprocess.CalledProcessError:
-                fallback_pull(target_device, [apk_path], dest_path, False, package_name, status)
-        else:
-            # Split APK
-            final_dest_dir = os.path.join(dest_path, f"{package_name}_apks")
-            os.makedirs(final_dest_dir, exist_ok=True)
-            status.update(f"[cyan]📦 Package found & Pulling (Split APKs - {len(paths)} files)...[/cyan]")
-            
-            try:
-                for apk_path in paths:
-                    filename = os.path.basename(apk_path)
-                    dest_file = os.path.join(final_dest_dir, filename)
-                    pull_cmd = ["adb", "-s", target_device, "pull", apk_path, dest_file]
-                    subprocess.run(pull_cmd, check=True, capture_output=True, text=True)
-                status.stop()
-                print_result_panel(package_name, final_dest_dir, f"Split APKs ({len(paths)} files)")
-            except subprocess.CalledProcessError:
-                fallback_pull(target_device, paths, dest_path, True, package_name, status)
-
-def fallback_pull(target_device, paths, dest_path, is_split, pkg_name, status):
-    status.update("[yellow]⚠️ Permission denied! Triển khai fallback qua quyền Root...[/yellow]")
-    
+
+    is_split = len(paths) > 1
     if is_split:
-        final_dest_dir = os.path.join(dest_path, f"{pkg_name}_apks")
-        os.makedirs(final_dest_dir, exist_ok=True)
-        success_count = 0
-        for apk_path in paths:
-            filename = os.path.basename(apk_path)
-            tmp_path = f"/data/local/tmp/adbrv_pull_{filename}"
-            cp_cmd = ["adb", "-s", target_device, "shell", "su", "-c", f"cp {apk_path} {tmp_path} && chmod 666 {tmp_path}"]
-            subprocess.run(cp_cmd, capture_output=True)
-            
-            pull_cmd = ["adb", "-s", target_device, "pull", tmp_path, os.path.join(final_dest_dir, filename)]
-            try:
-                subprocess.run(pull_cmd, check=True, capture_output=True)
-                success_count += 1
-            except subprocess.CalledProcessError:
-                pass
-                
-            # Cleanup
-            rm_cmd = ["adb", "-s", target_device, "shell", "su", "-c", f"rm {tmp_path}"]
-            subprocess.run(rm_cmd, capture_output=True)
-             
-        status.stop()
-        if success_count > 0:
-            print_result_panel(pkg_name, final_dest_dir, f"Split APKs ({success_count}/{len(paths)} files - Fallback Root)")
-        else:
-            console.print(f"[bold red]❌ Failed to pull even with root fallback.[/bold red]")
+        final_dest = os.path.join(dest_path, f"{package_name}_apks")
+        os.makedirs(final_dest, exist_ok=True)
+        base_apk = os.path.join(final_dest, "base.apk")
+        apk_type = f"Split APKs ({len(paths)} files)"
     else:
-        apk_path = paths[0]
-        filename = os.path.basename(apk_path)
-        tmp_path = f"/data/local/tmp/adbrv_pull_{filename}"
-        cp_cmd = ["adb", "-s", target_device, "shell", "su", "-c", f"cp {apk_path} {tmp_path} && chmod 666 {tmp_path}"]
-        subprocess.run(cp_cmd, capture_output=True)
-        
-        final_dest = os.path.join(dest_path, filename)
-        pull_cmd = ["adb", "-s", target_device, "pull", tmp_path, final_dest]
+        final_dest = base_apk = os.path.join(dest_path, os.path.basename(paths[0]))
+        apk_type = "Single APK"
+    targets = [(p, os.path.join(final_dest, os.path.basename(p)) if is_split else final_dest) for p in paths]
+
+    # Files already in the local APK store are linked from it instead of transferred
+    sizes = remote_sizes(target_device, paths)
+    version = version_code(target_device, package_name)
+    digests = {}
+    stored = apkStore.lookup(target_device, list(zip(paths, sizes)), version, digests)
+    reused = {}
+    for remote, local in targets:
+        if remote in stored:
+            size = apkStore.materialize(stored[remote], local)
+            if size is not None:
+                reused[remote] = size
+    reused_bytes = sum(reused.values())
+    missing = [(i, target) for i, target in enumerate(targets) if target[0] not in reused]
+
+    stats = TransferStats(0, 0, 0.0)
+    if missing:
+        console.print(f"[cyan]📦 Package found & Pulling ({apk_type})...[/cyan]")
+        hashes = remote_sha256_async(target_device, [t[0] for _, t in missing], known=digests)
         try:
-            subprocess.run(pull_cmd, check=True, capture_output=True)
-            status.stop()
-            print_result_panel(pkg_name, final_dest, "Single APK (Fallback Root)")
-        except subprocess.CalledProcessError:
-            status.stop()
-            console.print(f"[bold red]❌ Failed to pull even with root fallback.[/bold red]")
-            
-        rm_cmd = ["adb", "-s", target_device, "shell", "su", "-c", f"rm {tmp_path}"]
-        subprocess.run(rm_cmd, capture_output=True)
+            stats = pull_files(target_device, [t for _, t in missing], jobs, [sizes[i] for i, _ in missing], hashes)
+        except AdbError:
+            with console.status("[yellow]⚠️ Permission denied![/yellow]", spinner="dots") as status:
+                fallback_pull(target_device, [t[0] for _, t in missing], dest_path, is_split, package_name, status,
+                              reused=(len(reused), reused_bytes), version=version)
+            return
+        for _, (remote, local) in missing:
+            apkStore.ingest(local, remote, version, expected_sha256(hashes, remote))
+    learn_apk(base_apk)
+    print_result_panel(package_name, final_dest, apk_type, stats._replace(reused_files=len(reused), reused_bytes=reused_bytes))
+
+def fallback_pull(target_device, paths, dest_path, is_split, pkg_name, status, reused=(0, 0), version=None):
+    from .capabilities import has_root
+    if not has_root(target_device):
+        status.stop()
+        console.print(f"[bold red]❌ Permission denied and no root access on {target_device} for fallback.[/bold red]")
+        return
+    status.update("[yellow]⚠️ Permission denied! Triển khai fallback qua quyền Root...[/yellow]")
+
+    if is_split:
+        final_dest = os.path.join(dest_path, f"{pkg_name}_apks")
+        os.makedirs(final_dest, exist_ok=True)
+        targets = [(p, os.path.join(final_dest, os.path.basename(p))) for p in paths]
+        base_apk = os.path.join(final_dest, "base.apk")
+        apk_type = f"Split APKs ({len(paths) + reused[0]} files - Fallback Root)"
+    else:
+        final_dest = base_apk = os.path.join(dest_path, os.path.basename(paths[0]))
+        targets = [(paths[0], final_dest)]
+        apk_type = "Single APK (Fallback Root)"
+
+    # Every file in one su stream, written straight to its destination
+    start = time.perf_counter()
+    try:
+        written = pull_files_as_root(target_device, targets)
+    except AdbError as e:
+        status.stop()
+        console.print(f"[bold red]❌ Failed to pull even with root fallback: {e}[/bold red]")
+        return
+    status.stop()
+    for remote, local in targets:
+        apkStore.ingest(local, remote, version)
+    learn_apk(base_apk)
+    print_result_panel(pkg_name, final_dest, apk_type, TransferStats(len(targets), written, time.perf_counter() - start, *reused))
@@ -0,0 +1,384 @@
+"""
+Record and replay of adb sessions
+
+`adbrv --record FILE <command>` saves every adb call the command makes (adb
+subprocesses and the other tools run through the profiler, native client
+requests, persistent-session shell commands) with its result and observed
+latency, plus the JSON state of the cache it started from (property cache,
+package index, labels, APK store index). Recording and replay both run against
+a private cache directory seeded with that snapshot, so stored APKs and other
+binaries the recording cannot carry are absent on both sides and the command
+takes the same paths.
+
+With ADBRV_REPLAY=FILE the same calls are answered from the recording instead
+of a device, each after its recorded latency (scaled by ADBRV_REPLAY_SPEED,
+0 for no delay), so the command runs offline with the original timing. Calls
+are matched on (kind, device, request); identical requests are answered in
+recorded order. A request that is not in the recording raises ReplayMismatch.
+ADBRV_REPLAY_REPORT=FILE writes the calls made, mismatches and wall time on
+exit, which `python -m benchmarks.replay check` holds against the budgets
+stored in the recording.
+"""
+
+import base64
+import builtins
+import collections
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from . import adbClient
+from .adbClient import AdbClient, ShellResult, SyncStat
+
+FORMAT_VERSION = 1
+
+
+class ReplayError(Exception):
+    pass
+
+
+class ReplayMismatch(ReplayError):
+    pass
+
+
+_recorder = None
+_player = None
+
+
+def mode():
+    """'record', 'replay' or None"""
+    if _recorder is not None:
+        return "record"
+    if _player is not None:
+        return "replay"
+    return None
+
+
+def call(kind, device, request, fn, files=()):
+    """Run fn() as one adb call: pass-through, recorded, or answered from the replay"""
+    if _player is not None:
+        return _player.answer(kind, device, request, files)
+    if _recorder is None:
+        return fn()
+    return _recorder.capture(kind, device, request, fn, files)
+
+
+def run_process(tool, argv, device, fn):
+    """call() for a subprocess; argv is the command line without `-s <serial>`"""
+    files = ()
+    if tool == "adb" and argv[:1] == ["pull"] and len(argv) == 3:
+        # The local destination is the caller's choice, only the remote side identifies the call
+        files = (argv[2],)
+        argv = argv[:2]
+    elif tool == "adb" and argv[:1] == ["push"] and len(argv) == 3:
+        argv = [argv[0], argv[2]]
+    return call("run", device, " ".join([tool] + argv), fn, files)
+
+
+# -- encoding -------------------------------------------------------------
+
+def _encode(value):
+    if isinstance(value, bytes):
+        return {"bytes": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, ShellResult):
+        return {"shell": list(value)}
+    if isinstance(value, SyncStat):
+        return {"stat": list(value)}
+    if isinstance(value, subprocess.CompletedProcess):
+        return {"process": [value.returncode, _encode(value.stdout), _encode(value.stderr)]}
+    return {"value": value}
+
+
+def _decode(data, request=""):
+    if "bytes" in data:
+        return base64.b64decode(data["bytes"])
+    if "shell" in data:
+        return ShellResult(*data["shell"])
+    if "stat" in data:
+        return SyncStat(*data["stat"])
+    if "process" in data:
+        returncode, stdout, stderr = data["process"]
+        return subprocess.CompletedProcess(request.split(), returncode, _decode(stdout), _decode(stderr))
+    return data["value"]
+
+
+def _encode_error(e):
+    if isinstance(e, subprocess.CalledProcessError):
+        return {"type": "CalledProcessError", "returncode": e.returncode, "stdout": _encode(e.stdout), "stderr": _encode(e.stderr)}
+    if isinstance(e, subprocess.TimeoutExpired):
+        return {"type": "TimeoutExpired", "timeout": e.timeout}
+    return {"type": type(e).__name__, "message": str(e)}
+
+
+def _raise(error, request):
+    kind = error["type"]
+    if kind == "CalledProcessError":
+        raise subprocess.CalledProcessError(error["returncode"], request.split(), _decode(error["stdout"]), _decode(error["stderr"]))
+    if kind == "TimeoutExpired":
+        raise subprocess.TimeoutExpired(request.split(), error["timeout"])
+    cls = getattr(adbClient, kind, None) or getattr(builtins, kind, None)
+    if isinstance(cls, type) and issubclass(cls, (adbClient.AdbProtocolError, OSError)):
+        raise cls(error["message"])
+    raise ReplayError(f"{kind}: {error['message']}")
+
+
+# -- recording ------------------------------------------------------------
+
+def _cache_snapshot():
+    """
+    Every JSON file of the cache tree (property cache, package index, labels, APK store
+    index), relative path -> text. Stored APKs and frida-server binaries are left out.
+    """
+    from .utils import get_cache_dir
+    base = get_cache_dir()
+    snapshot = {}
+    for path in glob.glob(os.path.join(base, "**", "*.json"), recursive=True):
+        try:
+            with open(path) as f:
+                snapshot[os.path.relpath(path, base)] = f.read()
+        except (OSError, UnicodeDecodeError):
+            pass
+    return snapshot
+
+
+def _isolate_cache(snapshot):
+    """
+    Point the cache at a private directory holding only snapshot, so a recording and its
+    replays start from the same cache state; returns the directory
+    """
+    cache_home = tempfile.mkdtemp(prefix="adbrv-replay-")
+    for rel, text in snapshot.items():
+        target = os.path.join(cache_home, "adbrv", rel)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "w") as f:
+            f.write(text)
+    os.environ["XDG_CACHE_HOME"] = cache_home
+    return cache_home
+
+
+def _command_args(argv):
+    """argv without the --record option"""
+    args, skip = [], False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg == "--record":
+            skip = True
+        elif not arg.startswith("--record="):
+            args.append(arg)
+    return args
+
+
+class Recorder:
+    def __init__(self, path):
+        self.path = path
+        self.calls = []
+        self.lock = threading.Lock()
+        self.cache = _cache_snapshot()
+        # Objects missing from the snapshot (stored APKs) would be missing at replay too
+        self.cache_home = _isolate_cache(self.cache)
+        self.start = time.perf_counter()
+
+    def capture(self, kind, device, request, fn, files):
+        start = time.perf_counter()
+        entry = {"kind": kind, "device": device, "request": request}
+        try:
+            result = fn()
+        except Exception as e:
+            entry["error"] = _encode_error(e)
+            self._add(entry, start)
+            raise
+        entry["result"] = _encode(result)
+        if files:
+            entry["files"] = [os.path.getsize(f) if os.path.isfile(f) else None for f in files]
+        self._add(entry, start)
+        return result
+
+    def _add(self, entry, start):
+        now = time.perf_counter()
+        entry["start"] = round(start - self.start, 6)
+        entry["duration"] = round(now - start, 6)
+        with self.lock:
+            self.calls.append(entry)
+
+    def save(self):
+        recording = {
+            "version": FORMAT_VERSION,
+            "meta": {
+                "command": _command_args(sys.argv[1:]),
+                "native": os.environ.get("ADBRV_NATIVE_ADB", "1") != "0",
+                "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "wall": round(time.perf_counter() - self.start, 6),
+            },
+            "cache": self.cache,
+            "calls": sorted(self.calls, key=lambda c: c["start"]),
+        }
+        with open(self.path, "w") as f:
+            json.dump(recording, f, indent=1)
+        return len(self.calls)
+
+
+# -- replay ---------------------------------------------------------------
+
+def _extend(path_or_file, size):
+    """Stand-in for pulled content: a sparse file of the recorded size"""
+    if hasattr(path_or_file, "extend"):
+        # pull_file's hashing sink, which has to count the bytes it is handed
+        path_or_file.extend(size)
+        return
+    if hasattr(path_or_file, "truncate"):
+        path_or_file.truncate(path_or_file.tell() + size)
+        path_or_file.seek(0, os.SEEK_END)
+        return
+    with open(path_or_file, "wb") as f:
+        f.truncate(size)
+
+
+class Player:
+    def __init__(self, recording, cache_home, speed=1.0, report=None):
+        self.recording = recording
+        self.cache_home = cache_home
+        self.speed = speed
+        self.report = report
+        self.lock = threading.Lock()
+        self.queues = collections.defaultdict(collections.deque)
+        for entry in recording["calls"]:
+            self.queues[(entry["kind"], entry["device"] or "", entry["request"])].append(entry)
+        self.used = set()
+        self.calls = 0
+        self.repeats = 0
+        self.mismatches = []
+        self.by_kind = collections.Counter()
+        self.start = time.perf_counter()
+
+    def answer(self, kind, device, request, files=()):
+        with self.lock:
+            self.calls += 1
+            self.by_kind[kind] += 1
+            queue = self.queues.get((kind, device or "", request))
+            if not queue:
+                self.mismatches.append({"kind": kind, "device": device, "request": request})
+                raise ReplayMismatch(f"Not in recording: {kind} {device or '-'} {request}")
+            # The last answer for a request is kept for extra repeats, which are counted
+            entry = queue.popleft() if len(queue) > 1 else queue[0]
+            if id(entry) in self.used:
+                self.repeats += 1
+            self.used.add(id(entry))
+        if self.speed:
+            time.sleep(entry["duration"] * self.speed)
+        if "error" in entry:
+            _raise(entry["error"], request)
+        for path, size in zip(files, entry.get("files", ())):
+            if size is not None:
+                _extend(path, size)
+        return _decode(entry["result"], request)
+
+    def save_report(self):
+        if not self.report:
+            return
+        with open(self.report, "w") as f:
+            json.dump({
+                "calls": self.calls,
+                "recorded_calls": len(self.recording["calls"]),
+                "repeats": self.repeats,
+                "mismatches": self.mismatches,
+                "by_kind": dict(self.by_kind),
+                "wall": round(time.perf_counter() - self.start, 6),
+            }, f, indent=1)
+
+
+class Client(AdbClient):
+    """AdbClient whose requests go through call(); while replaying it never opens a socket"""
+
+    def host_query(self, service, timeout=None):
+        serial = service.split(":")[1] if service.startswith("host-serial:") else None
+        return call("native", serial, service, lambda: AdbClient.host_query(self, service, timeout))
+
+    def shell(self, serial, command, timeout=None):
+        return call("native", serial, f"shell:{command}", lambda: AdbClient.shell(self, serial, command, timeout))
+
+    def exec_out(self, serial, command, timeout=None):
+        return call("native", serial, f"exec:{command}", lambda: AdbClient.exec_out(self, serial, command, timeout))
+
+    def exec_stream(self, serial, command, sink, timeout=None, trace=True):
+        # Only the byte count is recorded: a replayed stream delivers no data
+        return call("native", serial, f"exec-stream:{command}", lambda: AdbClient.exec_stream(self, serial, command, sink, timeout, trace))
+
+    def reverse_list(self, serial):
+        return call("native", serial, "reverse:list-forward", lambda: AdbClient.reverse_list(self, serial))
+
+    def reverse_forward(self, serial, remote, local):
+        return call("native", serial, f"reverse:forward:{remote};{local}", lambda: AdbClient.reverse_forward(self, serial, remote, local))
+
+    def reverse_remove_all(self, serial):
+        return call("native", serial, "reverse:killforward-all", lambda: AdbClient.reverse_remove_all(self, serial))
+
+    def stat(self, serial, path):
+        return call("native", serial, f"sync:STAT {path}", lambda: AdbClient.stat(self, serial, path))
+
+    def push(self, serial, fileobj, path, mode=0o644, progress=None, timeout=None):
+        total = call("native", serial, f"sync:SEND {path}", lambda: AdbClient.push(self, serial, fileobj, path, mode, progress, timeout))
+        if _player is not None and progress:
+            progress(total)
+        return total
+
+    def pull(self, serial, path, fileobj, progress=None, timeout=None):
+        total = call("native", serial, f"sync:RECV {path}", lambda: AdbClient.pull(self, serial, path, fileobj, progress, timeout))
+        if _player is not None:
+            _extend(fileobj, total)
+            if progress:
+                progress(total)
+        return total
+
+
+# -- control --------------------------------------------------------------
+
+def start_recording(path):
+    global _recorder
+    # Calls served by a running daemon would bypass the recorder
+    os.environ["ADBRV_NO_DAEMON"] = "1"
+    _recorder = Recorder(path)
+
+
+def start_replay(path, speed=1.0, report=None):
+    """Answer adb calls from the recording at path; runs against a private copy of its cache snapshot"""
+    global _player
+    try:
+        with open(path) as f:
+            recording = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ReplayError(f"Cannot read recording {path}: {e}")
+    if recording.get("version") != FORMAT_VERSION:
+        raise ReplayError(f"Unsupported recording format in {path}")
+    cache_home = _isolate_cache(recording.get("cache", {}))
+    os.environ["ADBRV_NO_DAEMON"] = "1"
+    os.environ["ADBRV_NATIVE_ADB"] = "1" if recording["meta"].get("native", True) else "0"
+    _player = Player(recording, cache_home, speed, report)
+
+
+def start_from_env():
+    """Enable replay when ADBRV_REPLAY names a recording"""
+    path = os.environ.get("ADBRV_REPLAY")
+    if path:
+        start_replay(path, float(os.environ.get("ADBRV_REPLAY_SPEED") or 1.0), os.environ.get("ADBRV_REPLAY_REPORT"))
+
+
+def finish():
+    """Write the recording or the replay report; returns the number of calls"""
+    global _recorder, _player
+    if _recorder is not None:
+        recorder, _recorder = _recorder, None
+        shutil.rmtree(recorder.cache_home, ignore_errors=True)
+        return recorder.save()
+    if _player is not None:
+        player, _player = _player, None
+        player.save_report()
+        shutil.rmtree(player.cache_home, ignore_errors=True)
+        return player.calls
+    return 0
@@ -3,9 +3,9 @@ APK resigning tools using uber-apk-signer
 """
 
 import os
-import subprocess
 import sys
 from rich.console import Console
+from . import profiler
 
 console = Console()
 
@@ -24,7 +24,7 @@ def resign_apk(resign_args):
     cmd = ['java', '-jar', jar_path] + resign_args
     try:
         with console.status("[bold green]Resigning APK using uber-apk-signer...[/bold green]", spinner="dots"):
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            result = profiler.run(cmd, capture_output=True, text=True)
             if result.returncode != 0:
                 console.print(f"[bold red]Error running uber-apk-signer:\\n{result.stderr}[/bold red]")
                 sys.exit(result.returncode)
@@ -0,0 +1,263 @@
+"""
+Single scheduler for adb calls
+
+Every adb round trip (native socket call or `adb` subprocess, blocking or
+asyncio) takes a slot here first. Slots are capped globally and per device,
+and waiting callers are served interactive-first, so a user command is never
+queued behind Workspace refreshes. Read-only queries can also be coalesced:
+a second caller asking for the same thing (e.g. the reverse list of one
+device) while it is in flight shares the first caller's result instead of
+issuing its own call.
+
+Priority is per thread: code runs INTERACTIVE unless it is inside
+`with background():` (or on the shared asyncio loop thread, which only runs
+background refreshes).
+"""
+
+import asyncio
+import bisect
+import itertools
+import os
+import threading
+from concurrent.futures import Future
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+GLOBAL_LIMIT = int(os.environ.get("ADBRV_ADB_CONCURRENCY", "6"))
+PER_DEVICE_LIMIT = 2
+
+
+class _Abandoned(Exception):
+    """The coalescing leader was cancelled; followers retry on their own"""
+
+
+class Scheduler:
+    def __init__(self, global_limit=GLOBAL_LIMIT, per_device_limit=PER_DEVICE_LIMIT):
+        self.global_limit = max(1, global_limit)
+        self.per_device_limit = max(1, per_device_limit)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._running = 0
+        self._per_device = {}
+        self._queue = []  # sorted [(priority, seq, serial, grant)]
+        self._seq = itertools.count()
+        self._inflight = {}  # key -> (Future, priority)
+
+    # -- priority ---------------------------------------------------------
+
+    def priority(self):
+        return getattr(self._local, "priority", INTERACTIVE)
+
+    def set_priority(self, priority):
+        self._local.priority = priority
+
+    def background(self):
+        return _PriorityScope(self, BACKGROUND)
+
+    # -- slots ------------------------------------------------------------
+
+    def _free(self, serial):
+        return self._running < self.global_limit and self._per_device.get(serial, 0) < self.per_device_limit
+
+    def _take(self, serial):
+        self._running += 1
+        self._per_device[serial] = self._per_device.get(serial, 0) + 1
+
+    def _request(self, serial, priority, grant):
+        """Take a slot now (True) or queue grant() to be called once one is handed over (False)"""
+        with self._lock:
+            if self._free(serial):
+                self._take(serial)
+                return True
+            bisect.insort(self._queue, (priority, next(self._seq), serial, grant))
+            return False
+
+    def _withdraw(self, grant):
+        """Drop a queued request; False if it was already granted"""
+        with self._lock:
+            for i, entry in enumerate(self._queue):
+                if entry[3] is grant:
+                    del self._queue[i]
+                    return True
+            return False
+
+    def _release(self, serial):
+        granted = []
+        with self._lock:
+            self._running -= 1
+            self._per_device[serial] -= 1
+            if not self._per_device[serial]:
+                del self._per_device[serial]
+            # Highest priority first, skipping waiters whose device is still at its cap
+            for entry in list(self._queue):
+                if self._running >= self.global_limit:
+                    break
+                if self._free(entry[2]):
+                    self._queue.remove(entry)
+                    self._take(entry[2])
+                    granted.append(entry[3])
+        for grant in granted:
+            grant()
+
+    def slot(self, serial=None, priority=None):
+        """Blocking context manager holding one adb slot for serial"""
+        return _Slot(self, serial, self.priority() if priority is None else priority)
+
+    def aslot(self, serial=None, priority=None):
+        """`async with` counterpart of slot()"""
+        return _AsyncSlot(self, serial, self.priority() if priority is None else priority)
+
+    # -- coalescing -------------------------------------------------------
+
+    def _join(self, key):
+        """(future, leader?) for key; callers only join leaders of equal or higher priority"""
+        priority = self.priority()
+        with self._lock:
+            current = self._inflight.get(key)
+            if current is not None and current[1] <= priority:
+                return current[0], False
+            fut = Future()
+            if current is None:
+                self._inflight[key] = (fut, priority)
+            return fut, True
+
+    def _finish(self, key, fut, result=None, error=None):
+        with self._lock:
+            if self._inflight.get(key, (None,))[0] is fut:
+                del self._inflight[key]
+        if error is not None:
+            fut.set_exception(error)
+        else:
+            fut.set_result(result)
+
+    def coalesce(self, key, fn):
+        """Return fn(), sharing the result with any caller of the same key while it runs"""
+        while True:
+            fut, leader = self._join(key)
+            if not leader:
+                try:
+                    return fut.result()
+                except _Abandoned:
+                    continue
+            try:
+                result = fn()
+            except Exception as e:
+                self._finish(key, fut, error=e)
+                raise
+            except BaseException:
+                self._finish(key, fut, error=_Abandoned())
+                raise
+            self._finish(key, fut, result)
+            return result
+
+    async def acoalesce(self, key, coro_fn):
+        """asyncio counterpart of coalesce(); coro_fn() is awaited only by the leader"""
+        while True:
+            fut, leader = self._join(key)
+            if not leader:
+                try:
+                    # shield: a cancelled follower must not cancel the shared future
+                    return await asyncio.shield(asyncio.wrap_future(fut))
+                except _Abandoned:
+                    continue
+            try:
+                result = await coro_fn()
+            except Exception as e:
+                self._finish(key, fut, error=e)
+                raise
+            except BaseException:
+                self._finish(key, fut, error=_Abandoned())
+                raise
+            self._finish(key, fut, result)
+            return result
+
+
+class _PriorityScope:
+    def __init__(self, scheduler, priority):
+        self.scheduler = scheduler
+        self.priority = priority
+
+    def __enter__(self):
+        self.previous = self.scheduler.priority()
+        self.scheduler.set_priority(self.priority)
+
+    def __exit__(self, *exc):
+        self.scheduler.set_priority(self.previous)
+
+
+class _Slot:
+    def __init__(self, scheduler, serial, priority):
+        self.scheduler = scheduler
+        self.serial = serial
+        self.priority = priority
+
+    def __enter__(self):
+        event = threading.Event()
+        if not self.scheduler._request(self.serial, self.priority, event.set):
+            event.wait()
+
+    def __exit__(self, *exc):
+        self.scheduler._release(self.serial)
+
+
+class _AsyncSlot(_Slot):
+    async def __aenter__(self):
+        loop = asyncio.get_event_loop()
+        fut = loop.create_future()
+
+        def _granted():
+            if not fut.done():
+                fut.set_result(None)
+
+        def grant():
+            loop.call_soon_threadsafe(_granted)
+
+        if self.scheduler._request(self.serial, self.priority, grant):
+            return
+        try:
+            await fut
+        except BaseException:
+            # Cancelled while queued: give the slot back if it was handed over meanwhile
+            if not self.scheduler._withdraw(grant):
+                self.scheduler._release(self.serial)
+            raise
+
+    async def __aexit__(self, *exc):
+        self.scheduler._release(self.serial)
+
+
+_scheduler = Scheduler()
+
+
+def get_scheduler():
+    return _scheduler
+
+
+def slot(serial=None, priority=None):
+    return _scheduler.slot(serial, priority)
+
+
+def aslot(serial=None, priority=None):
+    return _scheduler.aslot(serial, priority)
+
+
+def coalesce(key, fn):
+    return _scheduler.coalesce(key, fn)
+
+
+def acoalesce(key, coro_fn):
+    return _scheduler.acoalesce(key, coro_fn)
+
+
+def background():
+    """`with background():` runs the enclosed adb calls behind interactive ones"""
+    return _scheduler.background()
+
+
+def current_priority():
+    return _scheduler.priority()
+
+
+def set_priority(priority):
+    _scheduler.set_priority(priority)
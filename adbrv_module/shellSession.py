@@ -0,0 +1,142 @@
+"""
+Persistent shell sessions, one per device
+
+Keeps a single `shell,v2,raw:` channel open per serial and runs commands on it
+framed by a unique sentinel line carrying the exit code, so repeated probes cost
+one round trip instead of a new adb connection and shell setup each time.
+Commands on a session run one at a time, so long-running ones (hashing,
+batched pm/dumpsys loops) go through devices.long_shell instead.
+"""
+
+import threading
+import time
+import uuid
+
+from .adbClient import (
+    AdbProtocolError, AdbTimeout, ShellResult,
+    SHELL_STDIN, SHELL_STDOUT, SHELL_EXIT,
+    read_shell_packet, shell_packet, decode_output,
+)
+
+DEFAULT_TIMEOUT = 30.0
+
+
+class _StaleChannel(AdbProtocolError):
+    pass
+
+
+class ShellSession:
+    """Long-lived shell on one device; commands are serialized by a lock"""
+
+    def __init__(self, client, serial):
+        self.client = client
+        self.serial = serial
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def run(self, command, timeout=None):
+        from .profiler import span
+        from .replay import call
+        with span("adb-session", command, self.serial) as sp:
+            result = call("session", self.serial, command, lambda: self._run(command, timeout, sp))
+            sp.returncode = result.returncode
+            return result
+
+    def _run(self, command, timeout, sp):
+        deadline = time.monotonic() + (DEFAULT_TIMEOUT if timeout is None else timeout)
+        marker = f"ADBRV_END_{uuid.uuid4().hex}"
+        # Subshell keeps `exit`/`cd` in the command from leaking into the session;
+        # stdin is detached so the command can't swallow the next request.
+        script = f"( {command}\n) </dev/null 2>/dev/null; printf '\\n%s %d\\n' {marker} $?\n"
+        with self._lock:
+            for attempt in (0, 1):
+                if self._conn is None:
+                    # The channel outlives many commands, so it is traced per command instead
+                    self._conn = self.client.transport(self.serial, "shell,v2,raw:", trace=False)
+                try:
+                    try:
+                        packet = shell_packet(SHELL_STDIN, script.encode("utf-8"))
+                        sp.bytes_in += len(packet)
+                        self._conn.send_raw(packet)
+                    except AdbTimeout:
+                        raise
+                    except AdbProtocolError:
+                        raise _StaleChannel()
+                    return self._collect(marker, deadline, sp)
+                except _StaleChannel:
+                    # The device dropped since the last command; reconnect once
+                    self._close()
+                    if attempt:
+                        raise AdbProtocolError("Shell session closed by device.")
+                except AdbProtocolError:
+                    self._close()
+                    raise
+
+    def _collect(self, marker, deadline, sp):
+        buf = b""
+        tag = f"\n{marker} ".encode("utf-8")
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise AdbTimeout("Timed out waiting for shell session.")
+            self._conn.sock.settimeout(remaining)
+            packet = read_shell_packet(self._conn)
+            if packet is None or packet[0] == SHELL_EXIT:
+                if not buf:
+                    raise _StaleChannel()
+                raise AdbProtocolError("Shell session closed by device.")
+            sp.bytes_out += len(packet[1])
+            if packet[0] != SHELL_STDOUT:
+                continue
+            buf += packet[1]
+            idx = buf.find(tag)
+            if idx != -1:
+                end = buf.find(b"\n", idx + len(tag))
+                if end != -1:
+                    try:
+                        returncode = int(buf[idx + len(tag):end])
+                    except ValueError:
+                        returncode = 255
+                    return ShellResult(decode_output(buf[:idx]), "", returncode)
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(client, serial):
+    """Shared session for serial, or None if the device lacks shell protocol v2"""
+    with _sessions_lock:
+        if serial in _sessions:
+            return _sessions[serial]
+    session = None
+    if "shell_v2" in client.features(serial):
+        session = ShellSession(client, serial)
+    with _sessions_lock:
+        return _sessions.setdefault(serial, session)
+
+
+def drop_session(serial):
+    """Close and forget the session for serial (device went away or rebooted)"""
+    with _sessions_lock:
+        session = _sessions.pop(serial, None)
+    if session is not None:
+        session.close()
+
+
+def close_all():
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        if session is not None:
+            session.close()
@@ -0,0 +1,206 @@
+"""
+Event-driven device status for the Workspace
+
+One engine on the shared asyncio loop (asyncAdb.background_loop) keeps
+per-device facts current:
+
+- the host:track-devices stream (or `adb track-devices`) is parsed frame by
+  frame; only devices whose state changed are invalidated (property snapshot,
+  shell session, cached facets) and re-probed;
+- each facet (frida server running, proxy/reverse set) is cached per device
+  with its own TTL and refreshed only for devices where it is stale, when
+  someone reads it;
+- listeners are called on the loop thread after every change, so the prompt
+  can be updated with call_soon_threadsafe instead of polling.
+
+Reads (devices(), facet()) are safe from any thread and never block on adb.
+"""
+
+import asyncio
+import threading
+import time
+
+# Seconds a facet value stays fresh; changes made outside adbrv are picked up after this
+FACET_TTL = {"frida": 8.0, "proxy": 10.0}
+RETRY_DELAY = 2.0
+
+
+async def _frida_running(serial):
+    from .asyncAdb import get_frida_status
+    return (await get_frida_status(serial)).startswith("On")
+
+
+async def _proxy_set(serial):
+    from .asyncAdb import get_proxy_status, get_reverse_ports
+    proxy, reverse = await asyncio.gather(get_proxy_status(serial), get_reverse_ports(serial))
+    return bool(proxy and proxy not in (":0", "null", "")) or reverse != "(none)"
+
+
+FACETS = {"frida": _frida_running, "proxy": _proxy_set}
+
+
+class StatusEngine:
+    def __init__(self, ttl=None):
+        self.ttl = dict(FACET_TTL, **(ttl or {}))
+        self._lock = threading.Lock()
+        self._states = None   # serial -> adb state; None until the first device list
+        self._facets = {}     # (serial, facet) -> (value, monotonic time)
+        self._pending = {}    # (serial, facet) -> asyncio.Task
+        self._listeners = []
+        self._task = None
+
+    # -- control (any thread) --------------------------------------------
+
+    def start(self):
+        from .asyncAdb import run_background
+        if self._task is None:
+            self._task = run_background(self._track())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def add_listener(self, fn):
+        """fn(serial, what) runs on the loop thread; what is "state" or a facet name"""
+        self._listeners.append(fn)
+
+    def invalidate(self, serial=None, facets=None):
+        """Forget facets of serial (every device by default) after a command changed them, and re-probe"""
+        from .asyncAdb import background_loop
+        background_loop().call_soon_threadsafe(self._invalidate, serial, tuple(facets or self.ttl))
+
+    # -- reads (any thread) ----------------------------------------------
+
+    def devices(self):
+        """Online serials, or None before the first device list arrived"""
+        with self._lock:
+            if self._states is None:
+                return None
+            return [s for s, state in self._states.items() if state == "device"]
+
+    def facet(self, name):
+        """True if any online device has it, False if none has, None while unknown; stale values are refreshed"""
+        from .asyncAdb import background_loop
+        devices = self.devices()
+        if devices is None:
+            return None
+        background_loop().call_soon_threadsafe(self._refresh_stale, name)
+        with self._lock:
+            known = [self._facets[(s, name)][0] for s in devices if (s, name) in self._facets]
+        if any(known):
+            return True
+        if len(known) < len(devices):
+            return None
+        return False
+
+    # -- loop thread -----------------------------------------------------
+
+    async def _track(self):
+        from . import asyncAdb
+        from .profiler import set_source
+        set_source("StatusEngine.track")
+        while True:
+            try:
+                async for entries in asyncAdb.track_devices():
+                    self._on_devices(entries)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass
+            # No track stream (server restarting, adb missing): poll once, then retry
+            try:
+                self._on_devices([(s, "device") for s in await asyncAdb.get_connected_devices()])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                if self.devices() is None:
+                    self._on_devices([])
+            await asyncio.sleep(RETRY_DELAY)
+
+    def _on_devices(self, entries):
+        new = dict(entries)
+        with self._lock:
+            first = self._states is None
+            old = self._states or {}
+            changed = [s for s in set(old) | set(new) if old.get(s) != new.get(s)]
+            self._states = new
+            for key in [k for k in self._facets if k[0] in changed]:
+                del self._facets[key]
+        for serial in changed:
+            self._forget(serial, new.get(serial))
+            if new.get(serial) == "device":
+                for name in self.ttl:
+                    self._refresh(serial, name)
+            self._notify(serial, "state")
+        if first and not changed:
+            self._notify(None, "state")
+
+    def _forget(self, serial, state):
+        from . import asyncAdb
+        from .adbClient import get_client
+        from .propCache import invalidate
+        from .shellSession import drop_session
+        for key in [k for k in self._pending if k[0] == serial]:
+            self._pending.pop(key).cancel()
+        # A device leaving the "device" state may come back rebooted
+        if state != "device":
+            invalidate(serial)
+        drop_session(serial)
+        asyncAdb.forget(serial)
+        client = get_client()
+        if client is not None:
+            client.forget(serial)
+
+    def _invalidate(self, serial, facets):
+        with self._lock:
+            serials = [serial] if serial else [s for s, state in (self._states or {}).items() if state == "device"]
+            for s in serials:
+                for name in facets:
+                    self._facets.pop((s, name), None)
+        for s in serials:
+            for name in facets:
+                self._refresh(s, name)
+                self._notify(s, name)
+
+    def _refresh_stale(self, name):
+        now = time.monotonic()
+        with self._lock:
+            stale = [
+                s for s, state in (self._states or {}).items()
+                if state == "device" and now - self._facets.get((s, name), (None, 0.0))[1] > self.ttl[name]
+            ]
+        for serial in stale:
+            if (serial, name) not in self._pending:
+                self._refresh(serial, name)
+
+    def _refresh(self, serial, name):
+        # A refresh started before an invalidation may carry the old state: replace it
+        previous = self._pending.pop((serial, name), None)
+        if previous is not None:
+            previous.cancel()
+        self._pending[(serial, name)] = asyncio.get_event_loop().create_task(self._fetch(serial, name))
+
+    async def _fetch(self, serial, name):
+        from .profiler import set_source
+        set_source(f"StatusEngine.{name}")
+        try:
+            value = await FACETS[name](serial)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            value = False  # unreachable device: nothing to act on until its TTL runs out
+        with self._lock:
+            previous = self._facets.get((serial, name), (None,))[0]
+            self._facets[(serial, name)] = (value, time.monotonic())
+        if self._pending.get((serial, name)) is asyncio.current_task():
+            del self._pending[(serial, name)]
+        if value != previous:
+            self._notify(serial, name)
+
+    def _notify(self, serial, what):
+        for fn in list(self._listeners):
+            try:
+                fn(serial, what)
+            except Exception:
+                pass
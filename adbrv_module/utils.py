@@ -14,6 +14,21 @@ def get_nm_path():
     import shutil
     return shutil.which('nm')
 
+def get_cache_dir(*parts):
+    """Per-user cache directory for adbrv, created on demand"""
+    import os, sys
+    base = os.environ.get("XDG_CACHE_HOME")
+    if not base:
+        if sys.platform == "darwin":
+            base = os.path.expanduser("~/Library/Caches")
+        elif os.name == "nt":
+            base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~/AppData/Local")
+        else:
+            base = os.path.expanduser("~/.cache")
+    path = os.path.join(base, "adbrv", *parts)
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
 def print_colored(text, color=BLUE):
     """Print colored text to terminal"""
     print(f"{color}{text}{RESET}")
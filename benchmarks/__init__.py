@@ -0,0 +1 @@
+"""Benchmarks for adbrv against a fake adb; run with `python -m benchmarks.run`."""
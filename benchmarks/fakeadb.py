@@ -0,0 +1,734 @@
+"""
+Scriptable stand-in for adb, used by the benchmarks
+
+build() lays out N fake devices on disk. Each device is a directory with a
+bin/ of small shell stubs (getprop, settings, pm, ps, id, su, ls, mv, which) and a
+state/ directory, so adbrv's real shell scripts run unmodified in a local `sh`
+with the device's bin/ first on PATH. Paths under /data/local/tmp are
+remapped into the device directory by the su, ls, mv, rm and chmod stubs.
+
+The devices are served two ways, matching adbrv's two transports:
+
+  FakeAdbServer  - the adb server host protocol over TCP (native client path)
+  install_cli()  - an `adb` executable for PATH (subprocess fallback path)
+
+APKs are never written to disk: `pm path` lists synthetic paths whose sizes
+come from the config, and pulls stream generated bytes, so multi-gigabyte
+split APKs cost no disk space on the fake side.
+"""
+
+import json
+import os
+import select
+import shlex
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+BIG_PACKAGE = "com.bench.big"
+
+DEFAULT_CONFIG = {
+    "devices": 2,
+    "latency": 0.0,          # seconds added to every adb request / session command
+    "packages": 300,
+    "splits": 3,             # split APKs of BIG_PACKAGE (plus base.apk)
+    "apk_size": 32 << 20,    # bytes per BIG_PACKAGE APK file
+    "small_apk_size": 1 << 20,
+    "frida_servers": 1,      # frida-server binaries in /data/local/tmp
+    "frida_startup": 0.2,    # seconds a fake frida-server takes before it listens
+}
+
+# 64 KiB of generated APK content: zeros, the same bytes the cat, tail and sha256sum stubs produce
+_PATTERN = bytes(1 << 16)
+
+STUBS = {
+    "getprop": """\
+if [ -n "$1" ]; then
+  sed -n "s/^\\[$1\\]: \\[\\(.*\\)\\]$/\\1/p" "$FAKE_DEVICE_ROOT/state/props.txt"
+else
+  cat "$FAKE_DEVICE_ROOT/state/props.txt"
+fi
+""",
+    "settings": """\
+f="$FAKE_DEVICE_ROOT/state/settings_$2_$3"
+case "$1" in
+  get) if [ -f "$f" ]; then cat "$f"; else echo null; fi ;;
+  put) printf '%s\\n' "$4" > "$f" ;;
+  *) exit 1 ;;
+esac
+""",
+    "pm": """\
+pkgs="$FAKE_DEVICE_ROOT/state/packages.txt"
+case "$1" in
+  list)
+    case "$*" in
+      *--show-versioncode*) sed 's#.*#package:/data/app/&/base.apk=& versionCode:1 uid:10000#' "$pkgs" ;;
+      *-f*) sed 's#.*#package:/data/app/&/base.apk=&#' "$pkgs" ;;
+      *) sed 's/^/package:/' "$pkgs" ;;
+    esac ;;
+  path)
+    grep -qx "$2" "$pkgs" || exit 1
+    echo "package:/data/app/$2/base.apk"
+    if [ "$2" = "{big}" ]; then
+      i=0
+      while [ $i -lt {splits} ]; do echo "package:/data/app/$2/split_config.$i.apk"; i=$((i+1)); done
+    fi ;;
+  *) exit 1 ;;
+esac
+""",
+    "dumpsys": """\
+[ "$1" = package ] && grep -qx "$2" "$FAKE_DEVICE_ROOT/state/packages.txt" || exit 0
+echo "    versionCode=1 minSdk=24 targetSdk=34"
+echo "    lastUpdateTime=2026-01-01 00:00:00"
+""",
+    "stat": """\
+# stat -c '%s' | '%s %n' FILE...: sizes of the generated APKs
+fmt="%s"
+[ "$1" = -c ] && { fmt="$2"; shift 2; }
+rc=0
+for f in "$@"; do
+  size=$(apk_size "$f" 2>/dev/null) || size=$(file_size "$f") || { echo "stat: $f: No such file or directory" >&2; rc=1; continue; }
+  case "$fmt" in *%n*) echo "$size $f" ;; *) echo "$size" ;; esac
+done
+exit $rc
+""",
+    "cat": """\
+# Generated APK content; anything else is a real file under the device root
+[ $# -eq 0 ] && exec /bin/cat
+for f in "$@"; do
+  case "$f" in
+    /proc/net/tcp|/proc/net/tcp6)
+      # A LISTEN socket on 27042 for every live frida-server past its startup delay
+      echo "  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode"
+      [ "$f" = /proc/net/tcp ] && for p in "$FAKE_DEVICE_ROOT"/run/*.pid; do
+        [ -f "${p%.pid}.listening" ] && alive "$(/bin/cat "$p")" &&
+          echo "   0: 0100007F:69A2 00000000:0000 0A 00000000:00000000 00:00000000 00000000     0        0 1 1 0000000000000000 100 0 0 10 0"
+      done
+      continue ;;
+  esac
+  size=$(apk_size "$f" 2>/dev/null) && { head -c "$size" /dev/zero; continue; }
+  /bin/cat "$FAKE_DEVICE_ROOT$f" 2>/dev/null || /bin/cat "$f" || exit 1
+done
+""",
+    "tail": """\
+# tail -c +N FILE: generated APK content from byte N; anything else is a real file under the device root
+if [ "$1" = -c ] && [ $# -eq 3 ]; then
+  size=$(apk_size "$3" 2>/dev/null) && { from=${2#+}; head -c $((size - from + 1)) /dev/zero; exit 0; }
+  [ -f "$FAKE_DEVICE_ROOT$3" ] && exec /usr/bin/tail -c "$2" "$FAKE_DEVICE_ROOT$3"
+fi
+exec /usr/bin/tail "$@"
+""",
+    "sha256sum": """\
+rc=0
+for f in "$@"; do
+  if size=$(apk_size "$f" 2>/dev/null); then
+    sum=$(head -c "$size" /dev/zero | /usr/bin/sha256sum)
+  elif [ -f "$FAKE_DEVICE_ROOT$f" ]; then
+    sum=$(/usr/bin/sha256sum < "$FAKE_DEVICE_ROOT$f")
+  else
+    echo "sha256sum: $f: No such file or directory" >&2; rc=1; continue
+  fi
+  echo "${sum%% *}  $f"
+done
+exit $rc
+""",
+    "apk_size": """\
+# Size of a generated APK; fails for anything else
+case "$1" in
+  /data/app/{big}/base.apk|/data/app/{big}/split_config.*.apk) echo {apk_size} ;;
+  /data/app/*/base.apk) grep -qx "$(basename "$(dirname "$1")")" "$FAKE_DEVICE_ROOT/state/packages.txt" && echo {small_apk_size} ;;
+  *) exit 1 ;;
+esac
+""",
+    "alive": """\
+# Process exists and has not exited (an unreaped zombie counts as gone)
+kill -0 "$1" 2>/dev/null && [ "$(cut -d' ' -f3 "/proc/$1/stat" 2>/dev/null)" != Z ]
+""",
+    "file_size": """\
+[ -f "$FAKE_DEVICE_ROOT$1" ] && wc -c < "$FAKE_DEVICE_ROOT$1"
+""",
+    "ps": """\
+# ps -A -o PID,USER,NAME,CMDLINE (toybox, PID right-aligned) or plain ps (old toolbox columns)
+fields=0
+[ "$1" = -A ] && [ "$2" = -o ] && fields=1
+if [ $fields = 1 ]; then printf '%5s %-8s %-24s %s\\n' PID USER NAME CMDLINE; else echo "USER PID PPID VSZ RSS WCHAN ADDR S NAME"; fi
+for f in "$FAKE_DEVICE_ROOT"/run/*.pid; do
+  [ -f "$f" ] || continue
+  pid=$(cat "$f")
+  name=$(basename "$f" .pid)
+  alive "$pid" || continue
+  if [ $fields = 1 ]; then printf '%5s %-8s %-24s %s\\n' "$pid" root "$name" "/data/local/tmp/$name"; else echo "root $pid 1 0 0 0 0 S $name"; fi
+done
+""",
+    "id": """\
+if [ "$FAKE_UID" = 0 ]; then u=0; n=root; else u=2000; n=shell; fi
+if [ "$1" = "-u" ]; then echo $u; else echo "uid=$u($n) gid=$u($n)"; fi
+""",
+    "su": """\
+# su -c CMD | su 0 sh -c CMD | su 0 CMD...
+if [ "$1" = "-c" ]; then shift
+elif [ "$1" = "0" ]; then shift; [ "$1" = "sh" ] && shift; [ "$1" = "-c" ] && shift
+fi
+export FAKE_UID=0
+exec sh -c "$(printf '%s' "$*" | sed "s#/data/local/tmp#$FAKE_DEVICE_ROOT/data/local/tmp#g")"
+""",
+    "ls": """\
+found=1
+for a in "$@"; do
+  case "$a" in -*) continue ;; esac
+  for f in $FAKE_DEVICE_ROOT$a; do
+    if [ -e "$f" ]; then echo "${f#$FAKE_DEVICE_ROOT}"; found=0; fi
+  done
+done
+exit $found
+""",
+    "which": """\
+command -v "$1" || exit 1
+""",
+}
+
+# mv, rm and chmod run as the shell user too (frida-deploy's rename into place)
+_REMAPPED = """\
+# Paths under /data/local/tmp live in the device root
+for a in "$@"; do
+  case "$a" in /data/local/tmp*) a="$FAKE_DEVICE_ROOT$a" ;; esac
+  set -- "$@" "$a"; shift
+done
+exec /bin/{tool} "$@"
+"""
+STUBS.update({tool: _REMAPPED.replace("{tool}", tool) for tool in ("mv", "rm", "chmod")})
+
+FRIDA_STUB = """\
+name="$FAKE_DEVICE_ROOT/run/$(basename "$0")"
+rm -f "$name.listening"
+echo $$ > "$name.pid"
+sleep {frida_startup}
+touch "$name.listening"
+exec sleep 86400 </dev/null >/dev/null 2>&1
+"""
+
+
+def package_ids(config):
+    return [BIG_PACKAGE] + [f"com.bench.app{i:05d}" for i in range(config["packages"] - 1)]
+
+
+def serials(config):
+    return [f"bench-{i + 1:04d}" for i in range(config["devices"])]
+
+
+def build(root, **overrides):
+    """Create the fake device tree under root; returns the effective config"""
+    config = dict(DEFAULT_CONFIG, **overrides)
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, "config.json"), "w") as f:
+        json.dump(config, f, indent=2)
+    packages = package_ids(config)
+    for index, serial in enumerate(serials(config)):
+        dev = os.path.join(root, "devices", serial)
+        for sub in ("bin", "state", "run", "data/local/tmp"):
+            os.makedirs(os.path.join(dev, sub), exist_ok=True)
+        for name, body in STUBS.items():
+            body = body.replace("{big}", BIG_PACKAGE).replace("{splits}", str(config["splits"]))
+            body = body.replace("{apk_size}", str(config["apk_size"])).replace("{small_apk_size}", str(config["small_apk_size"]))
+            _write_script(os.path.join(dev, "bin", name), body)
+        for i in range(config["frida_servers"]):
+            name = "frida-server" if i == 0 else f"frida-server-{i}"
+            path = os.path.join(dev, "data/local/tmp", name)
+            with open(path, "w") as f:
+                f.write("#!/bin/sh\n" + FRIDA_STUB.replace("{frida_startup}", str(config["frida_startup"])))
+            os.chmod(path, 0o644)  # adbrv chmods it on start, like a fresh push
+        props = {
+            "ro.product.model": f"Bench Phone {index + 1}",
+            "ro.build.version.release": "14",
+            "ro.build.version.sdk": "34",
+            "ro.product.cpu.abi": "arm64-v8a",
+            "ro.serialno": serial,
+        }
+        with open(os.path.join(dev, "state", "props.txt"), "w") as f:
+            f.writelines(f"[{k}]: [{v}]\n" for k, v in props.items())
+        with open(os.path.join(dev, "state", "packages.txt"), "w") as f:
+            f.writelines(p + "\n" for p in packages)
+    return config
+
+
+def _write_script(path, body):
+    with open(path, "w") as f:
+        f.write("#!/bin/sh\n" + body)
+    os.chmod(path, 0o755)
+
+
+class Fleet:
+    """The fake devices under root, shared by the server and the CLI"""
+
+    def __init__(self, root):
+        self.root = root
+        with open(os.path.join(root, "config.json")) as f:
+            self.config = json.load(f)
+        self.serials = serials(self.config)
+        self.states = {s: "device" for s in self.serials}
+        self.version = 0  # bumped on every state change, pushed to track-devices clients
+
+    def set_state(self, serial, state):
+        """Simulate a device changing state ("offline", "unauthorized", ...) or leaving (None)"""
+        if state is None:
+            self.states.pop(serial, None)
+        else:
+            self.states[serial] = state
+        self.version += 1
+
+    def device_list(self):
+        return "".join(f"{s}\t{state}\n" for s, state in self.states.items())
+
+    def online(self, serial):
+        return self.states.get(serial) == "device"
+
+    def device_dir(self, serial):
+        return os.path.join(self.root, "devices", serial)
+
+    def pause(self):
+        if self.config["latency"]:
+            time.sleep(self.config["latency"])
+
+    def shell_env(self, serial):
+        dev = self.device_dir(serial)
+        return {
+            "PATH": f"{dev}/bin:/usr/bin:/bin",
+            "FAKE_DEVICE_ROOT": dev,
+            "HOME": dev,
+            "LANG": "C",
+        }
+
+    def spawn_shell(self, serial, command=None, **kwargs):
+        args = ["sh"] if command is None else ["sh", "-c", command]
+        return subprocess.Popen(args, cwd=self.device_dir(serial), env=self.shell_env(serial), **kwargs)
+
+    def run_shell(self, serial, command):
+        """(stdout, stderr, returncode) of command on the fake device"""
+        proc = self.spawn_shell(serial, command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, err = proc.communicate()
+        return out, err, proc.returncode
+
+    # -- files ------------------------------------------------------------
+
+    def file_size(self, serial, path):
+        """Size of a device file, or None if it does not exist"""
+        if path.startswith("/data/app/"):
+            pkg, _, name = path[len("/data/app/"):].partition("/")
+            with open(os.path.join(self.device_dir(serial), "state", "packages.txt")) as f:
+                if pkg not in f.read().split() or not name.endswith(".apk"):
+                    return None
+            if name != "base.apk":
+                try:
+                    index = int(name[len("split_config."):-len(".apk")])
+                except ValueError:
+                    return None
+                if pkg != BIG_PACKAGE or not name.startswith("split_config.") or index >= self.config["splits"]:
+                    return None
+            return self.config["apk_size"] if pkg == BIG_PACKAGE else self.config["small_apk_size"]
+        local = self.local_path(serial, path)
+        return os.path.getsize(local) if local and os.path.isfile(local) else None
+
+    def local_path(self, serial, path):
+        if path.startswith("/data/local/tmp"):
+            return self.device_dir(serial) + path
+        return None
+
+    def read_chunks(self, serial, path, chunk=len(_PATTERN)):
+        """Yield the content of a device file (generated for APKs)"""
+        local = self.local_path(serial, path)
+        if local:
+            with open(local, "rb") as f:
+                while True:
+                    data = f.read(chunk)
+                    if not data:
+                        return
+                    yield data
+        remaining = self.file_size(serial, path) or 0
+        while remaining:
+            n = min(remaining, chunk)
+            yield _PATTERN[:n]
+            remaining -= n
+
+    def write_file(self, serial, path, chunks, mode=0o644):
+        """Store a pushed file (only /data/local/tmp is writable); False when refused"""
+        local = self.local_path(serial, path)
+        if not local or not os.path.isdir(os.path.dirname(local)):
+            return False
+        with open(local, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.chmod(local, mode & 0o777)
+        return True
+
+    # -- reverse ----------------------------------------------------------
+
+    def _reverse_file(self, serial):
+        return os.path.join(self.device_dir(serial), "state", "reverse.txt")
+
+    def reverse_list(self, serial):
+        try:
+            with open(self._reverse_file(serial)) as f:
+                return [line.split() for line in f if line.strip()]
+        except OSError:
+            return []
+
+    def reverse_forward(self, serial, remote, local):
+        rules = [r for r in self.reverse_list(serial) if r[0] != remote] + [[remote, local]]
+        with open(self._reverse_file(serial), "w") as f:
+            f.writelines(f"{r} {l}\n" for r, l in rules)
+
+    def reverse_remove_all(self, serial):
+        try:
+            os.unlink(self._reverse_file(serial))
+        except OSError:
+            pass
+
+    def stop_processes(self):
+        """Kill every fake frida-server still running"""
+        import glob
+        import signal
+        for pidfile in glob.glob(os.path.join(self.root, "devices", "*", "run", "*.pid")):
+            try:
+                with open(pidfile) as f:
+                    os.kill(int(f.read().strip()), signal.SIGKILL)
+            except (OSError, ValueError):
+                pass
+            os.unlink(pidfile)
+
+
+# -- adb server -----------------------------------------------------------
+
+class _Handler(socketserver.BaseRequestHandler):
+    def recv_exact(self, n):
+        data = b""
+        while len(data) < n:
+            chunk = self.request.recv(n - len(data))
+            if not chunk:
+                raise EOFError
+            data += chunk
+        return data
+
+    def read_request(self):
+        return self.recv_exact(int(self.recv_exact(4), 16)).decode("utf-8")
+
+    def okay(self, payload=None):
+        out = b"OKAY"
+        if payload is not None:
+            data = payload.encode("utf-8")
+            out += b"%04x" % len(data) + data
+        self.request.sendall(out)
+
+    def fail(self, message):
+        data = message.encode("utf-8")
+        self.request.sendall(b"FAIL" + b"%04x" % len(data) + data)
+
+    def packet(self, packet_id, payload):
+        self.request.sendall(struct.pack("<BI", packet_id, len(payload)) + payload)
+
+    def handle(self):
+        fleet = self.server.fleet
+        try:
+            service = self.read_request()
+            fleet.pause()
+            if service == "host:version":
+                return self.okay("0029")
+            if service == "host:devices":
+                return self.okay(fleet.device_list())
+            if service == "host:track-devices":
+                return self.track(fleet)
+            if service == "host:features" or service.startswith("host-serial:"):
+                return self.okay("shell_v2,cmd,stat_v2")
+            if service == "host:transport-any":
+                online = [s for s in fleet.serials if fleet.online(s)]
+                if len(online) != 1:
+                    return self.fail("more than one device/emulator" if online else "no devices/emulators found")
+                serial = online[0]
+            elif service.startswith("host:transport:"):
+                serial = service[len("host:transport:"):]
+                if not fleet.online(serial):
+                    return self.fail(f"device '{serial}' not found")
+            else:
+                return self.fail(f"unknown host service {service}")
+            self.okay()
+            self.device_service(serial, self.read_request())
+        except (EOFError, OSError):
+            pass
+
+    def track(self, fleet):
+        self.okay()
+        sent = None
+        while True:
+            if fleet.version != sent:
+                sent = fleet.version
+                data = fleet.device_list().encode("utf-8")
+                self.request.sendall(b"%04x" % len(data) + data)
+            readable, _, _ = select.select([self.request], [], [], 0.05)
+            if readable and not self.request.recv(1024):
+                return
+
+    def device_service(self, serial, service):
+        fleet = self.server.fleet
+        if service == "shell,v2,raw:":
+            self.okay()
+            return self.interactive_shell(serial)
+        if service.startswith("shell,v2,raw:") or service.startswith("shell,v2:"):
+            self.okay()
+            out, err, rc = fleet.run_shell(serial, service.split(":", 1)[1])
+            for i in range(0, len(out), 65536):
+                self.packet(1, out[i:i + 65536])
+            if err:
+                self.packet(2, err)
+            return self.packet(3, bytes([rc & 0xFF]))
+        if service.startswith("exec:"):
+            # Streamed as produced, so long-running commands (frida-watch) deliver output live
+            self.okay()
+            proc = fleet.spawn_shell(serial, service[len("exec:"):], stdin=subprocess.DEVNULL,
+                                     stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            try:
+                for chunk in iter(lambda: os.read(proc.stdout.fileno(), 1 << 16), b""):
+                    self.request.sendall(chunk)
+            except OSError:
+                proc.kill()
+            finally:
+                proc.stdout.close()
+                proc.wait()
+            return
+        if service.startswith("shell:"):
+            self.okay()
+            out, _, _ = fleet.run_shell(serial, service.split(":", 1)[1])
+            return self.request.sendall(out)
+        if service == "reverse:list-forward":
+            self.okay()
+            data = "".join(f"{serial} {r} {l}\n" for r, l in fleet.reverse_list(serial)).encode("utf-8")
+            return self.request.sendall(b"%04x" % len(data) + data)
+        if service.startswith("reverse:forward:"):
+            remote, _, local = service[len("reverse:forward:"):].rpartition(";")
+            if remote.startswith("norebind:"):
+                remote = remote[len("norebind:"):]
+            fleet.reverse_forward(serial, remote, local)
+            self.okay()
+            return self.okay()
+        if service == "reverse:killforward-all":
+            fleet.reverse_remove_all(serial)
+            self.okay()
+            return self.okay()
+        if service == "sync:":
+            self.okay()
+            return self.sync(serial)
+        self.fail(f"unknown service {service}")
+
+    def interactive_shell(self, serial):
+        fleet = self.server.fleet
+        proc = fleet.spawn_shell(serial, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+        def pump():
+            try:
+                while True:
+                    data = proc.stdout.read1(65536)
+                    if not data:
+                        break
+                    self.packet(1, data)
+                self.packet(3, bytes([(proc.wait() or 0) & 0xFF]))
+            except OSError:
+                pass
+
+        threading.Thread(target=pump, daemon=True).start()
+        try:
+            while True:
+                packet_id, length = struct.unpack("<BI", self.recv_exact(5))
+                data = self.recv_exact(length)
+                if packet_id == 0:
+                    fleet.pause()
+                    proc.stdin.write(data)
+                    proc.stdin.flush()
+                elif packet_id == 4:
+                    proc.stdin.close()
+        except (EOFError, OSError):
+            pass
+        finally:
+            proc.kill()
+
+    def sync(self, serial):
+        fleet = self.server.fleet
+        while True:
+            ident, length = struct.unpack("<4sI", self.recv_exact(8))
+            if ident == b"QUIT":
+                return
+            path = self.recv_exact(length).decode("utf-8")
+            if ident == b"STAT":
+                size = fleet.file_size(serial, path)
+                mode = 0o100644 if size is not None else 0
+                self.request.sendall(b"STAT" + struct.pack("<III", mode, size or 0, int(time.time()) if mode else 0))
+            elif ident == b"RECV":
+                if fleet.file_size(serial, path) is None:
+                    msg = b"No such file or directory"
+                    self.request.sendall(b"FAIL" + struct.pack("<I", len(msg)) + msg)
+                    continue
+                for chunk in fleet.read_chunks(serial, path):
+                    self.request.sendall(b"DATA" + struct.pack("<I", len(chunk)) + chunk)
+                self.request.sendall(b"DONE" + struct.pack("<I", 0))
+            elif ident == b"SEND":
+                path, _, mode = path.rpartition(",")
+
+                def chunks():
+                    while True:
+                        kind, size = struct.unpack("<4sI", self.recv_exact(8))
+                        if kind == b"DONE":
+                            return
+                        yield self.recv_exact(size)
+                data = list(chunks())
+                if fleet.write_file(serial, path, data, int(mode or "420")):
+                    self.request.sendall(b"OKAY" + struct.pack("<I", 0))
+                else:
+                    msg = f"couldn't create file: {path}: Read-only file system".encode("utf-8")
+                    self.request.sendall(b"FAIL" + struct.pack("<I", len(msg)) + msg)
+            else:
+                msg = f"unsupported sync request {ident!r}".encode("utf-8")
+                self.request.sendall(b"FAIL" + struct.pack("<I", len(msg)) + msg)
+                return
+
+
+class FakeAdbServer(socketserver.ThreadingTCPServer):
+    """Fake adb server on 127.0.0.1; start() returns the port"""
+
+    allow_reuse_address = True
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, root, port=0):
+        self.fleet = Fleet(root)
+        super().__init__(("127.0.0.1", port), _Handler)
+
+    def server_bind(self):
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        super().server_bind()
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.server_address[1]
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def start(work, **overrides):
+    """
+    Build a fleet under work, start its server and install the fake `adb`.
+    Returns (fleet, server, env) where env points adbrv at them; stop the
+    server and call fleet.stop_processes() when done.
+    """
+    root = os.path.join(work, "fleet")
+    build(root, **overrides)
+    server = FakeAdbServer(root)
+    port = server.start()
+    bin_dir = os.path.join(work, "bin")
+    install_cli(bin_dir)
+    env = dict(os.environ)
+    env.update({
+        "FAKE_ADB_ROOT": root,
+        "PATH": bin_dir + os.pathsep + env.get("PATH", ""),
+        "ANDROID_ADB_SERVER_PORT": str(port),
+        "XDG_CACHE_HOME": os.path.join(work, "cache"),
+        "ADBRV_NO_DAEMON": "1",
+    })
+    env.pop("ADB_SERVER_SOCKET", None)
+    env.pop("ANDROID_SERIAL", None)
+    return server.fleet, server, env
+
+
+# -- adb executable ---------------------------------------------------------
+
+def install_cli(bin_dir):
+    """Write an `adb` executable into bin_dir that serves the fleet named by $FAKE_ADB_ROOT"""
+    os.makedirs(bin_dir, exist_ok=True)
+    path = os.path.join(bin_dir, "adb")
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(path, "w") as f:
+        f.write(
+            f"#!{sys.executable}\n"
+            "import sys\n"
+            f"sys.path.insert(0, {repo!r})\n"
+            "from benchmarks.fakeadb import cli_main\n"
+            "sys.exit(cli_main(sys.argv[1:]))\n"
+        )
+    os.chmod(path, 0o755)
+    return path
+
+
+def cli_main(argv):
+    fleet = Fleet(os.environ["FAKE_ADB_ROOT"])
+    serial = os.environ.get("ANDROID_SERIAL")
+    if argv[:1] == ["-s"]:
+        serial, argv = argv[1], argv[2:]
+    if not argv:
+        return 1
+    command, args = argv[0], argv[1:]
+    fleet.pause()
+    if command in ("start-server", "kill-server", "version"):
+        return 0
+    if command == "devices":
+        print("List of devices attached")
+        sys.stdout.write(fleet.device_list())
+        print()
+        return 0
+    if command == "track-devices":
+        data = fleet.device_list()
+        sys.stdout.write("%04x%s" % (len(data), data))
+        sys.stdout.flush()
+        time.sleep(86400)
+        return 0
+    if serial is None:
+        if len(fleet.serials) != 1:
+            sys.stderr.write("adb: more than one device/emulator\n" if fleet.serials else "adb: no devices/emulators found\n")
+            return 1
+        serial = fleet.serials[0]
+    if serial not in fleet.serials:
+        sys.stderr.write(f"adb: device '{serial}' not found\n")
+        return 1
+    if command in ("shell", "exec-out"):
+        # adb joins its arguments into one command line for the device shell
+        out, err, rc = fleet.run_shell(serial, " ".join(args))
+        sys.stdout.buffer.write(out)
+        sys.stderr.buffer.write(err)
+        return rc if command == "shell" else 0
+    if command == "reverse":
+        if args == ["--list"]:
+            for r, l in fleet.reverse_list(serial):
+                print(f"UsbFfs {r} {l}")
+        elif args == ["--remove-all"]:
+            fleet.reverse_remove_all(serial)
+        elif len(args) == 2:
+            fleet.reverse_forward(serial, args[0], args[1])
+        else:
+            return 1
+        return 0
+    if command == "pull" and len(args) == 2:
+        remote, local = args
+        if fleet.file_size(serial, remote) is None:
+            sys.stderr.write(f"adb: error: failed to stat remote object '{remote}': No such file or directory\n")
+            return 1
+        if os.path.isdir(local):
+            local = os.path.join(local, os.path.basename(remote))
+        total = 0
+        with open(local, "wb") as f:
+            for chunk in fleet.read_chunks(serial, remote):
+                f.write(chunk)
+                total += len(chunk)
+        print(f"{remote}: 1 file pulled, 0 skipped. ({total} bytes)")
+        return 0
+    if command == "push" and len(args) == 2:
+        local, remote = args
+        with open(local, "rb") as f:
+            data = f.read()
+        if not fleet.write_file(serial, remote, [data], os.stat(local).st_mode):
+            sys.stderr.write(f"adb: error: failed to copy '{local}' to '{remote}': Read-only file system\n")
+            return 1
+        print(f"{local}: 1 file pushed, 0 skipped. ({len(data)} bytes)")
+        return 0
+    sys.stderr.write(f"adb: unsupported command for the fake: {shlex.join(argv) if hasattr(shlex, 'join') else argv}\n")
+    return 1
@@ -0,0 +1,176 @@
+"""
+Record adbrv commands and check them against their recordings offline
+
+    python -m benchmarks.replay record FILE [--fake N [--latency MS]]
+                                            [--max-calls N] [--max-seconds S]
+                                            -- <adbrv arguments>
+    python -m benchmarks.replay check FILE... [--speed X]
+
+`record` runs `adbrv.py --record FILE <arguments>` (against the real adb
+server, or a fake fleet of N devices with --fake) with a fresh cache, then
+stores the command's output, exit status and budgets in the recording.
+Budgets default to the recorded number of adb round trips and 1.25x the
+recorded wall time.
+
+`check` replays each recording (see adbrv_module.replay) with the original
+latencies, scaled by --speed, and fails when the output or exit status
+differs, a call is missing from the recording, more round trips than
+max_calls are issued, or the command takes longer than max_seconds. A change
+that re-adds a per-field adb call shows up as extra round trips.
+"""
+
+import argparse
+import difflib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from . import fakeadb
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Fixed width so rich renders the same output when recording and replaying
+_COLUMNS = "120"
+# Transfer rates and elapsed times follow the host, not the recorded calls
+_TIMING = re.compile(r"\d+(?:\.\d+)? ?(?:[KMG]?B/s|ms|s)\b")
+
+
+def _adbrv(args, env):
+    """Run adbrv in a scratch working directory, which pulls without a destination write to"""
+    env = dict(env, COLUMNS=_COLUMNS, TERM="dumb", NO_COLOR="1")
+    cwd = tempfile.mkdtemp(prefix="adbrv-cwd-")
+    try:
+        proc = subprocess.run(
+            [sys.executable, os.path.join(REPO, "adbrv.py")] + list(args),
+            env=env, cwd=cwd, stdin=subprocess.DEVNULL, capture_output=True, text=True,
+        )
+    finally:
+        shutil.rmtree(cwd, ignore_errors=True)
+    proc.stdout = proc.stdout.replace(cwd, "<cwd>")
+    return proc
+
+
+def _normalize(text):
+    # Runs of blanks are squeezed: rich pads tables and panels to the widths of what they print
+    return [" ".join(_TIMING.sub("#", line).split()) for line in text.strip().splitlines()]
+
+
+def record(args):
+    work = tempfile.mkdtemp(prefix="adbrv-record-")
+    server = fleet = None
+    try:
+        if args.fake:
+            fleet, server, env = fakeadb.start(work, devices=args.fake, latency=args.latency / 1000.0)
+        else:
+            env = dict(os.environ, XDG_CACHE_HOME=os.path.join(work, "cache"))
+        proc = _adbrv(["--record", os.path.abspath(args.file)] + args.command, env)
+    finally:
+        if fleet is not None:
+            fleet.stop_processes()
+        if server is not None:
+            server.stop()
+        shutil.rmtree(work, ignore_errors=True)
+    try:
+        with open(args.file) as f:
+            recording = json.load(f)
+    except (OSError, ValueError):
+        sys.stderr.write(proc.stderr)
+        print(f"no recording written (exit status {proc.returncode})")
+        return 1
+    meta = recording["meta"]
+    recording["expected_output"] = proc.stdout
+    recording["exit_code"] = proc.returncode
+    recording["budget"] = {
+        "max_calls": args.max_calls if args.max_calls is not None else len(recording["calls"]),
+        "max_seconds": args.max_seconds if args.max_seconds is not None else round(meta["wall"] * 1.25, 3),
+    }
+    with open(args.file, "w") as f:
+        json.dump(recording, f, indent=1)
+    print(f"{args.file}: {len(recording['calls'])} calls, {meta['wall'] * 1000:.0f} ms, exit status {proc.returncode}")
+    return 0
+
+
+def check_one(path, speed):
+    """Replay one recording; returns a list of failure messages"""
+    with open(path) as f:
+        recording = json.load(f)
+    budget = recording.get("budget", {})
+    fd, report_path = tempfile.mkstemp(suffix=".json", prefix="adbrv-replay-")
+    os.close(fd)
+    try:
+        env = dict(os.environ, ADBRV_REPLAY=os.path.abspath(path), ADBRV_REPLAY_REPORT=report_path, ADBRV_REPLAY_SPEED=str(speed))
+        proc = _adbrv(recording["meta"]["command"], env)
+        try:
+            with open(report_path) as f:
+                report = json.load(f)
+        except ValueError:
+            print(f"FAIL {path}")
+            return [f"no replay report (exit status {proc.returncode}): {proc.stderr.strip()[-300:]}"]
+    finally:
+        os.unlink(report_path)
+
+    failures = []
+    for m in report["mismatches"]:
+        failures.append(f"call not in recording: {m['kind']} {m['device'] or '-'} {m['request'][:120]}")
+    if "max_calls" in budget and report["calls"] > budget["max_calls"]:
+        failures.append(f"{report['calls']} adb round trips, budget {budget['max_calls']}")
+    # The wall budget is for the recorded timing; a faster replay scales it
+    if "max_seconds" in budget and speed and report["wall"] > budget["max_seconds"] * speed:
+        failures.append(f"took {report['wall']:.3f}s, budget {budget['max_seconds'] * speed:.3f}s")
+    if "exit_code" in recording and proc.returncode != recording["exit_code"]:
+        failures.append(f"exit status {proc.returncode}, recorded {recording['exit_code']}")
+    if "expected_output" in recording:
+        expected, actual = _normalize(recording["expected_output"]), _normalize(proc.stdout)
+        if expected != actual:
+            diff = list(difflib.unified_diff(expected, actual, "recorded", "replayed", lineterm="", n=1))
+            failures.append("output differs:\n    " + "\n    ".join(diff[:40]))
+    print(f"{'FAIL' if failures else 'ok  '} {path}: {report['calls']} calls, {report['wall'] * 1000:.0f} ms")
+    return failures
+
+
+def check(args):
+    failed = 0
+    for path in args.files:
+        try:
+            failures = check_one(path, args.speed)
+        except (OSError, ValueError, KeyError) as e:
+            failures = [f"cannot replay: {e}"]
+            print(f"FAIL {path}")
+        for message in failures:
+            print(f"     {message}")
+        failed += bool(failures)
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.replay", description="Record and replay adbrv sessions.")
+    sub = parser.add_subparsers(dest="action", required=True)
+    rec = sub.add_parser("record", help="record one adbrv command")
+    rec.add_argument("file")
+    rec.add_argument("--fake", type=int, metavar="N", help="record against N fake devices instead of the adb server")
+    rec.add_argument("--latency", type=float, default=0.0, help="milliseconds per request for --fake")
+    rec.add_argument("--max-calls", type=int)
+    rec.add_argument("--max-seconds", type=float)
+    chk = sub.add_parser("check", help="replay recordings and check their budgets")
+    chk.add_argument("files", nargs="+")
+    chk.add_argument("--speed", type=float, default=1.0, help="latency scale (0 replays without delays)")
+    argv = list(sys.argv[1:] if argv is None else argv)
+    # Everything after -- belongs to adbrv, so record's own options may come before or after FILE
+    command = []
+    if "--" in argv:
+        argv, command = argv[:argv.index("--")], argv[argv.index("--") + 1:]
+    args = parser.parse_args(argv)
+    if args.action == "record":
+        args.command = command
+        if not args.command:
+            parser.error("record needs the adbrv arguments after --")
+        return record(args)
+    return check(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""
+Benchmark harness for adbrv
+
+    python -m benchmarks.run [--devices N] [--latency MS] [--packages N]
+                             [--splits N] [--apk-size MB] [--repeat N]
+                             [--transport native|cli] [--only PREFIX,...]
+                             [--json FILE] [--compare BASELINE.json]
+
+Builds a fake fleet (see benchmarks.fakeadb), points adbrv at it and times:
+
+  api.*  adbrv_module entry points, called in this process
+  cli.*  `adbrv.py <command>` end to end, each run in a fresh interpreter
+
+With --transport native (default) adbrv talks to the fake adb server through
+ANDROID_ADB_SERVER_PORT; with --transport cli the native client is disabled
+and every call goes through the fake `adb` executable on PATH. adbrv's cache
+directory is a fresh temporary one, so the first run of each benchmark is the
+cold case; it is reported separately from the median.
+
+Results are printed as a table and, with --json, written as JSON that
+--compare can diff against a previous run.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, NamedTuple, Optional
+
+from . import fakeadb
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FRIDA_SERVER = "/data/local/tmp/frida-server"
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class Bench(NamedTuple):
+    name: str
+    run: Callable
+    setup: Optional[Callable] = None     # untimed, before every run
+    teardown: Optional[Callable] = None  # untimed, after every run
+
+
+def _check_results(results):
+    errors = [f"{r.serial}: {r.error}" for r in results if r.error is not None]
+    if errors:
+        raise BenchmarkError("; ".join(errors))
+    return results
+
+
+def api_benches(fleet, work):
+    """Benchmarks of adbrv_module functions (imported lazily: env must be set first)"""
+    import asyncio
+    from adbrv_module import asyncAdb, devices, fridaTools, proxy
+    serials = fleet.serials
+    first = serials[0]
+    pulled = os.path.join(work, "api-pull")
+
+    def dirty():
+        # Give unset something to remove on every run
+        for s in serials:
+            fleet.reverse_forward(s, "tcp:8083", "tcp:8083")
+            with open(os.path.join(fleet.device_dir(s), "state", "settings_global_http_proxy"), "w") as f:
+                f.write("127.0.0.1:8083\n")
+
+    def start_servers():
+        for s in serials:
+            fleet.run_shell(s, f"chmod +x {fleet.device_dir(s)}{FRIDA_SERVER}; {fleet.device_dir(s)}{FRIDA_SERVER} &")
+
+    def kill_all():
+        for s in serials:
+            procs = fridaTools.find_frida_processes(s)
+            if not all(ok for _, ok in fridaTools.kill_frida_processes(s, procs)):
+                raise BenchmarkError(f"{s}: kill failed")
+
+    def pull():
+        os.makedirs(pulled, exist_ok=True)
+        asyncio.run(asyncAdb.pull_apk(fakeadb.BIG_PACKAGE, pulled, first))
+
+    def package_search():
+        # `pull` completion: one index per package list, then a query per keystroke
+        from adbrv_module.packageSearch import PackageIndex
+        index = PackageIndex(fleet_packages)
+        target = fleet_packages[-1]
+        for end in range(1, len(target) + 1):
+            index.search(target[:end])
+        if index.search(target)[0] != target:
+            raise BenchmarkError("package not ranked first")
+
+    fleet_packages = fakeadb.package_ids(fleet.config)
+
+    return [
+        Bench("api.devices", devices.get_connected_devices),
+        Bench("api.probe_all", lambda: _check_results(devices.map_devices(devices.probe_device, serials))),
+        Bench("api.unset_all", lambda: _check_results(devices.map_devices(proxy.clear_proxy_and_reverse, serials)), setup=dirty),
+        Bench("api.packages", lambda: _installed_packages(first)),
+        Bench("api.package_search", package_search),
+        Bench("api.pull_split", pull, teardown=lambda: shutil.rmtree(pulled, ignore_errors=True)),
+        Bench("api.frida_start", lambda: fridaTools.launch_frida_server(first, FRIDA_SERVER).ready or _fail("server did not start"),
+              teardown=fleet.stop_processes),
+        Bench("api.frida_kill_all", kill_all, setup=start_servers, teardown=fleet.stop_processes),
+    ]
+
+
+def _installed_packages(serial):
+    from adbrv_module.pullAPK import get_installed_packages
+    packages = get_installed_packages(serial)
+    if not packages:
+        raise BenchmarkError("no packages listed")
+    return packages
+
+
+def _fail(message):
+    raise BenchmarkError(message)
+
+
+def cli_benches(fleet, work, env):
+    first = fleet.serials[0]
+    pulled = os.path.join(work, "cli-pull")
+
+    def adbrv(*args):
+        def run():
+            proc = subprocess.run(
+                [sys.executable, os.path.join(REPO, "adbrv.py")] + list(args),
+                env=env, cwd=work, stdin=subprocess.DEVNULL, capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                tail = (proc.stderr or proc.stdout).strip().splitlines()[-1:] or [f"exit status {proc.returncode}"]
+                raise BenchmarkError(tail[0])
+        return run
+
+    def start_server():
+        fleet.run_shell(first, f"chmod +x {fleet.device_dir(first)}{FRIDA_SERVER}; {fleet.device_dir(first)}{FRIDA_SERVER} &")
+
+    return [
+        Bench("cli.startup", adbrv("--version")),
+        Bench("cli.status", adbrv("status")),
+        Bench("cli.unset", adbrv("unset")),
+        Bench("cli.pull", adbrv("pull", fakeadb.BIG_PACKAGE, pulled, "-d", first),
+              setup=lambda: os.makedirs(pulled, exist_ok=True), teardown=lambda: shutil.rmtree(pulled, ignore_errors=True)),
+        Bench("cli.frida_start", adbrv("frida-start", "-d", first), teardown=fleet.stop_processes),
+        Bench("cli.frida_kill", adbrv("frida-kill", "-d", first), setup=start_server, teardown=fleet.stop_processes),
+    ]
+
+
+def measure(bench, repeat):
+    """Time bench.run repeat times; the first run is also reported on its own (cold caches)"""
+    runs = []
+    try:
+        for _ in range(repeat):
+            if bench.setup:
+                bench.setup()
+            start = time.perf_counter()
+            try:
+                bench.run()
+                runs.append(time.perf_counter() - start)
+            finally:
+                if bench.teardown:
+                    bench.teardown()
+    except Exception as e:
+        return {"name": bench.name, "error": f"{type(e).__name__}: {e}", "runs": runs}
+    return {
+        "name": bench.name,
+        "runs": runs,
+        "first": runs[0],
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "mean": statistics.mean(runs),
+        "max": max(runs),
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _ms(value):
+    return f"{value * 1000:9.1f}"
+
+
+def print_results(results, baseline=None):
+    base = {r["name"]: r for r in (baseline or {}).get("results", [])}
+    header = f"{'benchmark':<22}{'first ms':>10}{'median ms':>10}{'max ms':>10}"
+    if base:
+        header += f"{'base ms':>10}{'change':>9}"
+    print(header)
+    for r in results:
+        if "error" in r:
+            print(f"{r['name']:<22}  error: {r['error']}")
+            continue
+        line = f"{r['name']:<22}{_ms(r['first'])} {_ms(r['median'])} {_ms(r['max'])}"
+        old = base.get(r["name"])
+        if old and "median" in old:
+            change = (r["median"] - old["median"]) / old["median"] * 100 if old["median"] else 0.0
+            line += f" {_ms(old['median'])} {change:+7.1f}%"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Time adbrv against a fake adb.")
+    parser.add_argument("--devices", type=int, default=fakeadb.DEFAULT_CONFIG["devices"])
+    parser.add_argument("--latency", type=float, default=0.0, help="milliseconds added to every adb request")
+    parser.add_argument("--packages", type=int, default=fakeadb.DEFAULT_CONFIG["packages"])
+    parser.add_argument("--splits", type=int, default=fakeadb.DEFAULT_CONFIG["splits"])
+    parser.add_argument("--apk-size", type=float, default=fakeadb.DEFAULT_CONFIG["apk_size"] / (1 << 20), help="MB per APK file of the big package")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--transport", choices=("native", "cli"), default="native")
+    parser.add_argument("--only", help="comma-separated name prefixes, e.g. api.,cli.status")
+    parser.add_argument("--json", metavar="FILE", help="write results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="baseline JSON from an earlier run")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary fleet directory")
+    args = parser.parse_args(argv)
+
+    work = tempfile.mkdtemp(prefix="adbrv-bench-")
+    fleet, server, env = fakeadb.start(
+        work, devices=args.devices, latency=args.latency / 1000.0, packages=args.packages,
+        splits=args.splits, apk_size=int(args.apk_size * (1 << 20)),
+    )
+    config = fleet.config
+    if args.transport == "cli":
+        env["ADBRV_NATIVE_ADB"] = "0"
+    # Before adbrv_module is imported: some settings are read at import time
+    os.environ.clear()
+    os.environ.update(env)
+    sys.path.insert(0, REPO)
+
+    try:
+        benches = []
+        try:
+            benches += api_benches(fleet, work)
+        except ImportError as e:
+            print(f"api benchmarks unavailable: {e}", file=sys.stderr)
+        benches += cli_benches(fleet, work, env)
+        if args.only:
+            prefixes = tuple(p.strip() for p in args.only.split(",") if p.strip())
+            benches = [b for b in benches if b.name.startswith(prefixes)]
+        results = []
+        for bench in benches:
+            results.append(measure(bench, max(1, args.repeat)))
+        report = {
+            "meta": {
+                "commit": _commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "transport": args.transport,
+                "repeat": args.repeat,
+                "fleet": config,
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "results": results,
+        }
+        baseline = None
+        if args.compare:
+            with open(args.compare) as f:
+                baseline = json.load(f)
+        print_results(results, baseline)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+        return 1 if any("error" in r for r in results) else 0
+    finally:
+        fleet.stop_processes()
+        server.stop()
+        if args.keep:
+            print(f"fleet kept at {work}", file=sys.stderr)
+        else:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())